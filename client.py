@@ -5,7 +5,7 @@ import threading
 import time
 import logging
 from tracker import Tracker
-from peer import Peer
+from peer import Peer, peer_cache
 from piece_manager import PieceManager
 from file_manager import FileManager
 from torrent import Torrent
@@ -18,13 +18,14 @@ logging.basicConfig(
 )
 
 class Client:
-    def __init__(self, torrent_path, output_dir, seed=False):
-        """Initialize the BitTorrent client."""
-        self.torrent = Torrent(torrent_path)
+    def __init__(self, torrent_path, output_dir, seed=False, torrent=None):
+        """Initialize the BitTorrent client, optionally from an already parsed torrent."""
+        self.torrent = torrent if torrent is not None else Torrent(torrent_path)
         self.output_dir = output_dir
         self.peer_id = generate_peer_id()
         self.port = 6881
         self.seed = seed
+        self.self_endpoints = self._local_endpoints()
         
         # Initialize managers
         self.file_manager = FileManager(self.torrent, output_dir)
@@ -32,6 +33,8 @@ class Client:
         self.tracker = Tracker(self.torrent)
         self.tracker.peer_id = self.peer_id
         self.tracker.port = self.port
+        # Serializes announces, the tracker keeps UDP connection state between requests
+        self.tracker_lock = threading.Lock()
         
         # Peer management
         self.active_peers = {}  # ip:port -> Peer
@@ -43,6 +46,15 @@ class Client:
         self.downloaded = 0
         self.start_time = 0
         
+    def _local_endpoints(self):
+        """Get the (ip, port) pairs this client listens on, to skip connecting to ourselves."""
+        addrs = {'127.0.0.1', '0.0.0.0'}
+        try:
+            addrs.update(socket.gethostbyname_ex(socket.gethostname())[2])
+        except OSError:
+            pass
+        return {(addr, self.port) for addr in addrs}
+
     def start(self):
         """Start the client."""
         try:
@@ -72,9 +84,130 @@ class Client:
         """Start download mode."""
         print("=== Starting Download ===")
         
+        # Redial peers retained from an earlier run before asking the tracker
+        successful_peers = self._connect_cached_peers()
+        if successful_peers:
+            print(f"Reconnected to {successful_peers} cached peers")
+            # The tracker still has to hear from us, only its peer list is not needed
+            threading.Thread(target=self._announce, daemon=True).start()
+        else:
+            successful_peers = self._connect_tracker_peers()
+            if successful_peers is None:
+                return
+        
+        if successful_peers == 0:
+            print("\nNo peers connected successfully.")
+            print("This could be due to:")
+            print("1. Firewall blocking connections")
+            print("2. All peers are offline")
+            print("3. Network connectivity issues")
+            print("4. Tracker provided invalid peer information")
+            return
+        
+        print(f"\nSuccessfully connected to {successful_peers} peers")
+        print("Download in progress...")
+        
+        # Main download loop
+        while self.running and not self.download_complete:
+            self._manage_downloads()
+            
+            # Periodically try to get more peers
+            if len(self.active_peers) < 3:
+                try:
+                    with self.tracker_lock:
+                        new_peers = self.tracker.get_peers()
+                    for ip, port in new_peers[:5]:
+                        if (ip, port) not in self.active_peers and (ip, port) not in self.self_endpoints:
+                            try:
+                                peer = Peer(ip, port, self.torrent, self.peer_id, self.piece_manager,
+                                            on_close=self._on_peer_closed)
+                                if peer.connect():
+                                    self._track_peer(peer)
+                                    print(f"Added new peer {ip}:{port}")
+                            except Exception:
+                                continue
+                except Exception:
+                    pass
+            
+            time.sleep(2)
+            
+    def _start_seeding(self):
+        """Start seeding mode."""
+        print("=== Starting Seeding ===")
+        
+        # For seeding, assume we have all pieces
+        for i in range(self.torrent.num_pieces):
+            self.piece_manager.have_pieces.add(i)
+        
+        # Start listening for incoming connections
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        
+        try:
+            server.bind(('', self.port))
+            server.listen(5)
+            print(f"Listening on port {self.port} for incoming connections...")
+            
+            # Register with tracker
+            self.tracker.get_peers()
+            
+            server.settimeout(1)
+            while self.running:
+                try:
+                    conn, addr = server.accept()
+                    print(f"Accepted connection from {addr[0]}:{addr[1]}")
+                    peer = Peer(addr[0], addr[1], self.torrent, self.peer_id, self.piece_manager, is_seeding=True)
+                    threading.Thread(target=peer.handle_incoming, args=(conn,), daemon=True).start()
+                except socket.timeout:
+                    continue
+                except Exception as e:
+                    print(f"Error accepting connection: {e}")
+        finally:
+            server.close()
+            
+    def _connect_peer(self, ip, port):
+        """Connect to one peer and leave it to the shared reactor."""
+        try:
+            print(f"\nConnecting to peer {ip}:{port}")
+            peer = Peer(ip, port, self.torrent, self.peer_id, self.piece_manager,
+                        on_close=self._on_peer_closed)
+            if peer.connect():
+                self._track_peer(peer)
+                print(f"Successfully connected to peer {ip}:{port}")
+                return True
+            print(f"Failed to connect to peer {ip}:{port}")
+        except Exception as e:
+            print(f"Error connecting to peer {ip}:{port}: {str(e)}")
+        return False
+
+    def _connect_cached_peers(self):
+        """Dial peers retained from an earlier run of this torrent in parallel."""
+        cached = [addr for addr in peer_cache.recall(self.torrent.info_hash)
+                  if addr not in self.self_endpoints]
+        if not cached:
+            return 0
+        print(f"\nRedialling {len(cached)} cached peers")
+        threads = [threading.Thread(target=self._connect_peer, args=addr, daemon=True) for addr in cached]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(self.active_peers)
+
+    def _announce(self):
+        """Announce to the tracker without connecting to the peers it returns."""
+        try:
+            with self.tracker_lock:
+                self.tracker.get_peers()
+        except Exception as e:
+            logging.warning(f"Tracker announce failed: {e}")
+
+    def _connect_tracker_peers(self):
+        """Get peers from the tracker and connect to them; None if no tracker had peers."""
         # Get peer list from tracker
         print(f"\nConnecting to tracker: {self.torrent.announce}")
-        peers = self.tracker.get_peers()
+        with self.tracker_lock:
+            peers = self.tracker.get_peers()
         
         if not peers:
             print("Failed to get peers from tracker. Trying alternative methods:")
@@ -141,99 +274,21 @@ class Client:
             print("\n📋 For testing your client, try:")
             print("   python main.py --torrent test.torrent --output downloads/")
             print("   (After starting: python test_tracker.py and python start_seeder.py)")
-            return
+            return None
             
         print(f"Found {len(peers)} peers")
+        peers = [(ip, port) for ip, port in peers if (ip, port) not in self.self_endpoints]
         
         # Start peer connections
         successful_peers = 0
         max_peers = min(10, len(peers))  # Limit concurrent connections
         
         for i, (ip, port) in enumerate(peers[:max_peers]):
-            if (ip, port) not in self.active_peers:
-                try:
-                    print(f"\nConnecting to peer {ip}:{port}")
-                    peer = Peer(ip, port, self.torrent, self.peer_id, self.piece_manager)
-                    if peer.connect():
-                        self.active_peers[(ip, port)] = peer
-                        threading.Thread(target=self._handle_peer, args=(peer,), daemon=True).start()
-                        successful_peers += 1
-                        print(f"Successfully connected to peer {ip}:{port}")
-                    else:
-                        print(f"Failed to connect to peer {ip}:{port}")
-                except Exception as e:
-                    print(f"Error connecting to peer {ip}:{port}: {str(e)}")
-                    continue
-        
-        if successful_peers == 0:
-            print("\nNo peers connected successfully.")
-            print("This could be due to:")
-            print("1. Firewall blocking connections")
-            print("2. All peers are offline")
-            print("3. Network connectivity issues")
-            print("4. Tracker provided invalid peer information")
-            return
-        
-        print(f"\nSuccessfully connected to {successful_peers} peers")
-        print("Download in progress...")
-        
-        # Main download loop
-        while self.running and not self.download_complete:
-            self._manage_downloads()
-            
-            # Periodically try to get more peers
-            if len(self.active_peers) < 3:
-                try:
-                    new_peers = self.tracker.get_peers()
-                    for ip, port in new_peers[:5]:
-                        if (ip, port) not in self.active_peers:
-                            try:
-                                peer = Peer(ip, port, self.torrent, self.peer_id, self.piece_manager)
-                                if peer.connect():
-                                    self.active_peers[(ip, port)] = peer
-                                    threading.Thread(target=self._handle_peer, args=(peer,), daemon=True).start()
-                                    print(f"Added new peer {ip}:{port}")
-                            except Exception:
-                                continue
-                except Exception:
-                    pass
-            
-            time.sleep(2)
-            
-    def _start_seeding(self):
-        """Start seeding mode."""
-        print("=== Starting Seeding ===")
+            if (ip, port) not in self.active_peers and self._connect_peer(ip, port):
+                successful_peers += 1
         
-        # For seeding, assume we have all pieces
-        for i in range(self.torrent.num_pieces):
-            self.piece_manager.have_pieces.add(i)
-        
-        # Start listening for incoming connections
-        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        
-        try:
-            server.bind(('', self.port))
-            server.listen(5)
-            print(f"Listening on port {self.port} for incoming connections...")
-            
-            # Register with tracker
-            self.tracker.get_peers()
-            
-            server.settimeout(1)
-            while self.running:
-                try:
-                    conn, addr = server.accept()
-                    print(f"Accepted connection from {addr[0]}:{addr[1]}")
-                    peer = Peer(addr[0], addr[1], self.torrent, self.peer_id, self.piece_manager, is_seeding=True)
-                    threading.Thread(target=peer.handle_incoming, args=(conn,), daemon=True).start()
-                except socket.timeout:
-                    continue
-                except Exception as e:
-                    print(f"Error accepting connection: {e}")
-        finally:
-            server.close()
-            
+        return successful_peers
+
     def stop(self):
         """Stop the client and clean up."""
         self.running = False
@@ -245,20 +300,17 @@ class Client:
         self.active_peers.clear()
         self.file_manager.close()
         
-    def _handle_peer(self, peer):
-        """Handle communication with a peer."""
-        try:
-            while self.running and not self.download_complete:
-                peer.handle_messages()
-        except Exception as e:
-            print(f"Peer {peer.ip}:{peer.port} error: {str(e)}")
-        finally:
-            try:
-                peer.close()
-            except:
-                pass
-            if (peer.ip, peer.port) in self.active_peers:
-                del self.active_peers[(peer.ip, peer.port)]
+    def _track_peer(self, peer):
+        """Track a connected peer; the reactor drives it until Peer.close() drops it."""
+        self.active_peers[(peer.ip, peer.port)] = peer
+        # The connection may have closed before it was tracked
+        if peer.closed.is_set():
+            self._on_peer_closed(peer)
+
+    def _on_peer_closed(self, peer):
+        """Forget a peer whose connection closed, called from Peer.close()."""
+        if self.active_peers.get((peer.ip, peer.port)) is peer:
+            del self.active_peers[(peer.ip, peer.port)]
                 
     def _manage_downloads(self):
         """Manage piece requests and track progress."""
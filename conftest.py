@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Helpers shared by the peer wire tests: message framing and a local peer listener.
+"""
+
+import socket
+import struct
+import threading
+import time
+
+INFO_HASH = b'i' * 20
+REMOTE_ID = b'-XX0001-abcdefghijkl'
+
+
+def message(message_id, payload=b''):
+    return struct.pack('!IB', len(payload) + 1, message_id) + payload
+
+
+def serve_peer(script, read=True):
+    """
+    Accept one connection, answer the handshake and send script.
+
+    With read=False the connection never reads again after the handshake,
+    like a peer whose receive window has filled up, until done is set.
+
+    Returns:
+        (port, thread, received, done) where received holds the handshake and raw message bytes
+    """
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    received = {'handshake': b'', 'data': bytearray()}
+    done = threading.Event()
+
+    def run():
+        conn, _ = listener.accept()
+        conn.settimeout(2)
+        try:
+            while len(received['handshake']) < 68:
+                received['handshake'] += conn.recv(68 - len(received['handshake']))
+            conn.sendall(bytes([19]) + b'BitTorrent protocol' + bytes(8) + INFO_HASH + REMOTE_ID)
+            for chunk in script:
+                conn.sendall(chunk)
+                time.sleep(0.01)
+            if read:
+                while True:
+                    data = conn.recv(65536)
+                    if not data:
+                        break
+                    received['data'] += data
+            else:
+                done.wait(10)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+            listener.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return listener.getsockname()[1], thread, received, done
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
@@ -30,8 +30,9 @@ from file_manager import FileManager
 class EnhancedBitTorrentClient:
     """Enhanced BitTorrent client with full protocol support."""
     
-    def __init__(self, torrent_path, output_dir="./downloads"):
-        self.torrent = Torrent(torrent_path)
+    def __init__(self, torrent_path, output_dir="./downloads", torrent=None):
+        # Reuse an already parsed torrent rather than decoding and hashing it again
+        self.torrent = torrent if torrent is not None else Torrent(torrent_path)
         self.output_dir = output_dir
         self.file_manager = FileManager(self.torrent, output_dir)
         self.piece_manager = PieceManager(self.torrent, self.file_manager)
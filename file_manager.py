@@ -88,6 +88,25 @@ class FileManager:
                 break
         return block if len(block) == length else None
 
+    def get_block_segments(self, index, begin, length):
+        """Map a block to (path, file_offset, length) segments on disk."""
+        offset = index * self.torrent.piece_length + begin
+        segments = []
+        remaining = length
+        for f in self.files:
+            if offset >= f['offset'] + f['length']:
+                continue
+            if offset < f['offset']:
+                continue
+            file_offset = offset - f['offset']
+            to_read = min(remaining, f['length'] - file_offset)
+            segments.append((f['path'], file_offset, to_read))
+            offset += to_read
+            remaining -= to_read
+            if remaining == 0:
+                break
+        return segments if remaining == 0 else None
+
     def validate_piece(self, index, piece_data):
         """Validate a piece against its hash."""
         if index >= len(self.torrent.piece_hashes):
@@ -10,7 +10,8 @@ import os
 import hashlib
 import threading
 import logging
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 from pathlib import Path
 
 
@@ -31,6 +32,7 @@ class FileManager:
         
         self.file_handles = {}  # {file_path: file_handle}
         self.file_lock = threading.RLock()
+        self.write_executor = None  # Background piece writer, created on first use
         self.logger = logging.getLogger(__name__)
         
         # Create directory structure
@@ -144,6 +146,46 @@ class FileManager:
             self.logger.error(f"Failed to write piece {piece_index}: {e}")
             return False
     
+    def write_piece_async(self, piece_index: int, piece_data: bytes,
+                          callback: Optional[Callable[[int, bool], None]] = None) -> bool:
+        """
+        Queue a completed piece to be written by the background writer thread.
+        
+        Writes are executed in submission order, so callers on network threads
+        never block on disk I/O.
+        
+        Args:
+            piece_index: Index of the piece
+            piece_data: Complete piece data, must not be modified until written
+            callback: Called as callback(piece_index, success) after the write
+            
+        Returns:
+            True if the write was queued, False otherwise
+        """
+        try:
+            with self.file_lock:
+                if self.write_executor is None:
+                    self.write_executor = ThreadPoolExecutor(max_workers=1,
+                                                             thread_name_prefix="piece-writer")
+                
+                self.write_executor.submit(self._write_piece_task, piece_index, piece_data, callback)
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Failed to queue piece {piece_index} for writing: {e}")
+            return False
+    
+    def _write_piece_task(self, piece_index: int, piece_data: bytes,
+                          callback: Optional[Callable[[int, bool], None]]):
+        """Write a queued piece and report the result."""
+        success = self.write_piece(piece_index, piece_data)
+        
+        if callback:
+            try:
+                callback(piece_index, success)
+            except Exception as e:
+                self.logger.error(f"Error in write callback for piece {piece_index}: {e}")
+    
     def read_piece(self, piece_index: int) -> Optional[bytes]:
         """
         Read a piece from disk.
@@ -315,9 +357,12 @@ class FileManager:
                 if not file_info['path'].exists():
                     # Create file
                     with open(file_info['path'], 'wb') as f:
+                        if not file_info['length']:
+                            continue
+                        
                         if not sparse:
-                            # Write zeros to allocate full size
-                            f.write(b'\x00' * file_info['length'])
+                            # Reserve the blocks up front so piece writes never extend the file
+                            self._preallocate(f, file_info['length'])
                         else:
                             # Just seek to end to create sparse file
                             f.seek(file_info['length'] - 1)
@@ -332,8 +377,25 @@ class FileManager:
             self.logger.error(f"Failed to allocate files: {e}")
             return False
     
+    def _preallocate(self, f, length: int):
+        """Allocate disk blocks for a file, falling back to a sparse file."""
+        if hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(f.fileno(), 0, length)
+                return
+            except OSError as e:
+                self.logger.debug(f"fallocate unavailable, creating sparse file: {e}")
+        
+        f.truncate(length)
+    
     def close_all_files(self):
-        """Close all open file handles."""
+        """Finish queued writes and close all open file handles."""
+        with self.file_lock:
+            writer, self.write_executor = self.write_executor, None
+        
+        if writer:
+            writer.shutdown(wait=True)
+        
         with self.file_lock:
             for file_path, file_handle in self.file_handles.items():
                 try:
@@ -9,11 +9,30 @@ Author: BitTorrent CLI Client
 """
 
 import os
+import mmap
+import sys
 import threading
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple
 import logging
 
 
+# Maximum number of files kept memory mapped for reading
+MAX_READ_MAPS = 64
+
+# Files larger than this cannot be mapped in a 32-bit address space
+MMAP_MAX_SIZE = sys.maxsize if sys.maxsize > 2**32 else 2**30
+
+
+def _pwrite(fd: int, data, offset: int) -> int:
+    """Write data at an offset, emulating pwrite where the OS lacks it."""
+    if hasattr(os, 'pwrite'):
+        return os.pwrite(fd, data, offset)
+    
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.write(fd, data)
+
+
 class FileManager:
     """
     Manages file I/O operations for BitTorrent downloads.
@@ -33,8 +52,16 @@ class FileManager:
         self.torrent = torrent
         self.download_dir = download_dir
         
+        # Torrent geometry is fixed for the lifetime of the manager
+        self._piece_length = torrent.piece_length
+        self._num_pieces = torrent.num_pieces
+        self._last_piece_length = torrent.total_length - (self._num_pieces - 1) * self._piece_length
+        self._single_file = torrent.is_single_file()
+        
         # File mapping
         self.file_handles: Dict[str, any] = {}
+        self.write_fds: Dict[str, int] = {}
+        self.read_maps: "OrderedDict[str, mmap.mmap]" = OrderedDict()
         self.file_info: List[Dict] = []
         
         # Threading
@@ -54,7 +81,7 @@ class FileManager:
         # Build file information list
         offset = 0
         
-        if self.torrent.is_single_file():
+        if self._single_file:
             # Single file torrent
             file_path = os.path.join(self.download_dir, self.torrent.name)
             file_info = {
@@ -101,32 +128,33 @@ class FileManager:
         with self.lock:
             try:
                 # Calculate piece offset in the entire torrent
-                piece_offset = piece_index * self.torrent.piece_length
-                remaining_data = piece_data
-                data_offset = 0
+                piece_offset = piece_index * self._piece_length
+                piece_len = len(piece_data)
+                piece_end = piece_offset + piece_len
+                piece_view = memoryview(piece_data)
                 
                 # Find files that this piece spans
                 for file_info in self.file_info:
                     file_start = file_info['offset']
-                    file_end = file_start + file_info['length']
+                    file_length = file_info['length']
+                    file_end = file_start + file_length
                     
                     # Check if piece overlaps with this file
-                    if piece_offset < file_end and piece_offset + len(piece_data) > file_start:
+                    if piece_offset < file_end and piece_end > file_start:
                         # Calculate overlap
-                        write_start = max(0, piece_offset - file_start)
-                        write_end = min(file_info['length'], piece_offset + len(piece_data) - file_start)
+                        write_start = piece_offset - file_start if piece_offset > file_start else 0
+                        write_end = file_length if piece_end > file_end else piece_end - file_start
                         
                         if write_start < write_end:
                             # Calculate data slice
-                            data_start = max(0, file_start - piece_offset)
+                            data_start = file_start - piece_offset if file_start > piece_offset else 0
                             data_end = data_start + (write_end - write_start)
                             
-                            file_data = piece_data[data_start:data_end]
-                            
                             # Write to file
-                            self._write_file_data(file_info['path'], write_start, file_data)
+                            self._write_file_data(file_info, write_start,
+                                                  piece_view[data_start:data_end])
                 
-                self.logger.debug(f"Wrote piece {piece_index} ({len(piece_data)} bytes)")
+                self.logger.debug(f"Wrote piece {piece_index} ({piece_len} bytes)")
                 return True
                 
             except Exception as e:
@@ -145,40 +173,64 @@ class FileManager:
         """
         with self.lock:
             try:
-                piece_length = self.torrent.get_piece_length(piece_index)
-                piece_offset = piece_index * self.torrent.piece_length
-                piece_data = bytearray(piece_length)
-                
-                # Read from files that contain this piece
-                for file_info in self.file_info:
-                    file_start = file_info['offset']
-                    file_end = file_start + file_info['length']
-                    
-                    # Check if piece overlaps with this file
-                    if piece_offset < file_end and piece_offset + piece_length > file_start:
-                        # Calculate overlap
-                        read_start = max(0, piece_offset - file_start)
-                        read_end = min(file_info['length'], piece_offset + piece_length - file_start)
-                        
-                        if read_start < read_end:
-                            # Calculate data position in piece
-                            data_start = max(0, file_start - piece_offset)
-                            data_end = data_start + (read_end - read_start)
-                            
-                            # Read file data
-                            file_data = self._read_file_data(file_info['path'], read_start, read_end - read_start)
-                            
-                            if file_data:
-                                piece_data[data_start:data_end] = file_data
-                            else:
-                                return None
-                
-                return bytes(piece_data)
+                piece_length = self._get_piece_length(piece_index)
+                return self._read_range(piece_index * self._piece_length, piece_length)
                 
             except Exception as e:
                 self.logger.debug(f"Failed to read piece {piece_index}: {e}")
                 return None
     
+    def _read_range(self, offset: int, length: int) -> Optional[bytes]:
+        """
+        Read a contiguous range of torrent data from the files it spans.
+        
+        Args:
+            offset: Offset of the range within the whole torrent
+            length: Length of the range
+            
+        Returns:
+            Range data or None if any part could not be read
+        """
+        range_end = offset + length
+        range_data = bytearray(length)
+        
+        # Read from files that contain this range
+        for file_info in self.file_info:
+            file_start = file_info['offset']
+            file_length = file_info['length']
+            file_end = file_start + file_length
+            
+            # Check if range overlaps with this file
+            if offset < file_end and range_end > file_start:
+                # Calculate overlap
+                read_start = offset - file_start if offset > file_start else 0
+                read_end = file_length if range_end > file_end else range_end - file_start
+                
+                if read_start < read_end:
+                    # Calculate data position in range
+                    read_length = read_end - read_start
+                    data_start = file_start - offset if file_start > offset else 0
+                    
+                    # Read file data
+                    file_data = self._read_file_data(file_info['path'], read_start, read_length,
+                                                     file_length)
+                    
+                    if file_data:
+                        range_data[data_start:data_start + read_length] = file_data
+                    else:
+                        return None
+        
+        return bytes(range_data)
+    
+    def _get_piece_length(self, piece_index: int) -> int:
+        """Get the length of a piece using the cached torrent geometry."""
+        if piece_index < 0 or piece_index >= self._num_pieces:
+            raise IndexError(f"Piece index {piece_index} out of range (0-{self._num_pieces-1})")
+        
+        if piece_index < self._num_pieces - 1:
+            return self._piece_length
+        return self._last_piece_length
+    
     def read_block(self, piece_index: int, block_offset: int, block_length: int) -> Optional[bytes]:
         """
         Read a block from a piece.
@@ -191,51 +243,98 @@ class FileManager:
         Returns:
             Block data or None if read failed
         """
-        # For simplicity, read the entire piece and extract the block
-        piece_data = self.read_piece(piece_index)
-        
-        if piece_data and block_offset + block_length <= len(piece_data):
-            return piece_data[block_offset:block_offset + block_length]
-        
-        return None
+        with self.lock:
+            try:
+                piece_length = self._get_piece_length(piece_index)
+                if block_offset < 0 or block_length <= 0 or block_offset + block_length > piece_length:
+                    return None
+                
+                return self._read_range(piece_index * self._piece_length + block_offset, block_length)
+                
+            except Exception as e:
+                self.logger.debug(f"Failed to read block {piece_index}:{block_offset}: {e}")
+                return None
     
-    def _write_file_data(self, file_path: str, offset: int, data: bytes):
+    def _write_file_data(self, file_info: Dict, offset: int, data):
         """
         Write data to a specific offset in a file.
         
+        Uses a cached descriptor and positional writes, so a piece costs one
+        write per file it spans. Data is flushed to disk on cleanup.
+        
         Args:
-            file_path: Path to the file
+            file_info: File information entry
             offset: Offset within the file
             data: Data to write
         """
-        # Ensure file exists and has correct size
-        if not os.path.exists(file_path):
-            # Create file with correct size
-            file_size = self._get_file_size(file_path)
-            with open(file_path, 'wb') as f:
-                f.seek(file_size - 1)
-                f.write(b'\x00')
-        
-        # Write data at offset
-        with open(file_path, 'r+b') as f:
-            f.seek(offset)
-            f.write(data)
-            f.flush()
-            os.fsync(f.fileno())  # Force write to disk
+        fd = self._get_write_fd(file_info)
+        
+        while data:
+            written = _pwrite(fd, data, offset)
+            data = data[written:]
+            offset += written
     
-    def _read_file_data(self, file_path: str, offset: int, length: int) -> Optional[bytes]:
+    def _get_write_fd(self, file_info: Dict) -> int:
+        """
+        Get a cached writable descriptor for a file, creating it at full size.
+        
+        Args:
+            file_info: File information entry
+            
+        Returns:
+            Open file descriptor
+        """
+        file_path = file_info['path']
+        fd = self.write_fds.get(file_path)
+        if fd is not None:
+            return fd
+        
+        fd = os.open(file_path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            if os.fstat(fd).st_size < file_info['length']:
+                os.ftruncate(fd, file_info['length'])
+        except OSError:
+            os.close(fd)
+            raise
+        
+        self.write_fds[file_path] = fd
+        return fd
+    
+    def _close_write_fds(self):
+        """Flush and close all cached write descriptors."""
+        for file_path, fd in self.write_fds.items():
+            try:
+                os.fsync(fd)
+            except OSError as e:
+                self.logger.warning(f"Failed to sync {file_path}: {e}")
+            finally:
+                os.close(fd)
+        
+        self.write_fds.clear()
+    
+    def _read_file_data(self, file_path: str, offset: int, length: int,
+                        file_length: int = 0) -> Optional[bytes]:
         """
         Read data from a specific offset in a file.
         
+        Fully allocated files are served from a cached read-only memory map;
+        anything else falls back to a plain seek and read.
+        
         Args:
             file_path: Path to the file
             offset: Offset within the file
             length: Length of data to read
+            file_length: Expected size of the file, enables the mmap path
             
         Returns:
             File data or None if read failed
         """
         try:
+            mapped = self._get_mmap(file_path, file_length) if file_length else None
+            if mapped is not None:
+                data = mapped[offset:offset + length]
+                return data if len(data) == length else None
+            
             if not os.path.exists(file_path):
                 return None
             
@@ -252,6 +351,58 @@ class FileManager:
         except Exception:
             return None
     
+    def _get_mmap(self, file_path: str, file_length: int) -> Optional[mmap.mmap]:
+        """
+        Get a cached read-only memory map of a file.
+        
+        Files that are missing, not yet allocated to their full size, or too
+        large to map on this platform are not mapped.
+        
+        Args:
+            file_path: Path to the file
+            file_length: Expected size of the file
+            
+        Returns:
+            Memory map or None if the file should not be mapped
+        """
+        mapped = self.read_maps.get(file_path)
+        if mapped is not None:
+            self.read_maps.move_to_end(file_path)
+            return mapped
+        
+        if file_length > MMAP_MAX_SIZE:
+            return None
+        
+        try:
+            if os.path.getsize(file_path) != file_length:
+                return None
+            
+            with open(file_path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), file_length, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        
+        # Peers request blocks at arbitrary offsets, read-ahead only pollutes the page cache
+        if hasattr(mapped, 'madvise') and hasattr(mmap, 'MADV_RANDOM'):
+            mapped.madvise(mmap.MADV_RANDOM)
+        
+        self.read_maps[file_path] = mapped
+        if len(self.read_maps) > MAX_READ_MAPS:
+            _, oldest = self.read_maps.popitem(last=False)
+            oldest.close()
+        
+        return mapped
+    
+    def _close_read_maps(self):
+        """Close all cached memory maps."""
+        for mapped in self.read_maps.values():
+            try:
+                mapped.close()
+            except Exception:
+                pass
+        
+        self.read_maps.clear()
+    
     def _get_file_size(self, file_path: str) -> int:
         """Get the expected size of a file."""
         for file_info in self.file_info:
@@ -344,6 +495,8 @@ class FileManager:
                     pass
             
             self.file_handles.clear()
+            self._close_read_maps()
+            self._close_write_fds()
             self.logger.debug("File manager cleanup complete")
     
     def get_total_size(self) -> int:
@@ -366,6 +519,9 @@ class FileManager:
     def remove_incomplete_files(self):
         """Remove files that are not completely downloaded."""
         with self.lock:
+            self._close_read_maps()
+            self._close_write_fds()
+            
             for file_info in self.file_info:
                 file_path = file_info['path']
                 expected_size = file_info['length']
@@ -7,13 +7,17 @@ all components and provides a command-line interface.
 """
 
 import argparse
+import atexit
+import heapq
 import signal
 import sys
 import time
 import threading
 import logging
-import random
+import logging.handlers
 import os
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from typing import Optional, Set
 from pathlib import Path
 
@@ -23,14 +27,90 @@ from tracker_client import TrackerManager, TrackerEvent
 from peer_client import PeerManager, PeerConnection, PeerMessage
 from piece_manager_client import PieceManager
 from file_manager_client import FileManager
-from progress_client import ProgressTracker, ProgressDisplay
+from progress_client import ProgressTracker, ProgressDisplay, SIZE_UNITS
+
+# Queue logging shared by every client in the process
+_log_lock = threading.Lock()
+_log_users = 0
+_log_queue_handler = None
+_log_listener = None
+_log_handlers = []
+
+
+def _start_logging(verbose: bool):
+    """
+    Route root logger records through a queue to a listener thread.
+    
+    Records are queued and written by the listener so network and disk
+    threads never block on log output. Only the first client installs the
+    queue and listener, later clients share them.
+    """
+    global _log_users, _log_queue_handler, _log_listener, _log_handlers
+    with _log_lock:
+        _log_users += 1
+        if _log_listener is not None:
+            return
+        
+        root = logging.getLogger()
+        if _log_handlers:
+            # Take back the handlers a previous _stop_logging restored
+            for handler in _log_handlers:
+                root.removeHandler(handler)
+        else:
+            log_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            _log_handlers = [
+                logging.FileHandler('bittorrent_client.log', delay=True),
+                logging.StreamHandler(sys.stdout) if verbose else logging.NullHandler()
+            ]
+            for handler in _log_handlers:
+                handler.setFormatter(log_format)
+        
+        log_queue = queue.SimpleQueue()
+        _log_queue_handler = logging.handlers.QueueHandler(log_queue)
+        _log_queue_handler.setFormatter(logging.Formatter('%(message)s'))
+        root.setLevel(logging.DEBUG if verbose else logging.INFO)
+        root.addHandler(_log_queue_handler)
+        
+        _log_listener = logging.handlers.QueueListener(log_queue, *_log_handlers)
+        _log_listener.start()
+
+
+def _stop_logging():
+    """
+    Release one client's use of the logging queue.
+    
+    When the last client stops, queued records are flushed, the listener
+    thread exits and the root logger writes through the handlers directly.
+    """
+    global _log_users, _log_queue_handler, _log_listener
+    with _log_lock:
+        if _log_users == 0:
+            return
+        _log_users -= 1
+        if _log_users or _log_listener is None:
+            return
+        
+        root = logging.getLogger()
+        root.removeHandler(_log_queue_handler)
+        _log_listener.stop()
+        for handler in _log_handlers:
+            root.addHandler(handler)
+        _log_queue_handler = None
+        _log_listener = None
 
 
 class BitTorrentClient:
     """Main BitTorrent client class."""
     
+    REQUESTS_PER_FILL = 5
+    REQUEST_CLEANUP_INTERVAL = 2
+    ANNOUNCE_RETRY_INTERVAL = 10
+    DISCOVERY_INTERVAL = 30
+    WORKER_STOP_TIMEOUT = 5
+    
     def __init__(self, torrent_path: str, download_dir: str = "./downloads", 
-                 port: int = 6881, max_peers: int = 50, verbose: bool = False):
+                 port: int = 6881, max_peers: int = 50, verbose: bool = False,
+                 napi_us: int = 0, connect_workers: int = 0):
         """
         Initialize BitTorrent client.
         
@@ -40,27 +120,25 @@ class BitTorrentClient:
             port: Port to listen on
             max_peers: Maximum number of peer connections
             verbose: Enable verbose output
+            napi_us: Busy-poll budget in microseconds for peer sockets (0, the default, disables)
+            connect_workers: Threads for concurrent peer connects (0 sizes the pool by max_peers)
         """
         self.torrent_path = torrent_path
         self.download_dir = download_dir
         self.port = port
         self.max_peers = max_peers
         self.verbose = verbose
+        self.napi_us = napi_us
+        self.connect_workers = connect_workers
         
         # Setup logging
-        log_level = logging.DEBUG if verbose else logging.INFO
-        logging.basicConfig(
-            level=log_level,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('bittorrent_client.log'),
-                logging.StreamHandler(sys.stdout) if verbose else logging.NullHandler()
-            ]
-        )
+        _start_logging(verbose)
+        self.logging_started = True
+        atexit.register(self._stop_logging)
         self.logger = logging.getLogger(__name__)
         
         # Generate peer ID
-        self.peer_id = b'-PC0001-' + bytes([random.randint(0, 255) for _ in range(12)])
+        self.peer_id = b'-PC0001-' + os.urandom(12)
         
         # Component initialization
         self.torrent = None
@@ -75,24 +153,37 @@ class BitTorrentClient:
         self.running = False
         self.shutdown_event = threading.Event()
         
-        # Background threads
-        self.announce_thread = None
-        self.peer_discovery_thread = None
-        self.download_thread = None
+        # Background thread running announces, discovery and housekeeping
+        self.event_thread = None
+        self.announce_interval = 1800  # 30 minutes default
+        self.announced = False
+        
+        # Tracker requests run on one worker, which also keeps them serialized,
+        # and peer connects on another, so a slow batch of handshakes never
+        # holds up an announce; neither blocks the event loop, and finished
+        # tracker futures wake it
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tracker")
+        self.connect_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="connect")
+        self._wakeup = threading.Event()
+        self._pending_announce: Optional[Future] = None
+        self._pending_discovery: Optional[Future] = None
+        self._pending_connect: Optional[Future] = None
         
         # Statistics
         self.start_time = None
         self.completion_time = None
+        self._uploaded_total = 0
+        self._uploaded_lock = threading.Lock()
     
     def initialize(self) -> bool:
         """Initialize all client components."""
         try:
-            self.logger.info(f"Initializing BitTorrent client for {self.torrent_path}")
+            self.logger.info("Initializing BitTorrent client for %s", self.torrent_path)
             
             # Parse torrent file
             self.torrent = parse_torrent(self.torrent_path)
-            self.logger.info(f"Loaded torrent: {self.torrent.name}")
-            self.logger.info(f"Size: {self.torrent.total_size:,} bytes ({self.torrent.num_pieces} pieces)")
+            self.logger.info("Loaded torrent: %s", self.torrent.name)
+            self.logger.info("Size: %s bytes (%d pieces)", f"{self.torrent.total_size:,}", self.torrent.num_pieces)
             
             # Initialize file manager
             self.file_manager = FileManager(self.torrent, self.download_dir)
@@ -112,7 +203,7 @@ class BitTorrentClient:
                 self.piece_manager.mark_piece_complete(piece_index)
             
             if existing_pieces:
-                self.logger.info(f"Resuming download: {len(existing_pieces)} pieces already completed")
+                self.logger.info("Resuming download: %d pieces already completed", len(existing_pieces))
             
             # Initialize tracker manager
             self.tracker_manager = TrackerManager(
@@ -126,7 +217,10 @@ class BitTorrentClient:
                 self.torrent.info_hash,
                 self.peer_id,
                 self.torrent.num_pieces,
-                self.max_peers
+                self.max_peers,
+                busy_poll_us=self.napi_us,
+                upload_handler=self._on_bytes_uploaded,
+                connect_workers=self.connect_workers
             )
             
             # Initialize progress tracking
@@ -142,7 +236,7 @@ class BitTorrentClient:
             )
             
             # Allocate files
-            if not self.file_manager.allocate_files(sparse=True):
+            if not self.file_manager.allocate_files(sparse=False):
                 self.logger.error("Failed to allocate files")
                 return False
             
@@ -150,143 +244,300 @@ class BitTorrentClient:
             return True
             
         except Exception as e:
-            self.logger.error(f"Failed to initialize client: {e}")
+            self.logger.error("Failed to initialize client: %s", e)
             return False
     
+    def _on_bytes_uploaded(self, num_bytes: int):
+        """Account for block data sent to a peer."""
+        with self._uploaded_lock:
+            self._uploaded_total += num_bytes
+    
     def _on_piece_completed(self, piece_index: int, piece_data: bytes):
         """Handle completed piece."""
-        # Write piece to disk
-        if self.file_manager.write_piece(piece_index, piece_data):
-            self.logger.debug(f"Piece {piece_index} written to disk")
+        # Write piece to disk off the network thread
+        if not self.file_manager.write_piece_async(piece_index, piece_data, self._on_piece_written):
+            self.logger.error("Failed to queue piece %d for writing", piece_index)
+    
+    def _on_piece_written(self, piece_index: int, success: bool):
+        """Handle a piece write finishing on the writer thread."""
+        if success:
+            # Runs once per piece, skip building the record unless debugging
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Piece %d written to disk", piece_index)
             
             # Notify all peers that we have this piece
-            for peer in self.peer_manager.get_active_peers():
-                peer.send_have(piece_index)
+            self.peer_manager.broadcast_have(piece_index)
         
         else:
-            self.logger.error(f"Failed to write piece {piece_index} to disk")
+            self.logger.error("Failed to write piece %d to disk", piece_index)
     
     def _peer_message_handler(self, peer: PeerConnection, message_id: int, payload):
         """Handle messages from peers."""
         if message_id == PeerMessage.PIECE.value and isinstance(payload, tuple):
             piece_index, block_offset, block_data = payload
             
-            # Add block to piece manager
+            # Add block to piece manager and refill the slot it freed
             self.piece_manager.add_block(piece_index, block_offset, block_data)
+            self._try_fill_peer(peer)
         
-        elif message_id == PeerMessage.HAVE.value:
-            # Peer has a new piece - handled by peer connection itself
-            pass
+        elif message_id in (PeerMessage.UNCHOKE.value, PeerMessage.HAVE.value,
+                            PeerMessage.BITFIELD.value):
+            # Availability or choke state changed - state is updated by the
+            # peer connection itself, schedule requests right away
+            self._try_fill_peer(peer)
+    
+    def _try_fill_peer(self, peer: PeerConnection):
+        """Express interest in a peer and top up its request pipeline."""
+        try:
+            if not peer.state.am_interested and peer.state.pieces_available:
+                peer.send_interested()
+            
+            if peer.can_request():
+                requests = self.piece_manager.get_next_pieces_for_peer(
+                    peer.state.pieces_available, self.REQUESTS_PER_FILL
+                )
+                
+                peer.send_requests_batch(requests)
         
-        elif message_id == PeerMessage.BITFIELD.value:
-            # Peer sent bitfield - handled by peer connection itself
-            pass
+        except Exception as e:
+            self.logger.error("Error scheduling requests for %s:%s: %s", peer.peer_ip, peer.peer_port, e)
     
-    def _announce_loop(self):
-        """Background thread for periodic tracker announces."""
-        announce_interval = 1800  # 30 minutes default
-        last_announce = 0
+    def _event_loop(self):
+        """
+        Run all periodic client work from one thread.
         
-        while self.running and not self.shutdown_event.wait(10):
-            try:
-                current_time = time.time()
-                
-                if current_time - last_announce >= announce_interval:
-                    # Announce to trackers
-                    uploaded = sum(peer.bytes_uploaded for peer in self.peer_manager.get_active_peers())
-                    downloaded = self.piece_manager.get_downloaded_bytes()
-                    left = self.piece_manager.get_remaining_bytes()
-                    
-                    event = TrackerEvent.NONE
-                    if last_announce == 0:
-                        event = TrackerEvent.STARTED
-                    elif left == 0:
-                        event = TrackerEvent.COMPLETED
-                    
-                    responses = self.tracker_manager.announce_to_all(
-                        self.port, uploaded, downloaded, left, event
-                    )
-                    
-                    if responses:
-                        announce_interval = min(resp.interval for resp in responses)
-                        self.logger.debug(f"Next announce in {announce_interval} seconds")
-                    
-                    last_announce = current_time
-                
-            except Exception as e:
-                self.logger.error(f"Error in announce loop: {e}")
+        Each task keeps its next deadline in a min-heap and the thread sleeps
+        until the earliest one, so it only wakes when something is due. A task
+        returns the delay until its next run, or None to stop being scheduled.
+        
+        Announce and discovery only submit their tracker work to the executor
+        and are rescheduled by their collector once the worker finishes.
+        Discovered peers are connected on the connect executor.
+        """
+        tasks = {
+            'progress': self._update_progress,
+            'cleanup': self._cleanup_requests,
+            'announce': self._announce,
+            'discovery': self._discover_peers,
+        }
+        
+        now = time.monotonic()
+        deadlines = [
+            (now + self.progress_display.update_interval, 'progress'),
+            (now + self.REQUEST_CLEANUP_INTERVAL, 'cleanup'),
+            (now + self.ANNOUNCE_RETRY_INTERVAL, 'announce'),
+            (now + self.DISCOVERY_INTERVAL, 'discovery'),
+        ]
+        heapq.heapify(deadlines)
+        collectors = {
+            'announce': self._collect_announce,
+            'discovery': self._collect_discovery,
+        }
+        
+        while self.running and (deadlines or self._pending_announce or self._pending_discovery):
+            timeout = max(0, deadlines[0][0] - time.monotonic()) if deadlines else None
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            if self.shutdown_event.is_set():
+                break
+            
+            # Reschedule tracker work the worker has finished
+            for task, collect in collectors.items():
+                delay = collect()
+                if delay is not None:
+                    heapq.heappush(deadlines, (time.monotonic() + delay, task))
+            
+            while deadlines and deadlines[0][0] <= time.monotonic():
+                _, task = heapq.heappop(deadlines)
+                delay = tasks[task]()
+                if delay is not None:
+                    heapq.heappush(deadlines, (time.monotonic() + delay, task))
     
-    def _peer_discovery_loop(self):
-        """Background thread for discovering and connecting to new peers."""
-        while self.running and not self.shutdown_event.wait(30):
-            try:
-                # Get current number of active peers
-                active_peers = len(self.peer_manager.get_active_peers())
-                
-                if active_peers < self.max_peers:
-                    # Get more peers from trackers
-                    uploaded = sum(peer.bytes_uploaded for peer in self.peer_manager.get_active_peers())
-                    downloaded = self.piece_manager.get_downloaded_bytes()
-                    left = self.piece_manager.get_remaining_bytes()
-                    
-                    new_peers = self.tracker_manager.get_peers(
-                        self.port, uploaded, downloaded, left
-                    )
-                    
-                    # Try to connect to new peers
-                    for peer_ip, peer_port in new_peers[:10]:  # Limit to 10 new peers at once
-                        if len(self.peer_manager.get_active_peers()) >= self.max_peers:
-                            break
-                        
-                        self.peer_manager.add_peer(peer_ip, peer_port, self._peer_message_handler)
-                
-                # Cleanup dead peers
-                self.peer_manager.cleanup_dead_peers()
-                
-            except Exception as e:
-                self.logger.error(f"Error in peer discovery loop: {e}")
+    def _announce(self) -> Optional[float]:
+        """Start the periodic tracker announce, _collect_announce reschedules it."""
+        uploaded = self._uploaded_total
+        downloaded = self.piece_manager.get_downloaded_bytes()
+        left = self.piece_manager.get_remaining_bytes()
+        
+        event = TrackerEvent.NONE
+        if not self.announced:
+            event = TrackerEvent.STARTED
+        elif left == 0:
+            event = TrackerEvent.COMPLETED
+        
+        if not self._submit_announce(uploaded, downloaded, left, event):
+            return self.ANNOUNCE_RETRY_INTERVAL
+        return None
+    
+    def _submit_announce(self, uploaded: int, downloaded: int, left: int,
+                         event: TrackerEvent) -> bool:
+        """
+        Start a tracker announce in the background.
+        
+        Announces are coalesced, nothing is submitted while one is still running.
+        
+        Returns:
+            True if a new announce was submitted
+        """
+        if self._pending_announce is not None:
+            return False
+        
+        try:
+            self._pending_announce = self.executor.submit(
+                self.tracker_manager.announce_to_all, self.port, uploaded, downloaded, left, event
+            )
+        except RuntimeError:
+            # Executor already shut down
+            return False
+        
+        self._pending_announce.add_done_callback(lambda future: self._wakeup.set())
+        return True
+    
+    def _collect_announce(self) -> Optional[float]:
+        """Apply a finished background announce and return the delay until the next one."""
+        future = self._pending_announce
+        if future is None or not future.done():
+            return None
+        
+        self._pending_announce = None
+        try:
+            responses = future.result()
+        except Exception as e:
+            self.logger.error("Error in announce: %s", e)
+            return self.ANNOUNCE_RETRY_INTERVAL
+        
+        if responses:
+            self.announce_interval = min(resp.interval for resp in responses)
+            self.logger.debug("Next announce in %s seconds", self.announce_interval)
+        
+        self.announced = True
+        return self.announce_interval
+    
+    def _discover_peers(self) -> Optional[float]:
+        """Drop dead peers and start fetching new ones, _collect_discovery reschedules it."""
+        try:
+            # Cleanup dead peers
+            self.peer_manager.cleanup_dead_peers()
+            
+            # Get current number of active peers
+            active_peers = len(self.peer_manager.get_active_peers())
+            
+            if active_peers < self.max_peers and self._submit_discovery():
+                return None
+            
+        except Exception as e:
+            self.logger.error("Error in peer discovery: %s", e)
+        
+        return self.DISCOVERY_INTERVAL
+    
+    def _submit_discovery(self) -> bool:
+        """
+        Fetch peers from the trackers in the background.
+        
+        Returns:
+            True if the discovery was submitted
+        """
+        if self._pending_discovery is not None:
+            return False
+        
+        uploaded = self._uploaded_total
+        downloaded = self.piece_manager.get_downloaded_bytes()
+        left = self.piece_manager.get_remaining_bytes()
+        
+        try:
+            self._pending_discovery = self.executor.submit(
+                self.tracker_manager.get_peers, self.port, uploaded, downloaded, left
+            )
+        except RuntimeError:
+            # Executor already shut down
+            return False
+        
+        self._pending_discovery.add_done_callback(lambda future: self._wakeup.set())
+        return True
     
-    def _download_loop(self):
-        """Main download coordination loop."""
-        while self.running and not self.shutdown_event.wait(1):
+    def _collect_discovery(self) -> Optional[float]:
+        """Connect to peers from a finished background discovery and return the delay until the next one."""
+        future = self._pending_discovery
+        if future is None or not future.done():
+            return None
+        
+        self._pending_discovery = None
+        try:
+            new_peers = future.result()
+        except Exception as e:
+            self.logger.error("Error in peer discovery: %s", e)
+            return self.DISCOVERY_INTERVAL
+        
+        # Try to connect to new peers, unless the last batch is still connecting
+        if new_peers and (self._pending_connect is None or self._pending_connect.done()):
             try:
-                # Update progress
-                active_peers = self.peer_manager.get_active_peers()
-                downloaded = self.piece_manager.get_downloaded_bytes()
-                uploaded = sum(peer.bytes_uploaded for peer in active_peers)
-                completed_pieces = len(self.piece_manager.completed_pieces)
-                
-                self.progress_tracker.update_progress(
-                    downloaded, uploaded, completed_pieces, len(active_peers)
+                self._pending_connect = self.connect_executor.submit(
+                    self.peer_manager.add_peers, new_peers[:10], self._peer_message_handler  # Limit to 10 new peers at once
                 )
-                
-                # Check if download is complete
-                if self.piece_manager.is_complete():
-                    self.logger.info("Download completed!")
-                    self.completion_time = time.time()
-                    break
-                
-                # Request blocks from peers
-                for peer in active_peers:
-                    if peer.can_request():
-                        # Get blocks to request
-                        requests = self.piece_manager.get_next_pieces_for_peer(
-                            peer.state.pieces_available, 5
-                        )
-                        
-                        for piece_index, block_offset, block_length in requests:
-                            peer.send_request(piece_index, block_offset, block_length)
-                
-                # Send interested message to new peers
-                for peer in active_peers:
-                    if not peer.state.am_interested and peer.state.pieces_available:
-                        peer.send_interested()
-                
-                # Cleanup expired requests
-                self.piece_manager.cleanup_expired_requests()
-                
-            except Exception as e:
-                self.logger.error(f"Error in download loop: {e}")
+                self._pending_connect.add_done_callback(self._on_peers_connected)
+            except RuntimeError:
+                # Executor already shut down
+                pass
+        
+        return self.DISCOVERY_INTERVAL
+    
+    def _on_peers_connected(self, future: Future):
+        """Log the outcome of a batch of peer connects (runs on the connect worker)."""
+        if future.cancelled():
+            return
+        
+        try:
+            added = future.result()
+            if added:
+                self.logger.debug("Connected to %d new peers", added)
+        except Exception as e:
+            self.logger.error("Error connecting to peers: %s", e)
+    
+    def _update_progress(self) -> Optional[float]:
+        """
+        Progress display and completion tracking.
+        
+        Requests are sent from _peer_message_handler as soon as a peer unchokes
+        us or delivers a block, periodic work only tracks progress and recovers
+        timed out requests.
+        """
+        try:
+            active_peers = self.peer_manager.get_active_peers()
+            downloaded = self.piece_manager.get_downloaded_bytes()
+            uploaded = self._uploaded_total
+            completed_pieces = self.piece_manager.pieces_completed
+            
+            self.progress_tracker.update_progress(
+                downloaded, uploaded, completed_pieces, len(active_peers)
+            )
+            self.progress_display.render_once()
+            
+            # Check if download is complete
+            if self.piece_manager.is_complete():
+                self.logger.info("Download completed!")
+                self.completion_time = time.time()
+                return None
+            
+        except Exception as e:
+            self.logger.error("Error updating progress: %s", e)
+        
+        return self.progress_display.update_interval
+    
+    def _cleanup_requests(self) -> Optional[float]:
+        """Cleanup expired requests and reissue them."""
+        if self.piece_manager.is_complete():
+            return None
+        
+        try:
+            self.piece_manager.cleanup_expired_requests()
+            
+            for peer in self.peer_manager.get_active_peers():
+                self._try_fill_peer(peer)
+            
+        except Exception as e:
+            self.logger.error("Error cleaning up requests: %s", e)
+        
+        return self.REQUEST_CLEANUP_INTERVAL
     
     def start(self):
         """Start the BitTorrent client."""
@@ -297,18 +548,17 @@ class BitTorrentClient:
         self.running = True
         self.start_time = time.time()
         
+        # Turn SIGINT/SIGTERM into a graceful shutdown, handlers can only be set from the main thread
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self._signal_handler)
+            signal.signal(signal.SIGTERM, self._signal_handler)
+        
         # Start progress display
         self.progress_display.start()
         
-        # Start background threads
-        self.announce_thread = threading.Thread(target=self._announce_loop, daemon=True)
-        self.announce_thread.start()
-        
-        self.peer_discovery_thread = threading.Thread(target=self._peer_discovery_loop, daemon=True)
-        self.peer_discovery_thread.start()
-        
-        self.download_thread = threading.Thread(target=self._download_loop, daemon=True)
-        self.download_thread.start()
+        # Start background thread
+        self.event_thread = threading.Thread(target=self._event_loop, daemon=True)
+        self.event_thread.start()
         
         self.logger.info("BitTorrent client started successfully")
     
@@ -320,15 +570,24 @@ class BitTorrentClient:
         self.logger.info("Stopping BitTorrent client...")
         self.running = False
         self.shutdown_event.set()
+        self._wakeup.set()
         
         # Stop progress display
         if self.progress_display:
             self.progress_display.stop()
         
+        # Drop queued tracker work and connects, and give running ones a bounded
+        # wait so a slow tracker or handshake cannot hold up shutdown
+        pending = [future for future in (self._pending_announce, self._pending_discovery, self._pending_connect)
+                   if future is not None]
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.connect_executor.shutdown(wait=False, cancel_futures=True)
+        wait(pending, timeout=self.WORKER_STOP_TIMEOUT)
+        
         # Announce stopped to trackers
         if self.tracker_manager and self.piece_manager:
             try:
-                uploaded = sum(peer.bytes_uploaded for peer in self.peer_manager.get_active_peers())
+                uploaded = self._uploaded_total
                 downloaded = self.piece_manager.get_downloaded_bytes()
                 left = self.piece_manager.get_remaining_bytes()
                 
@@ -336,22 +595,36 @@ class BitTorrentClient:
                     self.port, uploaded, downloaded, left, TrackerEvent.STOPPED
                 )
             except Exception as e:
-                self.logger.error(f"Error announcing stop: {e}")
+                self.logger.error("Error announcing stop: %s", e)
         
         # Disconnect all peers
         if self.peer_manager:
+            self.peer_manager.stop_receiving()
             self.peer_manager.disconnect_all()
         
         # Close file handles
         if self.file_manager:
             self.file_manager.close_all_files()
         
-        # Wait for threads to finish
-        for thread in [self.announce_thread, self.peer_discovery_thread, self.download_thread]:
-            if thread and thread.is_alive():
-                thread.join(timeout=5)
+        # Wait for the background thread to finish
+        if self.event_thread and self.event_thread.is_alive():
+            self.event_thread.join(timeout=5)
         
         self.logger.info("BitTorrent client stopped")
+        self._stop_logging()
+    
+    def _stop_logging(self):
+        """Release this client's share of the logging queue, once."""
+        if self.logging_started:
+            self.logging_started = False
+            atexit.unregister(self._stop_logging)
+            _stop_logging()
+    
+    def _signal_handler(self, signum, frame):
+        """Handle interrupt signals."""
+        print("\nReceived interrupt signal. Shutting down gracefully...")
+        # The main loop will see the event and shut down properly
+        self.shutdown_event.set()
     
     def run(self):
         """Run the client until completion or interruption."""
@@ -364,7 +637,8 @@ class BitTorrentClient:
                     self.progress_display.print_final_summary()
                     break
                 
-                time.sleep(1)
+                if self.shutdown_event.wait(1):
+                    break
         
         except KeyboardInterrupt:
             self.logger.info("Received interrupt signal")
@@ -373,14 +647,35 @@ class BitTorrentClient:
             self.stop()
 
 
-def signal_handler(signum, frame):
-    """Handle interrupt signals."""
-    print("\nReceived interrupt signal. Shutting down gracefully...")
-    # The main loop will catch this and shut down properly
+def format_size(size) -> str:
+    """Format size in bytes to human readable string."""
+    # Each unit is 10 bits wide, so the bit length picks the unit directly
+    scale = min(max(0, (int(size).bit_length() - 1) // 10), len(SIZE_UNITS) - 1)
+    return f"{size / (1 << (10 * scale)):.2f} {SIZE_UNITS[scale]}"
 
 
-def main():
-    """Main entry point."""
+def print_torrent_info(torrent: TorrentFile):
+    """Print torrent metadata."""
+    print("\n=== Torrent Information ===")
+    print(f"Name: {torrent.name}")
+    print(f"Size: {format_size(torrent.total_size)}")
+    print(f"Pieces: {torrent.num_pieces} ({format_size(torrent.piece_length)} each)")
+    
+    if torrent.announce_list:
+        print(f"Tracker: {torrent.announce_list[0]}")
+        if len(torrent.announce_list) > 1:
+            print(f"Additional trackers: {len(torrent.announce_list) - 1} backup trackers available")
+    
+    if torrent.is_multi_file():
+        print(f"\nFiles ({len(torrent.files)} total):")
+        for file_info in torrent.files[:10]:  # Show first 10 files
+            print(f"  {file_info['path']} ({format_size(file_info['length'])})")
+        if len(torrent.files) > 10:
+            print(f"  ... and {len(torrent.files) - 10} more files")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser."""
     parser = argparse.ArgumentParser(
         description="BitTorrent CLI Client",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -389,20 +684,34 @@ Examples:
   python main.py example.torrent
   python main.py example.torrent -d /home/user/downloads
   python main.py example.torrent -p 6882 -m 100 -v
+  python main.py --torrent example.torrent --info
         """
     )
     
     parser.add_argument(
         "torrent_file",
+        nargs="?",
         help="Path to .torrent file"
     )
     
     parser.add_argument(
-        "-d", "--download-dir",
+        "--torrent",
+        help="Path to .torrent file (alternative to the positional argument)"
+    )
+    
+    parser.add_argument(
+        "-d", "--download-dir", "-o", "--output",
+        dest="download_dir",
         default="./downloads",
         help="Directory to download files to (default: ./downloads)"
     )
     
+    parser.add_argument(
+        "-i", "--info",
+        action="store_true",
+        help="Show torrent info only"
+    )
+    
     parser.add_argument(
         "-p", "--port",
         type=int,
@@ -417,33 +726,75 @@ Examples:
         help="Maximum number of peer connections (default: 50)"
     )
     
+    parser.add_argument(
+        "--napi-us",
+        type=int,
+        default=0,
+        help="Busy-poll budget in microseconds for peer sockets, spins a CPU while "
+             "waiting for data; 0 disables (default: 0)"
+    )
+    
+    parser.add_argument(
+        "--connect-workers",
+        type=int,
+        default=0,
+        help="Threads used to connect to peers concurrently, 0 uses max peers (default: 0)"
+    )
+    
     parser.add_argument(
         "-v", "--verbose",
         action="store_true",
         help="Enable verbose output"
     )
     
-    args = parser.parse_args()
+    return parser
+
+
+_parser = None
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """Return the command line parser, building it on first use."""
+    global _parser
+    if _parser is None:
+        _parser = build_parser()
+    return _parser
+
+
+def main(argv: Optional[list] = None):
+    """Main entry point."""
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    
+    torrent_file = args.torrent_file or args.torrent
+    if not torrent_file:
+        parser.error("a torrent file is required")
     
     # Validate torrent file
-    if not os.path.exists(args.torrent_file):
-        print(f"Error: Torrent file '{args.torrent_file}' not found")
+    if not os.path.exists(torrent_file):
+        print(f"Error: Torrent file '{torrent_file}' not found")
         sys.exit(1)
     
+    if args.info:
+        try:
+            print_torrent_info(parse_torrent(torrent_file))
+        except Exception as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        return
+    
     # Create download directory
     Path(args.download_dir).mkdir(parents=True, exist_ok=True)
     
-    # Setup signal handlers
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-    
     # Create and run client
     client = BitTorrentClient(
-        torrent_path=args.torrent_file,
+        torrent_path=torrent_file,
         download_dir=args.download_dir,
         port=args.port,
         max_peers=args.max_peers,
-        verbose=args.verbose
+        verbose=args.verbose,
+        napi_us=args.napi_us,
+        connect_workers=args.connect_workers
     )
     
     if not client.initialize():
@@ -452,7 +803,7 @@ Examples:
     
     print(f"BitTorrent CLI Client")
     print(f"====================")
-    print(f"Torrent file: {args.torrent_file}")
+    print(f"Torrent file: {torrent_file}")
     print(f"Download directory: {args.download_dir}")
     print(f"Port: {args.port}")
     print(f"Max peers: {args.max_peers}")
@@ -16,10 +16,11 @@ import os
 import sys
 import argparse
 import signal
+import stat
 import time
 import threading
 import logging
-from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Optional
 
 # Import our complete modules
@@ -31,6 +32,10 @@ from file_manager_complete import FileManager
 from progress_complete import ProgressTracker, FileProgressTracker
 
 
+# Azureus-style client prefix for our peer ID, PC for Python Client
+PEER_ID_PREFIX = b'-PC0001-'
+
+
 class BitTorrentClient:
     """
     Complete BitTorrent client implementation.
@@ -51,7 +56,7 @@ class BitTorrentClient:
             port: Local port for peer connections
         """
         self.torrent_file = torrent_file
-        self.download_dir = Path(download_dir)
+        self.download_dir = os.path.abspath(download_dir)  # Resolved once, used as a plain string
         self.max_peers = max_peers
         self.port = port
         
@@ -68,13 +73,22 @@ class BitTorrentClient:
         self.running = False
         self.completed = False
         self.shutdown_event = threading.Event()
+        self._wakeup = threading.Event()  # Set on piece completion, peer loss, announce results and shutdown
+        
+        # One worker pool for peer connects and tracker announces. A session only
+        # connects and handshakes before the reactor takes over, but a tracker
+        # batch can fill every peer slot at once and a dead address holds its
+        # worker for the whole handshake timeout, so keep a worker per slot so
+        # those connects run side by side, plus a few for announces
+        self.executor = ThreadPoolExecutor(max_workers=max_peers + 4, thread_name_prefix="bt")
+        self._pending_announce: Optional[Future] = None
+        self._pending_event: Optional[str] = None
         
         # Setup logging
         self.logger = logging.getLogger("BitTorrentClient")
         
         # Generate peer ID (20 bytes, often starts with client identifier)
-        import secrets
-        self.peer_id = b'-PC0001-' + secrets.token_bytes(12)  # PC for Python Client
+        self.peer_id = PEER_ID_PREFIX + os.urandom(12)
         
         # Setup signal handlers
         signal.signal(signal.SIGINT, self._signal_handler)
@@ -94,26 +108,23 @@ class BitTorrentClient:
         """
         try:
             # Parse torrent file
-            self.logger.info(f"Loading torrent: {self.torrent_file}")
+            self.logger.info("Loading torrent: %s", self.torrent_file)
             self.torrent = Torrent(self.torrent_file)
             
             if not self.torrent.info_hash:
                 self.logger.error("Failed to parse torrent file")
                 return False
             
-            self.logger.info(f"Torrent loaded: {self.torrent.name}")
-            self.logger.info(f"Info hash: {self.torrent.info_hash.hex()}")
-            self.logger.info(f"Total size: {self.torrent.total_length / (1024*1024):.2f} MB")
-            self.logger.info(f"Pieces: {len(self.torrent.pieces)}")
+            self.logger.info("Torrent loaded: %s", self.torrent.name)
+            self.logger.info("Info hash: %s", self.torrent.info_hash_hex)
+            self.logger.info("Total size: %.2f MB", self.torrent.total_length / (1024*1024))
+            self.logger.info("Pieces: %d", self.torrent.num_pieces)
             
-            # Create download directory
-            self.download_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Initialize file manager
-            self.file_manager = FileManager(self.torrent, str(self.download_dir))
+            # Initialize file manager, this also creates the download directory
+            self.file_manager = FileManager(self.torrent, self.download_dir)
             
             # Initialize piece manager
-            self.piece_manager = PieceManager(self.torrent, self.file_manager)
+            self.piece_manager = PieceManager(self.torrent, self.file_manager, wakeup=self._wakeup)
             
             # Initialize tracker manager
             self.tracker_manager = TrackerManager(self.torrent, self.peer_id, self.port)
@@ -123,7 +134,11 @@ class BitTorrentClient:
                 self.torrent, 
                 self.piece_manager, 
                 self.port,
-                max_peers=self.max_peers
+                max_peers=self.max_peers,
+                wakeup=self._wakeup,
+                executor=self.executor,
+                peer_id=self.peer_id,
+                file_manager=self.file_manager
             )
             
             # Initialize progress tracking
@@ -131,12 +146,15 @@ class BitTorrentClient:
             
             if len(self.torrent.files) > 1:
                 self.file_progress = FileProgressTracker(self.torrent)
+                self._tick_progress = self._tick_progress_multi
+            else:
+                self._tick_progress = self._tick_progress_single
             
             self.logger.info("Client initialization complete")
             return True
             
         except Exception as e:
-            self.logger.error(f"Initialization failed: {e}")
+            self.logger.error("Initialization failed: %s", e)
             return False
     
     def start(self) -> bool:
@@ -159,24 +177,15 @@ class BitTorrentClient:
             # Start peer manager
             self.peer_manager.start()
             
-            # Get initial peers from trackers
+            # Get initial peers from trackers, the download loop picks them up
             self.logger.info("Connecting to trackers...")
-            peers = self.tracker_manager.announce(event='started')
-            
-            if not peers:
-                self.logger.warning("No peers found from trackers")
-            else:
-                self.logger.info(f"Found {len(peers)} peers from trackers")
-                
-                # Add peers to manager
-                for ip, port in peers:
-                    self.peer_manager.add_peer(ip, port)
+            self._submit_announce(event='started')
             
             # Main download loop
             return self._download_loop()
             
         except Exception as e:
-            self.logger.error(f"Download failed: {e}")
+            self.logger.error("Download failed: %s", e)
             return False
         finally:
             self.stop()
@@ -193,22 +202,49 @@ class BitTorrentClient:
         
         last_progress_update = 0
         progress_interval = 1.0  # 1 second
+        last_piece_version = -1
+        last_peer_version = -1
+        
+        peer_retry_interval = min(30, tracker_interval)  # Minimum gap between announces while peerless
+        
+        # Bind per-iteration lookups once
+        _time = time.time
+        
+        # The 'started' announce counts as the first peer retry
+        last_peer_retry = _time()
+        _is_set = self.shutdown_event.is_set
+        _is_complete = self.piece_manager.is_complete
+        _tick_progress = self._tick_progress
+        _wait = self._wakeup.wait
+        _clear = self._wakeup.clear
+        piece_manager = self.piece_manager
+        peer_manager = self.peer_manager
+        progress_tracker = self.progress_tracker
+        file_progress = self.file_progress
         
-        while self.running and not self.shutdown_event.is_set():
+        while self.running and not _is_set():
             try:
-                current_time = time.time()
+                current_time = _time()
                 
-                # Update progress
+                # Update progress when pieces or peers changed, or the rate is still decaying
                 if current_time - last_progress_update >= progress_interval:
-                    self.progress_tracker.update(self.piece_manager, self.peer_manager)
+                    piece_version = piece_manager.state_version
+                    peer_version = peer_manager.state_version
                     
-                    if self.file_progress:
-                        self.file_progress.update_file_progress(self.piece_manager)
+                    if (piece_version != last_piece_version or peer_version != last_peer_version or
+                            progress_tracker.download_rate > 0):
+                        _tick_progress()
+                        
+                        last_piece_version = piece_version
+                        last_peer_version = peer_version
                     
                     last_progress_update = current_time
                 
+                # Pick up peers from a finished background announce
+                self._collect_announce()
+                
                 # Check if download is complete
-                if self.piece_manager.is_complete():
+                if _is_complete():
                     self.logger.info("Download completed!")
                     self.completed = True
                     
@@ -218,43 +254,92 @@ class BitTorrentClient:
                     # Show final summary
                     self.progress_tracker.print_summary()
                     
-                    if self.file_progress:
-                        self.file_progress.print_file_status()
+                    if file_progress:
+                        file_progress.print_file_status()
                     
                     return True
                 
                 # Periodic tracker updates
                 if current_time - last_tracker_update >= tracker_interval:
-                    new_peers = self.tracker_manager.announce()
-                    
-                    if new_peers:
-                        self.logger.debug(f"Got {len(new_peers)} peers from tracker update")
-                        for ip, port in new_peers:
-                            self.peer_manager.add_peer(ip, port)
-                    
+                    self._submit_announce()
                     last_tracker_update = current_time
                 
                 # Check peer manager health
-                if len(self.peer_manager.connected_peers) == 0:
+                # Only a newly submitted announce restarts the retry window
+                connected_peers = peer_manager.connected_peers
+                if (not connected_peers and
+                        current_time - last_peer_retry >= peer_retry_interval and
+                        self._submit_announce()):
                     self.logger.warning("No connected peers, trying to get more from trackers...")
-                    new_peers = self.tracker_manager.announce()
-                    
-                    if new_peers:
-                        for ip, port in new_peers:
-                            self.peer_manager.add_peer(ip, port)
+                    last_peer_retry = current_time
                 
-                # Sleep briefly to avoid busy waiting
-                time.sleep(0.1)
+                # Sleep until the next deadline or until a piece completes,
+                # the last peer drops or shutdown is requested
+                now = _time()
+                timeout = min(tracker_interval - (now - last_tracker_update),
+                              progress_interval - (now - last_progress_update))
+                _wait(timeout=max(0.05, timeout))
+                _clear()
                 
             except KeyboardInterrupt:
                 self.logger.info("Download interrupted by user")
                 break
             except Exception as e:
-                self.logger.error(f"Download loop error: {e}")
+                self.logger.error("Download loop error: %s", e)
                 break
         
         return self.completed
     
+    def _tick_progress_single(self):
+        """Refresh download progress for a single-file torrent."""
+        self.progress_tracker.update(self.piece_manager, self.peer_manager)
+    
+    def _tick_progress_multi(self):
+        """Refresh download and per-file progress for a multi-file torrent."""
+        self.progress_tracker.update(self.piece_manager, self.peer_manager)
+        self.file_progress.update_file_progress(self.piece_manager)
+    
+    def _submit_announce(self, event: Optional[str] = None) -> bool:
+        """
+        Start a tracker announce in the background.
+        
+        Announces are coalesced, nothing is submitted while one is still running.
+        
+        Returns:
+            True if a new announce was submitted
+        """
+        if self._pending_announce is not None and not self._pending_announce.done():
+            return False
+        
+        self._pending_event = event
+        self._pending_announce = self.executor.submit(self.tracker_manager.announce, event=event)
+        self._pending_announce.add_done_callback(lambda future: self._wakeup.set())
+        return True
+    
+    def _collect_announce(self):
+        """Add peers returned by a finished background announce."""
+        future = self._pending_announce
+        if future is None or not future.done():
+            return
+        
+        self._pending_announce = None
+        try:
+            new_peers = future.result()
+        except Exception as e:
+            self.logger.warning("Tracker announce failed: %s", e)
+            return
+        
+        if self._pending_event == 'started':
+            if not new_peers:
+                self.logger.warning("No peers found from trackers")
+            else:
+                self.logger.info("Found %d peers from trackers", len(new_peers))
+        elif new_peers:
+            self.logger.debug("Got %d peers from tracker update", len(new_peers))
+        
+        if new_peers:
+            self.peer_manager.add_peers(new_peers)
+    
     def stop(self):
         """Stop the BitTorrent client and cleanup."""
         if not self.running:
@@ -263,6 +348,7 @@ class BitTorrentClient:
         self.logger.info("Stopping BitTorrent client...")
         self.running = False
         self.shutdown_event.set()
+        self._wakeup.set()
         
         # Stop components in reverse order
         if self.progress_tracker:
@@ -278,6 +364,12 @@ class BitTorrentClient:
             except Exception as e:
                 self.logger.debug(f"Failed to send stopped event: {e}")
         
+        # Drop queued work and wait for running tasks to wind down
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        
+        if self.file_manager:
+            self.file_manager.cleanup()
+        
         self.logger.info("Client stopped")
     
     def get_status(self) -> dict:
@@ -310,22 +402,30 @@ def setup_logging(level: str = "INFO", log_file: Optional[str] = None):
     """
     Setup logging configuration.
     
+    Replaces any handlers installed by an earlier call, so repeated setup
+    does not stack duplicate handlers on the root logger.
+    
     Args:
         level: Logging level (DEBUG, INFO, WARNING, ERROR)
         log_file: Optional log file path
     """
-    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    
+    root.setLevel(getattr(logging, level.upper()))
     
     handlers = [logging.StreamHandler(sys.stdout)]
     
     if log_file:
         handlers.append(logging.FileHandler(log_file))
     
-    logging.basicConfig(
-        level=getattr(logging, level.upper()),
-        format=log_format,
-        handlers=handlers
-    )
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
 
 
 def main():
@@ -386,11 +486,19 @@ Examples:
     
     args = parser.parse_args()
     
-    # Validate torrent file
-    if not os.path.exists(args.torrent_file):
+    # Validate torrent file with a single stat
+    try:
+        torrent_stat = os.stat(args.torrent_file)
+    except OSError:
         print(f"Error: Torrent file '{args.torrent_file}' not found")
         return 1
     
+    if not stat.S_ISREG(torrent_stat.st_mode):
+        print(f"Error: '{args.torrent_file}' is not a file")
+        return 1
+    
+    torrent_file = os.path.abspath(args.torrent_file)
+    
     # Setup logging
     if args.quiet:
         log_level = "ERROR"
@@ -401,14 +509,14 @@ Examples:
     
     # Create and start client
     client = BitTorrentClient(
-        torrent_file=args.torrent_file,
+        torrent_file=torrent_file,
         download_dir=args.download_dir,
         max_peers=args.max_peers,
         port=args.port
     )
     
-    print(f"BitTorrent Client - Starting download of {args.torrent_file}")
-    print(f"Download directory: {os.path.abspath(args.download_dir)}")
+    print(f"BitTorrent Client - Starting download of {args.torrent_file} ({torrent_stat.st_size} bytes)")
+    print(f"Download directory: {client.download_dir}")
     print(f"Max peers: {args.max_peers}, Port: {args.port}")
     print("Press Ctrl+C to stop\n")
     
@@ -7,11 +7,20 @@ Supports HTTP/HTTPS trackers, UDP trackers, DHT, PEX, WebSeeds, and more.
 import sys
 import os
 import argparse
+import re
 import time
 from pathlib import Path
 
+# Tracker URL scheme -> tracker type shown in the analysis
+TRACKER_SCHEME = re.compile(r'(https?|udp|wss?)://')
+TRACKER_TYPES = {'http': 'HTTP', 'https': 'HTTPS', 'udp': 'UDP', 'ws': 'WebSocket', 'wss': 'WebSocket'}
+
 def analyze_torrent(torrent_path):
-    """Analyze torrent file and show detailed information."""
+    """
+    Analyze torrent file and show detailed information.
+    
+    Returns (success, torrent) so the download can reuse the parsed torrent.
+    """
     try:
         from torrent import Torrent
         
@@ -25,7 +34,7 @@ def analyze_torrent(torrent_path):
         print(f"📁 Name: {torrent.name}")
         print(f"📊 Size: {torrent.total_length / (1024**3):.2f} GB ({torrent.total_length:,} bytes)")
         print(f"🧩 Pieces: {torrent.num_pieces:,} pieces ({torrent.piece_length / (1024**2):.2f} MB each)")
-        print(f"🔑 Info Hash: {torrent.info_hash.hex() if isinstance(torrent.info_hash, bytes) else torrent.info_hash}")
+        print(f"🔑 Info Hash: {torrent.info_hash_hex}")
         
         # Files
         if hasattr(torrent, 'files') and torrent.files:
@@ -51,20 +60,13 @@ def analyze_torrent(torrent_path):
         total_trackers = 1
         
         if hasattr(torrent, 'announce_list') and torrent.announce_list:
-            total_trackers = sum(len(tier) for tier in torrent.announce_list)
+            trackers = [tracker for tier in torrent.announce_list for tracker in tier]
+            total_trackers = len(trackers)
             print(f"📋 Backup Trackers: {total_trackers - 1} additional trackers")
             
             print("\n🌐 Tracker Types Found:")
-            for tier in torrent.announce_list:
-                for tracker in tier:
-                    if tracker.startswith('http://'):
-                        tracker_types.add('HTTP')
-                    elif tracker.startswith('https://'):
-                        tracker_types.add('HTTPS') 
-                    elif tracker.startswith('udp://'):
-                        tracker_types.add('UDP')
-                    elif tracker.startswith('ws://') or tracker.startswith('wss://'):
-                        tracker_types.add('WebSocket')
+            match = TRACKER_SCHEME.match
+            tracker_types = {TRACKER_TYPES[m.group(1)] for m in map(match, trackers) if m}
             
             for tracker_type in sorted(tracker_types):
                 if tracker_type == 'UDP':
@@ -121,14 +123,14 @@ def analyze_torrent(torrent_path):
         else:
             print("⚠️  Poor - May have difficulty downloading")
         
-        return True
+        return True, torrent
         
     except Exception as e:
         print(f"❌ Error analyzing torrent: {e}")
-        return False
+        return False, None
 
-def download_with_enhanced_client(torrent_path, output_dir):
-    """Download using the enhanced client."""
+def download_with_enhanced_client(torrent_path, output_dir, torrent=None):
+    """Download using the enhanced client, reusing a parsed torrent if given."""
     try:
         from enhanced_client import EnhancedBitTorrentClient
         
@@ -139,7 +141,7 @@ def download_with_enhanced_client(torrent_path, output_dir):
         os.makedirs(output_dir, exist_ok=True)
         
         # Create and start client
-        client = EnhancedBitTorrentClient(torrent_path, output_dir)
+        client = EnhancedBitTorrentClient(torrent_path, output_dir, torrent=torrent)
         success = client.start_download()
         
         if success:
@@ -151,14 +153,14 @@ def download_with_enhanced_client(torrent_path, output_dir):
             
     except ImportError:
         print("⚠️  Enhanced client not available, falling back to standard client...")
-        return download_with_standard_client(torrent_path, output_dir)
+        return download_with_standard_client(torrent_path, output_dir, torrent)
     except Exception as e:
         print(f"❌ Enhanced client error: {e}")
         print("⚠️  Falling back to standard client...")
-        return download_with_standard_client(torrent_path, output_dir)
+        return download_with_standard_client(torrent_path, output_dir, torrent)
 
-def download_with_standard_client(torrent_path, output_dir):
-    """Download using the standard client."""
+def download_with_standard_client(torrent_path, output_dir, torrent=None):
+    """Download using the standard client, reusing a parsed torrent if given."""
     try:
         from client import Client
         
@@ -167,7 +169,7 @@ def download_with_standard_client(torrent_path, output_dir):
         
         os.makedirs(output_dir, exist_ok=True)
         
-        client = Client(torrent_path, output_dir, seed=False)
+        client = Client(torrent_path, output_dir, seed=False, torrent=torrent)
         client.start()
         return True
         
@@ -207,7 +209,8 @@ Examples:
     
     # Analyze torrent
     print("🔍 Analyzing torrent file...")
-    if not analyze_torrent(args.torrent):
+    analyzed, torrent = analyze_torrent(args.torrent)
+    if not analyzed:
         return 1
     
     # If only analyzing, exit here
@@ -220,12 +223,12 @@ Examples:
     
     # Choose client
     if args.standard:
-        success = download_with_standard_client(args.torrent, args.output)
+        success = download_with_standard_client(args.torrent, args.output, torrent)
     elif args.enhanced:
-        success = download_with_enhanced_client(args.torrent, args.output)
+        success = download_with_enhanced_client(args.torrent, args.output, torrent)
     else:
         # Auto-select best client
-        success = download_with_enhanced_client(args.torrent, args.output)
+        success = download_with_enhanced_client(args.torrent, args.output, torrent)
     
     return 0 if success else 1
 
@@ -1,15 +1,201 @@
 # peer.py: Handles peer connections, handshakes, and message exchange.
 
+import logging
+import os
+import selectors
 import socket
 import struct
 import threading
-from bitstring import BitArray
+import time
+from collections import deque
 from utils import pack_handshake, unpack_handshake, PROTOCOL_STR, BLOCK_SIZE
-from pubsub import pub
+
+# Per-message tracing, off unless DEBUG logging is enabled for this module
+logger = logging.getLogger(__name__)
+
+# Initial receive buffer per peer, room for several 16 KiB block messages
+RECV_BUFFER_SIZE = 1 << 16
+
+# Complete messages handled per reactor turn, so one fast peer cannot starve the rest
+MESSAGE_BUDGET = 25
+
+# Kernel socket buffers sized for a high bandwidth-delay peer link
+SOCKET_BUFFER_SIZE = 1 << 20
+
+# Precompiled wire formats
+MESSAGE_LENGTH = struct.Struct('!I')
+MESSAGE_HEADER = struct.Struct('!IB')
+PIECE_HEADER = struct.Struct('!II')
+REQUEST_PAYLOAD = struct.Struct('!III')
+# Whole 17-byte request message: length 13, id 6, index, begin, length
+REQUEST_MESSAGE = struct.Struct('!IBIII')
+
+# Zero-copy uploads; without it block data is read into memory and queued
+HAS_SENDFILE = hasattr(os, 'sendfile')
+
+class PeerReactor:
+    """One event loop thread that reads from and writes to every connected peer socket.
+
+    Peer sockets are non-blocking and only this thread writes to them. Other
+    threads queue outgoing data on the peer and wake the loop through a
+    socket pair, so a peer that stops reading never blocks the others.
+    """
+
+    SELECT_TIMEOUT = 1.0
+
+    def __init__(self):
+        """Initialize the selector; the loop thread starts with the first peer."""
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+        self.thread = None
+        # Peers with newly queued outgoing data, flushed after every loop turn
+        self.write_ready = deque()
+        # Wakes a blocked select() when another thread queues data
+        self.wake_reader, self.wake_writer = socket.socketpair()
+        self.wake_reader.setblocking(False)
+        self.wake_writer.setblocking(False)
+        self.wake_pending = False
+        self.selector.register(self.wake_reader, selectors.EVENT_READ, None)
+
+    def register(self, peer):
+        """Deliver read events for a connected peer to its _on_readable."""
+        peer.fileno = peer.sock.fileno()
+        self.selector.register(peer.fileno, selectors.EVENT_READ, peer)
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="peer-reactor", daemon=True)
+                self.thread.start()
+        # Write out anything queued before the peer was registered
+        self.schedule_write(peer)
+
+    def unregister(self, peer):
+        """Stop delivering read events for a peer."""
+        if peer.fileno is None:
+            return
+        try:
+            self.selector.unregister(peer.fileno)
+        except (KeyError, ValueError, OSError):
+            pass
+        peer.fileno = None
+
+    def schedule_write(self, peer):
+        """Have the loop thread flush a peer's queued data."""
+        self.write_ready.append(peer)
+        # The loop flushes after every turn, so it never needs waking itself
+        if threading.current_thread() is not self.thread:
+            self.wakeup()
+
+    def set_write_interest(self, peer, enabled):
+        """Watch a peer socket for writability while it has unsent data."""
+        events = selectors.EVENT_READ | selectors.EVENT_WRITE if enabled else selectors.EVENT_READ
+        try:
+            self.selector.modify(peer.fileno, events, peer)
+        except (KeyError, ValueError, OSError):
+            pass
+
+    def wakeup(self):
+        """Interrupt a blocked select() from another thread."""
+        if self.wake_pending:
+            return
+        self.wake_pending = True
+        try:
+            self.wake_writer.send(b'\0')
+        except OSError:
+            pass  # A wakeup is already buffered
+
+    def _drain_wakeups(self):
+        """Consume wakeup bytes so the next select() blocks again."""
+        try:
+            while self.wake_reader.recv(4096):
+                pass
+        except OSError:
+            pass
+        # Cleared only after draining, a wakeup() racing the drain must not have its
+        # byte eaten while the flag stays set; its writes are flushed this turn
+        self.wake_pending = False
+
+    def _flush_writes(self):
+        """Write out data queued for peers since the last turn."""
+        write_ready = self.write_ready
+        while write_ready:
+            peer = write_ready.popleft()
+            if not peer.closing:
+                peer._flush_send_queue()
+
+    def _run(self):
+        """Dispatch peer socket events while any peer is registered."""
+        # Peers that hit their message budget with complete messages still buffered
+        backlog = set()
+        while True:
+            with self.lock:
+                # The wakeup socket is always registered
+                if len(self.selector.get_map()) <= 1:
+                    self.thread = None
+                    return
+            try:
+                events = self.selector.select(timeout=0 if backlog else self.SELECT_TIMEOUT)
+            except OSError as e:
+                logger.error("Peer reactor select error: %s", e)
+                continue
+            pending, backlog = backlog, set()
+            for key, mask in events:
+                peer = key.data
+                if peer is None:
+                    self._drain_wakeups()
+                    continue
+                if mask & selectors.EVENT_WRITE and not peer.closing:
+                    peer._flush_send_queue()
+                # Backlogged peers drain what they have before reading more
+                if (mask & selectors.EVENT_READ and not peer.closing and peer not in pending
+                        and peer._on_readable()):
+                    backlog.add(peer)
+            for peer in pending:
+                if peer._on_pending():
+                    backlog.add(peer)
+            self._flush_writes()
+
+# Shared by every Peer in the process
+reactor = PeerReactor()
+
+class PeerCache:
+    """Peers we completed a handshake with, per torrent.
+
+    Held in memory only, so the cache outlives a Client but not the process:
+    a torrent restarted in the same process redials these peers first.
+    """
+
+    MAX_PEERS = 50
+
+    def __init__(self):
+        """Initialize the empty info_hash -> {(ip, port): last_seen} map."""
+        self.peers = {}
+        self.lock = threading.Lock()
+
+    def remember(self, info_hash, ip, port):
+        """Record a peer as seen now, dropping the stalest beyond MAX_PEERS."""
+        with self.lock:
+            seen = self.peers.setdefault(info_hash, {})
+            seen[(ip, port)] = time.time()
+            if len(seen) > self.MAX_PEERS:
+                del seen[min(seen, key=seen.get)]
+
+    def recall(self, info_hash):
+        """Get cached (ip, port) pairs for a torrent, most recently seen first."""
+        with self.lock:
+            seen = self.peers.get(info_hash, {})
+            return sorted(seen, key=seen.get, reverse=True)
+
+# Module level so it survives Peer.close() and Client.stop() within one process
+peer_cache = PeerCache()
 
 class Peer:
-    def __init__(self, ip, port, torrent, peer_id, piece_manager, is_seeding=False):
-        """Initialize peer connection."""
+    def __init__(self, ip, port, torrent, peer_id, piece_manager, is_seeding=False, on_request=None,
+                 on_close=None):
+        """Initialize peer connection.
+
+        on_request(index, begin, length, peer) serves seeding requests, on_close(peer)
+        is called once when the connection closes.
+        """
         self.ip = ip
         self.port = port
         self.torrent = torrent
@@ -19,10 +205,43 @@ class Peer:
         self.sock = None
         self.choked = True
         self.bitfield = None
+        # Bitfield last found to have nothing we need, see request_pieces
+        self.exhausted_bitfield = None
         self.closing = False
-        if is_seeding:
-            # Subscribe to piece requests with explicit handler
-            pub.subscribe(self.on_piece_requested, 'piece_requested')
+        self.closed = threading.Event()
+        self.fileno = None
+        # Receive buffer, unparsed bytes live in recv_buf[head:tail]
+        self.recv_buf = bytearray(RECV_BUFFER_SIZE)
+        self.recv_view = memoryview(self.recv_buf)
+        self.head = 0
+        self.tail = 0
+        self.pending_length = None
+        # Outgoing data, written only by the reactor thread
+        self.send_queue = deque()
+        self.send_pending = None  # Unsent tail of the data, or (path, offset, count) file segment
+        self.send_file = None  # Open file of the segment being sent
+        self.send_blocked = False
+        # Direct callback for block requests, defaulting to serving them from disk
+        self.on_request = on_request or self.on_piece_requested
+        self.on_close = on_close
+
+    def _tune_socket(self):
+        """Disable Nagle for control messages and enlarge the socket buffers."""
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+
+    def _recv_exact(self, n):
+        """Receive exactly n bytes, accumulating partial reads."""
+        buf = bytearray(n)
+        view = memoryview(buf)
+        got = 0
+        while got < n:
+            r = self.sock.recv_into(view[got:])
+            if not r:
+                raise ConnectionError(f"Connection closed after {got} of {n} bytes")
+            got += r
+        return bytes(buf)
 
     def connect(self):
         """Connect to peer and perform handshake."""
@@ -31,29 +250,17 @@ class Peer:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.sock.settimeout(30)  # Increased timeout
             
-            # Skip connection to self check
-            if self.ip == '127.0.0.1':
-                # Get our local port to avoid connecting to self
-                try:
-                    self.sock.bind(('', 0))
-                    our_port = self.sock.getsockname()[1]
-                    if our_port == self.port or 6881 <= self.port <= 6889:
-                        raise Exception("Skipping connection to self")
-                except:
-                    self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    self.sock.settimeout(30)
-
+            # Buffer sizes must be set before connect to take effect on the window
+            self._tune_socket()
             print(f"Attempting TCP connection to {self.ip}:{self.port}")
             self.sock.connect((self.ip, self.port))
             
             print("Sending handshake...")
             handshake = pack_handshake(self.torrent.info_hash, self.peer_id)
-            self.sock.send(handshake)
+            self.sock.sendall(handshake)
             
             print("Waiting for handshake response...")
-            recv = self.sock.recv(68)
-            if len(recv) != 68:
-                raise Exception(f"Invalid handshake length: {len(recv)} bytes")
+            recv = self._recv_exact(68)
                 
             info_hash, peer_id = unpack_handshake(recv)
             print(f"Received handshake from peer: {peer_id.hex()}")
@@ -62,173 +269,332 @@ class Peer:
                 raise Exception("Info hash mismatch")
                 
             print("Handshake successful, setting up message handler")
-            self.sock.settimeout(30)
-            
-            # Start message handling thread
-            self.message_handler = threading.Thread(
-                target=self.handle_messages,
-                name=f"peer-{self.ip}:{self.port}"
-            )
-            self.message_handler.daemon = True
-            self.message_handler.start()
+            # From here on all I/O goes through the reactor
+            self.sock.setblocking(False)
             
             if not self.is_seeding:
                 print("Sending interested message")
                 self.send_interested()
                 
+            # Interested is queued first, so requests triggered by an unchoke
+            # never go out ahead of it
+            reactor.register(self)
+            
             print(f"Successfully connected to peer {self.ip}:{self.port}")
             return True
             
         except Exception as e:
             print(f"Error connecting to peer {self.ip}:{self.port}: {str(e)}")
-            if self.sock:
-                self.sock.close()
+            self.close()
             return False
 
     def handle_messages(self):
-        """Handle incoming messages from peer."""
-        print(f"Starting message handler for peer {self.ip}:{self.port}")
-        buffer = b''
-        while not self.closing:
-            try:
-                data = self.sock.recv(4096)
-                if not data:
-                    print(f"Peer {self.ip}:{self.port} disconnected cleanly")
-                    break
+        """Wait until the connection closes; messages are handled on the shared reactor thread."""
+        self.closed.wait()
+
+    def _on_readable(self):
+        """Read what the socket has into the receive buffer and process complete messages.
+
+        Returns True when the message budget ran out with complete messages still buffered.
+        """
+        try:
+            if self.tail == len(self.recv_buf):
+                self._make_room()
+            
+            received = self.sock.recv_into(self.recv_view[self.tail:])
+            if not received:
+                print(f"Peer {self.ip}:{self.port} disconnected cleanly")
+                self.close()
+                return False
 
-                buffer += data
+            self.tail += received
+            return self._process_messages()
                 
-                # Process complete messages
-                while len(buffer) >= 4:
-                    # Get message length
-                    if len(buffer) < 4:
-                        break
-                    length = struct.unpack('!I', buffer[:4])[0]
-                    
-                    # Check if we have the complete message
-                    if len(buffer) < 4 + length:
-                        break
-                        
-                    # Extract and process message
-                    msg = buffer[4:4+length]
-                    buffer = buffer[4+length:]
-                    
-                    # Handle keep-alive messages
-                    if length == 0:
-                        continue
-                        
-                    msg_id = msg[0]
-                    payload = msg[1:]
-                    self.process_message(msg_id, payload)
-                    
-            except socket.timeout:
-                # Timeouts are normal, just continue
-                continue
-            except Exception as e:
-                print(f"Error handling messages from {self.ip}:{self.port}: {str(e)}")
+        except (BlockingIOError, InterruptedError):
+            # Spurious wakeup, wait for the next read event
+            return False
+        except Exception as e:
+            print(f"Error handling messages from {self.ip}:{self.port}: {str(e)}")
+            self.close()
+            return False
+
+    def _on_pending(self):
+        """Continue with messages left buffered when the last turn hit its budget."""
+        if self.closing:
+            return False
+        try:
+            return self._process_messages()
+        except Exception as e:
+            print(f"Error handling messages from {self.ip}:{self.port}: {str(e)}")
+            self.close()
+            return False
+
+    def _process_messages(self):
+        """Process up to MESSAGE_BUDGET complete messages in place; True if more remain."""
+        view = self.recv_view
+        head = self.head
+        tail = self.tail
+        # Length of a message still arriving, parsed on an earlier turn
+        length = self.pending_length
+        processed = 0
+        
+        while tail - head >= 4:
+            # Get message length
+            if length is None:
+                length = MESSAGE_LENGTH.unpack_from(view, head)[0]
+            
+            # Check if we have the complete message
+            end = head + 4 + length
+            if end > tail:
                 break
+            
+            if processed == MESSAGE_BUDGET:
+                self.head = head
+                self.pending_length = length
+                return True
                 
-        # Clean up
-        try:
-            if self.sock:
-                self.sock.close()
-        except:
-            pass
+            # Handle keep-alive messages
+            if length:
+                self.process_message(view[head+4], view[head+5:end])
+            
+            head = end
+            processed += 1
+            length = None
         
-        print(f"Message handler stopped for peer {self.ip}:{self.port}")
+        # Rewind once everything is consumed, the common case
+        if head == tail:
+            head = tail = 0
+        self.head = head
+        self.tail = tail
+        self.pending_length = length
+        return False
+
+    def _make_room(self):
+        """Free space at the end of a full receive buffer."""
+        if self.head:
+            # Move the partial message down to the start
+            pending = self.tail - self.head
+            self.recv_buf[:pending] = self.recv_buf[self.head:self.tail]
+            self.head = 0
+            self.tail = pending
+        else:
+            # A single message larger than the buffer, grow it
+            recv_buf = bytearray(len(self.recv_buf) * 2)
+            recv_buf[:self.tail] = self.recv_buf[:self.tail]
+            self.recv_buf = recv_buf
+            self.recv_view = memoryview(recv_buf)
 
     def process_message(self, msg_id, payload):
-        """Process BitTorrent message."""
+        """Process BitTorrent message.
+
+        payload may be a memoryview into the receive buffer, only valid for
+        the duration of the call; anything kept must be copied.
+        """
         try:
             if msg_id == 0:  # choke
-                print(f"Peer {self.ip}:{self.port} choked us")
+                logger.debug("Peer %s:%s choked us", self.ip, self.port)
                 self.choked = True
             elif msg_id == 1:  # unchoke
-                print(f"Peer {self.ip}:{self.port} unchoked us")
+                logger.debug("Peer %s:%s unchoked us", self.ip, self.port)
                 self.choked = False
                 if self.bitfield and not self.is_seeding:
                     self.request_pieces()
             elif msg_id == 5:  # bitfield
-                print(f"Received bitfield from {self.ip}:{self.port}")
-                self.bitfield = BitArray(bytes=payload)
-                print(f"Pieces available: {self.bitfield.count(True)}")
+                # Keep the raw bitfield bytes; bits are tested directly
+                self.bitfield = bytes(payload)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Received bitfield from %s:%s, pieces available: %d",
+                                 self.ip, self.port,
+                                 bin(int.from_bytes(self.bitfield, 'big')).count('1'))
                 if not self.choked and not self.is_seeding:
                     self.request_pieces()
             elif msg_id == 7:  # piece
                 if not self.is_seeding:
-                    index, begin = struct.unpack('!II', payload[:8])
+                    index, begin = PIECE_HEADER.unpack_from(payload)
                     block = payload[8:]
-                    print(f"Received piece {index} offset {begin} length {len(block)} from {self.ip}:{self.port}")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Received piece %d offset %d length %d from %s:%s",
+                                     index, begin, len(block), self.ip, self.port)
                     self.piece_manager.receive_block(index, begin, block)
             elif msg_id == 6:  # request (for seeding)
                 if self.is_seeding:
-                    index, begin, length = struct.unpack('!III', payload)
-                    print(f"Received request for piece {index} offset {begin} length {length} from {self.ip}:{self.port}")
-                    pub.sendMessage('piece_requested', index=index, begin=begin, length=length, peer=self)
+                    index, begin, length = REQUEST_PAYLOAD.unpack(payload)
+                    logger.debug("Received request for piece %d offset %d length %d from %s:%s",
+                                 index, begin, length, self.ip, self.port)
+                    self.on_request(index, begin, length, self)
             elif msg_id == 2:  # interested
                 if self.is_seeding:
-                    print(f"Peer {self.ip}:{self.port} is interested")
+                    logger.debug("Peer %s:%s is interested", self.ip, self.port)
                     self.send_unchoke()
         except Exception as e:
             print(f"Error processing message type {msg_id} from {self.ip}:{self.port}: {str(e)}")
 
     def send_message(self, msg_id, payload=b''):
         """Send a message to peer."""
-        try:
-            length = len(payload) + 1
-            msg = struct.pack('!IB', length, msg_id) + payload
-            self.sock.send(msg)
-            print(f"Sent message type {msg_id} to peer {self.ip}:{self.port}")
-        except Exception as e:
-            print(f"Error sending message to {self.ip}:{self.port}: {str(e)}")
-            raise
+        length = len(payload) + 1
+        self.send_raw(MESSAGE_HEADER.pack(length, msg_id) + payload)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Queued message type %d for peer %s:%s", msg_id, self.ip, self.port)
+
+    def send_raw(self, data):
+        """Queue already framed data for the reactor thread, which owns all socket writes.
+
+        data is bytes-like, or a (path, offset, count) tuple for file contents
+        written with sendfile when they reach the head of the queue.
+        """
+        if self.closing:
+            return
+        self.send_queue.append(data)
+        # Data queued before registration is flushed by register()
+        if self.fileno is not None:
+            reactor.schedule_write(self)
+
+    def _flush_send_queue(self):
+        """Write queued data until drained or the socket would block (reactor thread only)."""
+        send_queue = self.send_queue
+        while self.send_pending is not None or send_queue:
+            if self.send_pending is None:
+                if isinstance(send_queue[0], tuple):
+                    self.send_pending = send_queue.popleft()
+                else:
+                    # Coalesce the bytes queued up to the next file segment into a single send
+                    chunks = []
+                    while send_queue and not isinstance(send_queue[0], tuple):
+                        chunks.append(send_queue.popleft())
+                    self.send_pending = memoryview(b''.join(chunks))
+            try:
+                if isinstance(self.send_pending, tuple):
+                    self._send_segment()
+                else:
+                    sent = self.sock.send(self.send_pending)
+                    pending = self.send_pending[sent:]
+                    self.send_pending = pending if len(pending) else None
+            except (BlockingIOError, InterruptedError):
+                break
+            except Exception as e:
+                logger.error("Error sending to %s:%s: %s", self.ip, self.port, e)
+                self.close()
+                return
+        
+        blocked = self.send_pending is not None
+        if blocked != self.send_blocked:
+            self.send_blocked = blocked
+            reactor.set_write_interest(self, blocked)
+
+    def _send_segment(self):
+        """Copy as much of the pending file segment to the socket as it takes, in the kernel."""
+        path, offset, count = self.send_pending
+        if self.send_file is None:
+            self.send_file = open(path, 'rb')
+        sent = os.sendfile(self.sock.fileno(), self.send_file.fileno(), offset, count)
+        if not sent:
+            raise EOFError(f"{path} ends before offset {offset + count}")
+        if sent < count:
+            self.send_pending = (path, offset + sent, count - sent)
+        else:
+            self.send_file.close()
+            self.send_file = None
+            self.send_pending = None
 
     def send_interested(self):
         """Send interested message."""
-        print(f"Sending interested to {self.ip}:{self.port}")
+        logger.debug("Sending interested to %s:%s", self.ip, self.port)
         self.send_message(2)
 
     def send_unchoke(self):
         """Send unchoke message."""
-        print(f"Sending unchoke to {self.ip}:{self.port}")
+        logger.debug("Sending unchoke to %s:%s", self.ip, self.port)
         self.send_message(1)
         self.choked = False
 
     def send_bitfield(self, bitfield):
         """Send bitfield message."""
-        print(f"Sending bitfield to {self.ip}:{self.port}")
+        logger.debug("Sending bitfield to %s:%s", self.ip, self.port)
         self.send_message(5, bitfield.tobytes())
 
     def send_piece(self, index, begin, block):
         """Send piece message."""
-        print(f"Sending piece {index} offset {begin} length {len(block)} to {self.ip}:{self.port}")
-        header = struct.pack('!II', index, begin)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sending piece %d offset %d length %d to %s:%s",
+                         index, begin, len(block), self.ip, self.port)
+        header = PIECE_HEADER.pack(index, begin)
         self.send_message(7, header + block)
 
+    def send_piece_from_disk(self, index, begin, length):
+        """Queue a piece message whose block the reactor copies from disk to the socket in the kernel."""
+        segments = self.piece_manager.get_block_segments(index, begin, length)
+        if segments is None:
+            return False
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sending piece %d offset %d length %d to %s:%s via sendfile",
+                         index, begin, length, self.ip, self.port)
+        self.send_raw(MESSAGE_HEADER.pack(9 + length, 7) + PIECE_HEADER.pack(index, begin))
+        for path, offset, count in segments:
+            if HAS_SENDFILE:
+                self.send_raw((path, offset, count))
+            else:
+                with open(path, 'rb') as fh:
+                    fh.seek(offset)
+                    self.send_raw(fh.read(count))
+        return True
+
+    def on_piece_requested(self, index, begin, length, peer):
+        """Serve a block request received from a peer while seeding."""
+        if not self.piece_manager.has_piece(index):
+            return
+        try:
+            peer.send_piece_from_disk(index, begin, length)
+        except Exception as e:
+            print(f"Error sending piece {index} to {peer.ip}:{peer.port}: {e}")
+            peer.close()
+
     def request_pieces(self):
         """Request pieces from peer if available."""
-        print(f"Looking for pieces to request from {self.ip}:{self.port}")
-        print("Checking which pieces to request...")
+        bitfield = self.bitfield
+        # We only ever gain pieces, so a peer with nothing we lack stays that way
+        # until it sends a new bitfield
+        if bitfield is self.exhausted_bitfield:
+            return
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Looking for pieces to request from %s:%s", self.ip, self.port)
+        # Pieces the peer has and we lack, as one AND-NOT over the bitfield ints
+        bits = self.piece_manager.bitfield_bits
+        nbytes = bits // 8
+        peer_avail = int.from_bytes(bitfield[:nbytes].ljust(nbytes, b'\0'), 'big')
+        needed = peer_avail & ~self.piece_manager.have_mask
+        # Drop the spare bits past the last piece
+        needed >>= bits - self.torrent.num_pieces
+        if not needed:
+            self.exhausted_bitfield = bitfield
+            logger.debug("No new pieces to request from %s:%s", self.ip, self.port)
+            return
+        
         requests_made = 0
-        for index in range(self.torrent.num_pieces):
-            if self.piece_manager.has_piece(index):
-                print(f"Skip piece {index} - already have it")
-                continue
+        # Pipeline every request into one buffer and write it at once
+        out = bytearray()
+        pack_request = REQUEST_MESSAGE.pack
+        top = self.torrent.num_pieces - 1
+        while needed:
+            high = needed.bit_length() - 1
+            needed ^= 1 << high
+            index = top - high
+            if debug:
+                logger.debug("Found needed piece %d at %s:%s", index, self.ip, self.port)
+            piece_len = self.piece_length(index)
+            num_blocks = (piece_len + BLOCK_SIZE - 1) // BLOCK_SIZE
             
-            if index < len(self.bitfield) and self.bitfield[index]:
-                print(f"Found needed piece {index} at {self.ip}:{self.port}")
-                piece_len = self.piece_length(index)
-                num_blocks = (piece_len + BLOCK_SIZE - 1) // BLOCK_SIZE
-                
-                print(f"Requesting {num_blocks} blocks for piece {index}")
-                for b in range(num_blocks):
-                    begin = b * BLOCK_SIZE
-                    length = min(BLOCK_SIZE, piece_len - begin)
-                    self.send_request(index, begin, length)
-                    requests_made += 1
-                
-        if requests_made == 0:
-            print("No new pieces to request from this peer")
+            if debug:
+                logger.debug("Requesting %d blocks for piece %d", num_blocks, index)
+            for b in range(num_blocks):
+                begin = b * BLOCK_SIZE
+                length = min(BLOCK_SIZE, piece_len - begin)
+                out += pack_request(13, 6, index, begin, length)
+                requests_made += 1
+        
+        # Queued, the reactor writes as much as the peer's window takes
+        self.send_raw(out)
+        logger.debug("Queued %d requests for peer %s:%s", requests_made, self.ip, self.port)
 
     def piece_length(self, index):
         """Get length of a piece."""
@@ -240,14 +606,13 @@ class Peer:
         """Handle incoming connection for seeding."""
         try:
             self.sock = conn
+            self._tune_socket()
             peer_info = conn.getpeername()
             print(f"\nHandling incoming connection from {peer_info[0]}:{peer_info[1]}")
             
             # Perform handshake
             self.sock.settimeout(10)  # Short timeout for handshake
-            recv = self.sock.recv(68)
-            if len(recv) != 68:
-                raise Exception(f"Invalid handshake length: {len(recv)} bytes")
+            recv = self._recv_exact(68)
             
             info_hash, remote_peer_id = unpack_handshake(recv)
             print(f"Received handshake with info_hash={info_hash.hex()} from peer={remote_peer_id.hex()}")
@@ -258,8 +623,10 @@ class Peer:
             # Send handshake response
             print("Sending handshake response...")
             handshake = pack_handshake(self.torrent.info_hash, self.peer_id)
-            self.sock.send(handshake)
+            self.sock.sendall(handshake)
             print("Handshake complete")
+            # From here on all I/O goes through the reactor
+            self.sock.setblocking(False)
             
             # Send our bitfield
             print("Sending initial bitfield...")
@@ -267,37 +634,44 @@ class Peer:
             self.send_bitfield(bitfield)
             print("Bitfield sent")
             
-            # Start message handling thread
+            # Hand the socket to the shared event loop
             print(f"Starting message handler for incoming peer {peer_info[0]}:{peer_info[1]}")
-            self.message_handler = threading.Thread(
-                target=self.handle_messages,
-                name=f"peer-incoming-{peer_info[0]}:{peer_info[1]}"
-            )
-            self.message_handler.daemon = True
-            self.message_handler.start()
+            reactor.register(self)
             
         except socket.timeout:
             print("Connection timed out during handshake")
-            if self.sock:
-                self.sock.close()
+            self.close()
         except Exception as e:
             print(f"Error handling incoming peer: {str(e)}")
-            if self.sock:
-                self.sock.close()
+            self.close()
             raise
             self.sock.close()
 
     def send_request(self, index, begin, length):
         """Send piece request message."""
-        print(f"Requesting piece {index} offset {begin} length {length} from {self.ip}:{self.port}")
-        header = struct.pack('!III', index, begin, length)
-        self.send_message(6, header)
+        logger.debug("Requesting piece %d offset %d length %d from %s:%s",
+                     index, begin, length, self.ip, self.port)
+        self.send_raw(REQUEST_MESSAGE.pack(13, 6, index, begin, length))
 
     def close(self):
         """Close the peer connection."""
         self.closing = True
+        # Only outgoing peers that got through the handshake are worth redialling
+        if self.fileno is not None and not self.is_seeding:
+            peer_cache.remember(self.torrent.info_hash, self.ip, self.port)
+        reactor.unregister(self)
+        self.send_queue.clear()
+        self.send_pending = None
+        if self.send_file:
+            self.send_file.close()
+            self.send_file = None
         if self.sock:
             try:
                 self.sock.close()
             except:
-                pass
\ No newline at end of file
+                pass
+        if not self.closed.is_set():
+            self.closed.set()
+            print(f"Message handler stopped for peer {self.ip}:{self.port}")
+            if self.on_close:
+                self.on_close(self)
\ No newline at end of file
@@ -6,14 +6,40 @@ This module handles peer connections and implements the BitTorrent peer wire pro
 for communicating with other peers in the swarm.
 """
 
+import itertools
 import socket
+import selectors
 import struct
 import threading
 import time
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Callable, Set, List, Tuple, Dict
 from enum import Enum
-import bitstring
+
+
+# Per-socket NAPI busy polling, only where the socket module exports the option
+SO_BUSY_POLL = getattr(socket, 'SO_BUSY_POLL', None)
+
+# Precompiled wire formats
+MESSAGE_LENGTH = struct.Struct('>I')
+MESSAGE_HEADER = struct.Struct('>IB')  # <length><message ID>
+PIECE_INDEX = struct.Struct('>I')  # HAVE payload
+PIECE_HEADER = struct.Struct('>II')  # <index><begin> following the message ID
+REQUEST_PAYLOAD = struct.Struct('>III')  # <index><begin><length>, REQUEST and CANCEL
+HAVE_MESSAGE = struct.Struct('>IBI')  # Whole framed HAVE message
+REQUEST_MESSAGE = struct.Struct('>IBIII')  # Whole framed REQUEST message
+KEEP_ALIVE = MESSAGE_LENGTH.pack(0)
+HANDSHAKE = struct.Struct('>B19s8x20s20s')  # <pstrlen><pstr><reserved><info_hash><peer_id>
+
+
+def request_key(piece_index: int, block_offset: int, block_length: int) -> int:
+    """Pack a block request into one int, cheaper to hash than a 3-tuple."""
+    return (piece_index << 64) | (block_offset << 32) | block_length
+
+# Each bitfield byte expanded to eight 0/1 flag bytes
+BYTE_FLAGS = tuple(bytes((byte >> (7 - bit)) & 1 for bit in range(8)) for byte in range(256))
 
 
 class PeerMessage(Enum):
@@ -33,15 +59,217 @@ class PeerMessage(Enum):
 class PeerState:
     """Represents the state of a peer connection."""
     
-    def __init__(self):
+    def __init__(self, num_pieces: int = 0):
         self.am_choking = True
         self.am_interested = False
         self.peer_choking = True
         self.peer_interested = False
         self.peer_bitfield = None
         self.pieces_available = set()
-        self.pending_requests = set()  # Set of (piece_index, block_offset, block_length)
-        self.last_message_time = time.time()
+        self.piece_map = bytearray(num_pieces)  # One 0/1 flag per piece, same content as pieces_available
+        self.pending_requests = set()  # request_key(piece_index, block_offset, block_length) ints
+        self.last_message_time = time.monotonic()
+
+
+class PeerReactor:
+    """
+    Single event loop driving all peer socket I/O.
+    
+    Connected peers register their socket with one selector (epoll/kqueue where
+    available) and a single thread dispatches readable sockets to their
+    connection, instead of running one blocking receive thread per peer.
+    
+    The event loop thread is also the only thread that writes to peer sockets.
+    Other threads queue messages on the connection and wake the loop through a
+    socket pair, so sends never contend on a per-socket lock.
+    """
+    
+    SELECT_TIMEOUT = 1.0
+    
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.running = False
+        self.closed = False
+        self.thread = None
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(f"{__name__}.reactor")
+        
+        # Peers with queued outgoing messages, flushed by the event loop thread
+        self.write_ready = deque()
+        # Receive buffers of peers closed from other threads, pooled after the current round
+        self.released_buffers = deque()
+        
+        # Wakes a blocked select() when another thread queues work
+        self.wake_reader, self.wake_writer = socket.socketpair()
+        self.wake_reader.setblocking(False)
+        self.wake_writer.setblocking(False)
+        self.wake_pending = False
+        self.selector.register(self.wake_reader, selectors.EVENT_READ, None)
+    
+    def register(self, peer: 'PeerConnection') -> bool:
+        """Start delivering I/O events for a connected peer."""
+        if self.closed:
+            return False
+        
+        try:
+            # Register the raw descriptor so lookups never go through socket.fileno()
+            peer.fileno = peer.socket.fileno()
+            self.selector.register(peer.fileno, selectors.EVENT_READ, peer)
+        except (KeyError, ValueError, OSError) as e:
+            self.logger.error(f"Failed to register peer {peer.peer_ip}:{peer.peer_port}: {e}")
+            return False
+        
+        self.start()
+        self.wakeup()
+        return True
+    
+    def unregister(self, peer: 'PeerConnection'):
+        """Stop delivering I/O events for a peer."""
+        if peer.fileno is None:
+            return
+        
+        try:
+            self.selector.unregister(peer.fileno)
+        except (KeyError, ValueError, OSError):
+            pass
+        peer.fileno = None
+    
+    def set_write_interest(self, peer: 'PeerConnection', enabled: bool):
+        """Watch a peer socket for writability while it has unsent data."""
+        events = selectors.EVENT_READ | selectors.EVENT_WRITE if enabled else selectors.EVENT_READ
+        
+        try:
+            self.selector.modify(peer.fileno, events, peer)
+        except (KeyError, ValueError, OSError):
+            pass
+    
+    def schedule_write(self, peer: 'PeerConnection'):
+        """Have the event loop thread flush a peer's queued messages."""
+        self.write_ready.append(peer)
+        
+        # The loop flushes after every dispatch round, so it never needs waking itself
+        if threading.current_thread() is not self.thread:
+            self.wakeup()
+    
+    def release_buffer(self, pool: 'BufferPool', buffer: bytearray):
+        """Return a receive buffer to its pool once the event loop cannot be parsing it."""
+        if self.thread is None or threading.current_thread() is self.thread:
+            pool.release(buffer)
+        else:
+            self.released_buffers.append((pool, buffer))
+    
+    def wakeup(self):
+        """Interrupt a blocked select() from another thread."""
+        if self.wake_pending:
+            return
+        
+        self.wake_pending = True
+        try:
+            self.wake_writer.send(b'\0')
+        except OSError:
+            pass  # Wakeup already buffered or reactor closed
+    
+    def close(self):
+        """Unregister every peer and stop the event loop for good."""
+        self.closed = True
+        self.stop()
+        
+        for key in list(self.selector.get_map().values()):
+            if key.data is not None:
+                self.unregister(key.data)
+    
+    def start(self):
+        """Start the event loop thread if it is not already running."""
+        with self.lock:
+            if self.running or self.closed:
+                return
+            
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+    
+    def stop(self):
+        """Stop the event loop thread."""
+        with self.lock:
+            self.running = False
+        self.wakeup()
+        
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2)
+        self.thread = None
+    
+    def _run(self):
+        """Dispatch peer socket events and flush queued sends until stopped."""
+        while self.running:
+            try:
+                events = self.selector.select(timeout=self.SELECT_TIMEOUT)
+            except OSError as e:
+                self.logger.error(f"Error in select: {e}")
+                continue
+            
+            for key, mask in events:
+                peer = key.data
+                if peer is None:
+                    self._drain_wakeups()
+                    continue
+                
+                if mask & selectors.EVENT_READ:
+                    peer._on_readable()
+                if mask & selectors.EVENT_WRITE and peer.connected:
+                    peer._flush_send_queue()
+            
+            self._flush_writes()
+            
+            released = self.released_buffers
+            while released:
+                pool, buffer = released.popleft()
+                pool.release(buffer)
+    
+    def _drain_wakeups(self):
+        """Consume wakeup bytes so the next select() blocks again."""
+        try:
+            while self.wake_reader.recv(4096):
+                pass
+        except OSError:
+            pass
+        # Cleared only after draining, a wakeup() racing the drain must not have its
+        # byte eaten while the flag stays set; its writes are flushed this turn
+        self.wake_pending = False
+    
+    def _flush_writes(self):
+        """Write out messages queued for peers since the last round."""
+        write_ready = self.write_ready
+        while write_ready:
+            peer = write_ready.popleft()
+            if peer.connected:
+                peer._flush_send_queue()
+
+
+class BufferPool:
+    """
+    Free list of equally sized receive buffers shared by the peers of a manager.
+    
+    Buffers are allocated on demand and at most count idle ones are kept, so
+    peers churning through the swarm reuse memory instead of allocating a
+    fresh receive buffer per connection.
+    """
+    
+    def __init__(self, size: int, count: int):
+        self.size = size
+        self.count = count
+        self.free = deque()
+    
+    def acquire(self) -> bytearray:
+        """Take an idle buffer, or allocate one if none is left."""
+        try:
+            return self.free.popleft()
+        except IndexError:
+            return bytearray(self.size)
+    
+    def release(self, buffer: bytearray):
+        """Keep a buffer for reuse; buffers grown past size are left to the allocator."""
+        if len(buffer) == self.size and len(self.free) < self.count:
+            self.free.append(buffer)
 
 
 class PeerConnection:
@@ -50,9 +278,17 @@ class PeerConnection:
     HANDSHAKE_LENGTH = 68
     PROTOCOL_STRING = b'BitTorrent protocol'
     BLOCK_SIZE = 16384  # 16KB standard block size
+    RECEIVE_SIZE = 65536
+    MAX_READS_PER_EVENT = 16  # Bound on back-to-back reads so one busy peer cannot starve the rest
+    RATE_INTERVAL = 1.0  # Seconds between transfer rate samples
+    RATE_SMOOTHING = 0.3  # Weight of the newest sample in the moving average
     
     def __init__(self, peer_ip: str, peer_port: int, info_hash: bytes, 
-                 peer_id: bytes, num_pieces: int, message_handler: Optional[Callable] = None):
+                 peer_id: bytes, num_pieces: int, reactor: PeerReactor,
+                 message_handler: Optional[Callable] = None, busy_poll_us: int = 0,
+                 upload_handler: Optional[Callable[[int], None]] = None,
+                 disconnect_handler: Optional[Callable[['PeerConnection'], None]] = None,
+                 handshake: Optional[bytes] = None, buffer_pool: Optional[BufferPool] = None):
         """
         Initialize peer connection.
         
@@ -62,7 +298,15 @@ class PeerConnection:
             info_hash: Torrent info hash
             peer_id: Our peer ID
             num_pieces: Total number of pieces in torrent
-            message_handler: Callback for handling received messages
+            reactor: Event loop that performs all socket I/O for this peer, required
+                since a connection has no receive path of its own
+            message_handler: Callback for handling received messages, payloads are
+                memoryviews that are only valid for the duration of the call
+            busy_poll_us: Busy-poll the NIC for this many microseconds on receive (0 disables)
+            upload_handler: Callback receiving the number of block bytes sent to the peer
+            disconnect_handler: Called with this connection when an established connection closes
+            handshake: Prebuilt handshake for this torrent, shared by every peer of a manager
+            buffer_pool: Pool the receive buffer is taken from on connect and returned to on disconnect
         """
         self.peer_ip = peer_ip
         self.peer_port = peer_port
@@ -70,12 +314,42 @@ class PeerConnection:
         self.peer_id = peer_id
         self.num_pieces = num_pieces
         self.message_handler = message_handler
+        self.reactor = reactor
+        self.busy_poll_us = busy_poll_us
+        self.upload_handler = upload_handler
+        self.disconnect_handler = disconnect_handler
+        self.handshake = handshake or HANDSHAKE.pack(len(self.PROTOCOL_STRING), self.PROTOCOL_STRING,
+                                                     info_hash, peer_id)
+        self.buffer_pool = buffer_pool
         
         self.socket = None
-        self.state = PeerState()
+        self.fileno = None
+        self.state = PeerState(num_pieces)
+        
+        # Message ID -> handler for everything but PIECE, which the receive parser handles inline
+        self.dispatch = {
+            PeerMessage.CHOKE.value: self._handle_choke,
+            PeerMessage.UNCHOKE.value: self._handle_unchoke,
+            PeerMessage.INTERESTED.value: self._handle_interested,
+            PeerMessage.NOT_INTERESTED.value: self._handle_not_interested,
+            PeerMessage.HAVE.value: self._handle_have,
+            PeerMessage.BITFIELD.value: self._handle_bitfield,
+            PeerMessage.REQUEST.value: self._handle_request,
+            PeerMessage.CANCEL.value: self._handle_cancel,
+        }
         self.connected = False
-        self.running = False
-        self.receive_thread = None
+        
+        # Outgoing messages, written only by the reactor thread
+        self.send_queue = deque()
+        self.send_pending = None  # Unsent tail of the data being written
+        self.send_blocked = False
+        
+        # Fixed receive buffer, messages are parsed in place between start and end;
+        # allocated once connected so idle connections hold no buffer
+        self.receive_buffer = bytearray()
+        self.receive_view = memoryview(self.receive_buffer)
+        self.receive_start = 0
+        self.receive_end = 0
         
         self.logger = logging.getLogger(f"{__name__}.{peer_ip}:{peer_port}")
         
@@ -83,6 +357,13 @@ class PeerConnection:
         self.bytes_downloaded = 0
         self.bytes_uploaded = 0
         self.connection_time = None
+        
+        # Smoothed transfer rates, resampled at most once per RATE_INTERVAL
+        self.download_rate = 0.0
+        self.upload_rate = 0.0
+        self.rate_sample_time = None
+        self.rate_sample_downloaded = 0
+        self.rate_sample_uploaded = 0
     
     def connect(self, timeout: int = 30) -> bool:
         """
@@ -98,22 +379,27 @@ class PeerConnection:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.settimeout(timeout)
             
-            self.logger.debug(f"Connecting to {self.peer_ip}:{self.peer_port}")
+            self.logger.debug("Connecting to %s:%s", self.peer_ip, self.peer_port)
             self.socket.connect((self.peer_ip, self.peer_port))
+            # Send control messages and PIECE blocks without waiting on Nagle
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._enable_busy_poll()
             
             # Perform handshake
             if not self._perform_handshake():
                 self.disconnect()
                 return False
             
+            self._acquire_receive_buffer()
             self.connected = True
-            self.connection_time = time.time()
-            self.state.last_message_time = time.time()
+            # Monotonic clock for rates and liveness, immune to wall-clock jumps
+            self.connection_time = self.state.last_message_time = time.monotonic()
             
-            # Start receiving messages
-            self.running = True
-            self.receive_thread = threading.Thread(target=self._receive_loop, daemon=True)
-            self.receive_thread.start()
+            # Hand the socket to the reactor for all further I/O
+            self.socket.setblocking(False)
+            if not self.reactor.register(self):
+                self.disconnect()
+                return False
             
             self.logger.info(f"Connected to peer {self.peer_ip}:{self.peer_port}")
             return True
@@ -123,18 +409,21 @@ class PeerConnection:
             self.disconnect()
             return False
     
+    def _enable_busy_poll(self):
+        """Enable NAPI busy polling to cut request/piece round-trip latency."""
+        if not self.busy_poll_us or SO_BUSY_POLL is None:
+            return
+        
+        try:
+            self.socket.setsockopt(socket.SOL_SOCKET, SO_BUSY_POLL, self.busy_poll_us)
+        except OSError as e:
+            self.logger.debug("Busy polling unavailable: %s", e)
+    
     def _perform_handshake(self) -> bool:
         """Perform BitTorrent handshake with peer."""
         try:
             # Send handshake
-            # Format: <pstrlen><pstr><reserved><info_hash><peer_id>
-            handshake = struct.pack('>B', len(self.PROTOCOL_STRING))
-            handshake += self.PROTOCOL_STRING
-            handshake += b'\x00' * 8  # Reserved bytes
-            handshake += self.info_hash
-            handshake += self.peer_id
-            
-            self.socket.send(handshake)
+            self.socket.sendall(self.handshake)
             
             # Receive handshake response
             response = self._receive_exact(self.HANDSHAKE_LENGTH)
@@ -169,49 +458,138 @@ class PeerConnection:
             return False
     
     def _receive_exact(self, length: int) -> Optional[bytes]:
-        """Receive exactly the specified number of bytes."""
-        data = b''
-        while len(data) < length:
+        """Receive exactly the specified number of bytes into one preallocated buffer."""
+        data = bytearray(length)
+        view = memoryview(data)
+        received = 0
+        while received < length:
             try:
-                chunk = self.socket.recv(length - len(data))
-                if not chunk:
+                n = self.socket.recv_into(view[received:], length - received)
+                if not n:
                     return None
-                data += chunk
+                received += n
             except Exception:
                 return None
-        return data
+        return bytes(data)
+    
+    def _acquire_receive_buffer(self):
+        """Set up the receive buffer, from the pool if the connection has one."""
+        if self.buffer_pool:
+            self.receive_buffer = self.buffer_pool.acquire()
+        else:
+            self.receive_buffer = bytearray(self.RECEIVE_SIZE)
+        self.receive_view = memoryview(self.receive_buffer)
+        self.receive_start = self.receive_end = 0
     
-    def _receive_loop(self):
-        """Main loop for receiving messages from peer."""
-        while self.running and self.connected:
+    def _release_receive_buffer(self):
+        """Hand the receive buffer back to the pool."""
+        buffer = self.receive_buffer
+        self.receive_buffer = bytearray()
+        self.receive_view = memoryview(self.receive_buffer)
+        self.receive_start = self.receive_end = 0
+        
+        if not self.buffer_pool or not buffer:
+            return
+        # The event loop may still be parsing into the buffer if another thread closed us
+        self.reactor.release_buffer(self.buffer_pool, buffer)
+    
+    def _on_readable(self):
+        """
+        Receive available data and handle every complete message in it.
+        
+        Keeps reading until the socket is drained, so a single readiness event
+        covers a whole burst of messages instead of one read per event.
+        """
+        if not self.connected:
+            return
+        
+        for _ in range(self.MAX_READS_PER_EVENT):
+            if self.receive_end == len(self.receive_buffer):
+                self._make_receive_room()
+            
+            room = len(self.receive_buffer) - self.receive_end
             try:
-                # Read message length (4 bytes)
-                length_data = self._receive_exact(4)
-                if not length_data:
-                    break
-                
-                message_length = struct.unpack('>I', length_data)[0]
-                
-                if message_length == 0:
-                    # Keep-alive message
-                    self.state.last_message_time = time.time()
-                    continue
-                
-                # Read message data
-                message_data = self._receive_exact(message_length)
-                if not message_data:
-                    break
-                
-                self._handle_message(message_data)
-                self.state.last_message_time = time.time()
-                
+                received = self.socket.recv_into(self.receive_view[self.receive_end:])
+            except (BlockingIOError, InterruptedError):
+                return
             except Exception as e:
-                self.logger.error(f"Error in receive loop: {e}")
+                self.logger.error(f"Error receiving from peer: {e}")
+                self.disconnect()
+                return
+            
+            if not received:
+                self.disconnect()
+                return
+            
+            self.receive_end += received
+            self._process_receive_buffer()
+            
+            # A short read means the socket has no more data queued
+            if received < room or not self.connected:
+                return
+    
+    def _make_receive_room(self):
+        """Move a partial message to the front of the buffer, growing it if needed."""
+        start = self.receive_start
+        pending = self.receive_end - start
+        
+        if start:
+            self.receive_buffer[:pending] = self.receive_buffer[start:self.receive_end]
+        else:
+            # A single message is larger than the buffer
+            buffer = bytearray(len(self.receive_buffer) * 2)
+            buffer[:pending] = self.receive_view[:pending]
+            self.receive_buffer = buffer
+            self.receive_view = memoryview(buffer)
+        
+        self.receive_start = 0
+        self.receive_end = pending
+    
+    def _process_receive_buffer(self):
+        """
+        Parse and dispatch complete length-prefixed messages from the buffer.
+        
+        Messages are handed over as memoryviews into the receive buffer, which
+        are only valid until the handler returns.
+        """
+        buffer = self.receive_buffer
+        view = self.receive_view
+        offset = self.receive_start
+        buffer_end = self.receive_end
+        unpack_length = MESSAGE_LENGTH.unpack_from
+        unpack_piece = PIECE_HEADER.unpack_from
+        piece_id = PeerMessage.PIECE.value
+        
+        while buffer_end - offset >= 4 and self.connected:
+            message_length = unpack_length(buffer, offset)[0]
+            message_end = offset + 4 + message_length
+            if message_end > buffer_end:
                 break
+            
+            if message_length > 8 and buffer[offset + 4] == piece_id:
+                # Block data is nearly all traffic, decode it without the generic dispatch
+                piece_index, block_offset = unpack_piece(buffer, offset + 5)
+                try:
+                    self._handle_piece(piece_index, block_offset, view[offset + 13:message_end])
+                except Exception as e:
+                    self.logger.error(f"Error handling message {piece_id}: {e}")
+            
+            # Zero-length messages are keep-alives
+            elif message_length:
+                self._handle_message(view[offset + 4:message_end])
+            
+            offset = message_end
+        
+        if offset != self.receive_start:
+            now = self.state.last_message_time = time.monotonic()
+            self.update_rates(now)
         
-        self.disconnect()
+        if offset == buffer_end:
+            self.receive_start = self.receive_end = 0
+        else:
+            self.receive_start = offset
     
-    def _handle_message(self, message_data: bytes):
+    def _handle_message(self, message_data: memoryview):
         """Handle received peer message."""
         if len(message_data) == 0:
             return
@@ -220,48 +598,10 @@ class PeerConnection:
         payload = message_data[1:]
         
         try:
-            if message_id == PeerMessage.CHOKE.value:
-                self.state.peer_choking = True
-                self.logger.debug("Received CHOKE")
-                
-            elif message_id == PeerMessage.UNCHOKE.value:
-                self.state.peer_choking = False
-                self.logger.debug("Received UNCHOKE")
-                
-            elif message_id == PeerMessage.INTERESTED.value:
-                self.state.peer_interested = True
-                self.logger.debug("Received INTERESTED")
-                
-            elif message_id == PeerMessage.NOT_INTERESTED.value:
-                self.state.peer_interested = False
-                self.logger.debug("Received NOT_INTERESTED")
-                
-            elif message_id == PeerMessage.HAVE.value:
-                if len(payload) == 4:
-                    piece_index = struct.unpack('>I', payload)[0]
-                    self.state.pieces_available.add(piece_index)
-                    self.logger.debug(f"Received HAVE for piece {piece_index}")
-                
-            elif message_id == PeerMessage.BITFIELD.value:
-                self._handle_bitfield(payload)
-                
-            elif message_id == PeerMessage.REQUEST.value:
-                if len(payload) == 12:
-                    piece_index, block_offset, block_length = struct.unpack('>III', payload)
-                    self.logger.debug(f"Received REQUEST for piece {piece_index}, offset {block_offset}, length {block_length}")
-                
-            elif message_id == PeerMessage.PIECE.value:
-                if len(payload) >= 8:
-                    piece_index, block_offset = struct.unpack('>II', payload[:8])
-                    block_data = payload[8:]
-                    self._handle_piece(piece_index, block_offset, block_data)
-                
-            elif message_id == PeerMessage.CANCEL.value:
-                if len(payload) == 12:
-                    piece_index, block_offset, block_length = struct.unpack('>III', payload)
-                    request = (piece_index, block_offset, block_length)
-                    self.state.pending_requests.discard(request)
-                    self.logger.debug(f"Received CANCEL for piece {piece_index}, offset {block_offset}")
+            # One dict lookup instead of walking an if/elif chain per message
+            handler = self.dispatch.get(message_id)
+            if handler:
+                handler(payload)
             
             # Call external message handler if provided
             if self.message_handler:
@@ -270,28 +610,73 @@ class PeerConnection:
         except Exception as e:
             self.logger.error(f"Error handling message {message_id}: {e}")
     
-    def _handle_bitfield(self, bitfield_data: bytes):
+    def _handle_choke(self, payload: memoryview):
+        """Handle choke message."""
+        self.state.peer_choking = True
+        self.logger.debug("Received CHOKE")
+    
+    def _handle_unchoke(self, payload: memoryview):
+        """Handle unchoke message."""
+        self.state.peer_choking = False
+        self.logger.debug("Received UNCHOKE")
+    
+    def _handle_interested(self, payload: memoryview):
+        """Handle interested message."""
+        self.state.peer_interested = True
+        self.logger.debug("Received INTERESTED")
+    
+    def _handle_not_interested(self, payload: memoryview):
+        """Handle not interested message."""
+        self.state.peer_interested = False
+        self.logger.debug("Received NOT_INTERESTED")
+    
+    def _handle_have(self, payload: memoryview):
+        """Handle have message."""
+        if len(payload) == 4:
+            piece_index = PIECE_INDEX.unpack(payload)[0]
+            if piece_index < self.num_pieces:
+                self.state.pieces_available.add(piece_index)
+                self.state.piece_map[piece_index] = 1
+            self.logger.debug("Received HAVE for piece %d", piece_index)
+    
+    def _handle_request(self, payload: memoryview):
+        """Handle request message."""
+        if len(payload) == 12:
+            piece_index, block_offset, block_length = REQUEST_PAYLOAD.unpack(payload)
+            self.logger.debug("Received REQUEST for piece %d, offset %d, length %d",
+                              piece_index, block_offset, block_length)
+    
+    def _handle_cancel(self, payload: memoryview):
+        """Handle cancel message."""
+        if len(payload) == 12:
+            piece_index, block_offset, block_length = REQUEST_PAYLOAD.unpack(payload)
+            self.state.pending_requests.discard(request_key(piece_index, block_offset, block_length))
+            self.logger.debug("Received CANCEL for piece %d, offset %d", piece_index, block_offset)
+    
+    def _handle_bitfield(self, bitfield_data: memoryview):
         """Handle bitfield message."""
         try:
-            bitfield = bitstring.BitArray(bytes=bitfield_data)
+            piece_map = self.state.piece_map
+            
+            # Expand each byte to eight flag bytes; spare bits past the last piece are cut off
+            flags = b''.join(map(BYTE_FLAGS.__getitem__, bitfield_data[:(self.num_pieces + 7) // 8]))
+            piece_map[:len(flags)] = flags
+            del piece_map[self.num_pieces:]
             
-            # Extract available pieces
-            for piece_index in range(min(len(bitfield), self.num_pieces)):
-                if bitfield[piece_index]:
-                    self.state.pieces_available.add(piece_index)
+            # Select the indices of set flags without a Python-level loop
+            self.state.pieces_available.update(itertools.compress(range(self.num_pieces), piece_map))
             
-            self.logger.debug(f"Received BITFIELD with {len(self.state.pieces_available)} pieces")
+            self.logger.debug("Received BITFIELD with %d pieces", len(self.state.pieces_available))
             
         except Exception as e:
             self.logger.error(f"Error parsing bitfield: {e}")
     
-    def _handle_piece(self, piece_index: int, block_offset: int, block_data: bytes):
+    def _handle_piece(self, piece_index: int, block_offset: int, block_data: memoryview):
         """Handle piece message."""
         self.bytes_downloaded += len(block_data)
-        request = (piece_index, block_offset, len(block_data))
-        self.state.pending_requests.discard(request)
+        self.state.pending_requests.discard(request_key(piece_index, block_offset, len(block_data)))
         
-        self.logger.debug(f"Received PIECE {piece_index}, offset {block_offset}, length {len(block_data)}")
+        self.logger.debug("Received PIECE %d, offset %d, length %d", piece_index, block_offset, len(block_data))
         
         # Call external message handler for piece data
         if self.message_handler:
@@ -302,28 +687,50 @@ class PeerConnection:
         if not self.connected:
             return False
         
-        try:
-            message_length = len(payload) + 1  # +1 for message ID
-            message = struct.pack('>I', message_length) + struct.pack('>B', message_id) + payload
-            self.socket.send(message)
-            return True
-        except Exception as e:
-            self.logger.error(f"Failed to send message: {e}")
-            self.disconnect()
-            return False
+        message_length = len(payload) + 1  # +1 for message ID
+        message = MESSAGE_HEADER.pack(message_length, message_id) + payload
+        return self.send_raw(message)
     
-    def send_keep_alive(self) -> bool:
-        """Send keep-alive message."""
+    def send_raw(self, message: bytes) -> bool:
+        """Send an already framed message to the peer."""
         if not self.connected:
             return False
         
-        try:
-            self.socket.send(struct.pack('>I', 0))
-            return True
-        except Exception as e:
-            self.logger.error(f"Failed to send keep-alive: {e}")
-            self.disconnect()
-            return False
+        # Queue for the reactor thread, which owns all socket writes
+        self.send_queue.append(message)
+        self.reactor.schedule_write(self)
+        return True
+    
+    def _flush_send_queue(self):
+        """Write queued messages until drained or the socket would block (reactor thread only)."""
+        send_queue = self.send_queue
+        
+        while self.send_pending is not None or send_queue:
+            if self.send_pending is None:
+                # Coalesce everything queued so far into a single send
+                messages = [send_queue.popleft() for _ in range(len(send_queue))]
+                self.send_pending = memoryview(b''.join(messages))
+            
+            try:
+                sent = self.socket.send(self.send_pending)
+            except (BlockingIOError, InterruptedError):
+                break
+            except Exception as e:
+                self.logger.error(f"Failed to send message: {e}")
+                self.disconnect()
+                return
+            
+            pending = self.send_pending[sent:]
+            self.send_pending = pending if len(pending) else None
+        
+        blocked = self.send_pending is not None
+        if blocked != self.send_blocked:
+            self.send_blocked = blocked
+            self.reactor.set_write_interest(self, blocked)
+    
+    def send_keep_alive(self) -> bool:
+        """Send keep-alive message."""
+        return self.send_raw(KEEP_ALIVE)
     
     def send_choke(self) -> bool:
         """Send choke message."""
@@ -347,41 +754,59 @@ class PeerConnection:
     
     def send_have(self, piece_index: int) -> bool:
         """Send have message for a piece."""
-        payload = struct.pack('>I', piece_index)
+        payload = PIECE_INDEX.pack(piece_index)
         return self.send_message(PeerMessage.HAVE.value, payload)
     
-    def send_bitfield(self, bitfield: bitstring.BitArray) -> bool:
-        """Send bitfield message."""
-        payload = bitfield.tobytes()
-        return self.send_message(PeerMessage.BITFIELD.value, payload)
+    def send_bitfield(self, bitfield: bytes) -> bool:
+        """Send bitfield message, given as packed bytes with piece 0 in the high bit."""
+        return self.send_message(PeerMessage.BITFIELD.value, bitfield)
     
     def send_request(self, piece_index: int, block_offset: int, block_length: int) -> bool:
         """Send request message for a block."""
-        payload = struct.pack('>III', piece_index, block_offset, block_length)
+        payload = REQUEST_PAYLOAD.pack(piece_index, block_offset, block_length)
         if self.send_message(PeerMessage.REQUEST.value, payload):
-            self.state.pending_requests.add((piece_index, block_offset, block_length))
+            self.state.pending_requests.add(request_key(piece_index, block_offset, block_length))
+            return True
+        return False
+    
+    def send_requests_batch(self, requests: List[Tuple[int, int, int]]) -> bool:
+        """Send several block requests framed into one buffer and one write."""
+        if not requests:
+            return True
+        
+        size = REQUEST_MESSAGE.size
+        buffer = bytearray(size * len(requests))
+        pack_into = REQUEST_MESSAGE.pack_into
+        request_id = PeerMessage.REQUEST.value
+        for offset, (piece_index, block_offset, block_length) in zip(range(0, len(buffer), size), requests):
+            pack_into(buffer, offset, 13, request_id, piece_index, block_offset, block_length)
+        
+        if self.send_raw(buffer):
+            self.state.pending_requests.update(request_key(*request) for request in requests)
             return True
         return False
     
     def send_piece(self, piece_index: int, block_offset: int, block_data: bytes) -> bool:
         """Send piece message."""
-        payload = struct.pack('>II', piece_index, block_offset) + block_data
+        payload = PIECE_HEADER.pack(piece_index, block_offset) + block_data
         if self.send_message(PeerMessage.PIECE.value, payload):
             self.bytes_uploaded += len(block_data)
+            if self.upload_handler:
+                self.upload_handler(len(block_data))
             return True
         return False
     
     def send_cancel(self, piece_index: int, block_offset: int, block_length: int) -> bool:
         """Send cancel message."""
-        payload = struct.pack('>III', piece_index, block_offset, block_length)
+        payload = REQUEST_PAYLOAD.pack(piece_index, block_offset, block_length)
         if self.send_message(PeerMessage.CANCEL.value, payload):
-            self.state.pending_requests.discard((piece_index, block_offset, block_length))
+            self.state.pending_requests.discard(request_key(piece_index, block_offset, block_length))
             return True
         return False
     
     def has_piece(self, piece_index: int) -> bool:
         """Check if peer has a specific piece."""
-        return piece_index in self.state.pieces_available
+        return 0 <= piece_index < self.num_pieces and self.state.piece_map[piece_index] == 1
     
     def can_request(self) -> bool:
         """Check if we can request data from this peer."""
@@ -390,49 +815,60 @@ class PeerConnection:
                 self.state.am_interested and
                 len(self.state.pending_requests) < 10)  # Limit concurrent requests
     
-    def get_download_speed(self) -> float:
-        """Get download speed in bytes per second."""
-        if not self.connection_time:
-            return 0.0
+    def update_rates(self, now: float):
+        """Fold the bytes moved since the last sample into the smoothed rates."""
+        if self.rate_sample_time is None:
+            self.rate_sample_time = now
+            return
+        
+        elapsed = now - self.rate_sample_time
+        if elapsed < self.RATE_INTERVAL:
+            return
         
-        elapsed = time.time() - self.connection_time
-        if elapsed == 0:
-            return 0.0
+        downloaded = (self.bytes_downloaded - self.rate_sample_downloaded) / elapsed
+        uploaded = (self.bytes_uploaded - self.rate_sample_uploaded) / elapsed
+        self.download_rate += self.RATE_SMOOTHING * (downloaded - self.download_rate)
+        self.upload_rate += self.RATE_SMOOTHING * (uploaded - self.upload_rate)
         
-        return self.bytes_downloaded / elapsed
+        self.rate_sample_time = now
+        self.rate_sample_downloaded = self.bytes_downloaded
+        self.rate_sample_uploaded = self.bytes_uploaded
+    
+    def get_download_speed(self) -> float:
+        """Get smoothed download speed in bytes per second."""
+        return self.download_rate
     
     def get_upload_speed(self) -> float:
-        """Get upload speed in bytes per second."""
-        if not self.connection_time:
-            return 0.0
-        
-        elapsed = time.time() - self.connection_time
-        if elapsed == 0:
-            return 0.0
-        
-        return self.bytes_uploaded / elapsed
+        """Get smoothed upload speed in bytes per second."""
+        return self.upload_rate
     
     def is_alive(self, timeout: int = 120) -> bool:
         """Check if connection is alive (received message recently)."""
         return (self.connected and 
-                time.time() - self.state.last_message_time < timeout)
+                time.monotonic() - self.state.last_message_time < timeout)
     
     def disconnect(self):
         """Disconnect from peer."""
-        self.running = False
+        was_connected = self.connected
         self.connected = False
         
         if self.socket:
+            self.reactor.unregister(self)
+            
             try:
                 self.socket.close()
             except:
                 pass
             self.socket = None
         
-        if self.receive_thread and self.receive_thread.is_alive():
-            self.receive_thread.join(timeout=1)
-        
+        self._release_receive_buffer()
+        self.send_queue.clear()
+        self.send_pending = None
+        self.send_blocked = False
         self.logger.debug("Disconnected from peer")
+        
+        if was_connected and self.disconnect_handler:
+            self.disconnect_handler(self)
     
     def __str__(self) -> str:
         """String representation of peer connection."""
@@ -445,13 +881,34 @@ class PeerConnection:
 class PeerManager:
     """Manages multiple peer connections."""
     
-    def __init__(self, info_hash: bytes, peer_id: bytes, num_pieces: int, max_peers: int = 50):
+    def __init__(self, info_hash: bytes, peer_id: bytes, num_pieces: int, max_peers: int = 50,
+                 busy_poll_us: int = 0, upload_handler: Optional[Callable[[int], None]] = None,
+                 connect_workers: int = 0):
         self.info_hash = info_hash
         self.peer_id = peer_id
         self.num_pieces = num_pieces
         self.max_peers = max_peers
+        self.busy_poll_us = busy_poll_us
+        self.upload_handler = upload_handler
+        self.connect_workers = connect_workers or max_peers  # Concurrent connects, bounded by max_peers by default
+        
+        # Identical for every peer of this torrent, so framed once
+        self.handshake = HANDSHAKE.pack(len(PeerConnection.PROTOCOL_STRING), PeerConnection.PROTOCOL_STRING,
+                                        info_hash, peer_id)
         
         self.peers = {}  # {(ip, port): PeerConnection}
+        self.connecting = set()  # Peer keys with a connect in flight
+        # Held only to mutate peers/connecting, never across a connect; readers use the snapshot
+        self.lock = threading.Lock()
+        self.reactor = PeerReactor()
+        # Receive buffers recycled across this manager's connections
+        self.buffers = BufferPool(PeerConnection.RECEIVE_SIZE, max_peers)
+        
+        # Snapshot of connected peers, rebuilt only after the peer set changes
+        self.versions = itertools.count(1)
+        self.version = 0
+        self.active_cache = ()
+        self.active_version = 0
         self.logger = logging.getLogger(__name__)
         
         # Statistics
@@ -460,37 +917,117 @@ class PeerManager:
     
     def add_peer(self, peer_ip: str, peer_port: int, message_handler: Optional[Callable] = None) -> bool:
         """Add a new peer connection."""
-        if len(self.peers) >= self.max_peers:
-            self.logger.debug(f"Max peers reached ({self.max_peers}), not adding {peer_ip}:{peer_port}")
-            return False
-        
         peer_key = (peer_ip, peer_port)
-        if peer_key in self.peers:
-            self.logger.debug(f"Peer {peer_ip}:{peer_port} already exists")
-            return False
+        
+        # Reserve the slot so concurrent connects cannot duplicate a peer or overshoot max_peers
+        with self.lock:
+            if len(self.peers) + len(self.connecting) >= self.max_peers:
+                self.logger.debug("Max peers reached (%d), not adding %s:%s", self.max_peers, peer_ip, peer_port)
+                return False
+            
+            if peer_key in self.peers or peer_key in self.connecting:
+                self.logger.debug("Peer %s:%s already exists", peer_ip, peer_port)
+                return False
+            
+            self.connecting.add(peer_key)
         
         peer = PeerConnection(peer_ip, peer_port, self.info_hash, self.peer_id, 
-                            self.num_pieces, message_handler)
+                            self.num_pieces, self.reactor, message_handler,
+                            self.busy_poll_us, self.upload_handler, self._on_peer_disconnected,
+                            self.handshake, self.buffers)
         
-        if peer.connect():
-            self.peers[peer_key] = peer
+        connected = False
+        try:
+            connected = peer.connect()
+        finally:
+            with self.lock:
+                self.connecting.discard(peer_key)
+                if connected:
+                    self.peers[peer_key] = peer
+        
+        if connected:
+            self._invalidate_active_peers()
             self.logger.info(f"Added peer {peer_ip}:{peer_port}")
             return True
         else:
             self.logger.warning(f"Failed to connect to peer {peer_ip}:{peer_port}")
             return False
     
+    def add_peers(self, peers: List[Tuple[str, int]], message_handler: Optional[Callable] = None) -> int:
+        """
+        Connect to several peers concurrently.
+        
+        Connects and handshakes run on a pool of at most connect_workers threads,
+        so one slow peer does not hold up the rest.
+        
+        Returns:
+            Number of peers successfully added
+        """
+        candidates = []
+        for peer_key in dict.fromkeys(peers):
+            if len(self.peers) + len(candidates) >= self.max_peers:
+                break
+            if peer_key not in self.peers:
+                candidates.append(peer_key)
+        
+        if not candidates:
+            return 0
+        
+        workers = min(self.connect_workers, len(candidates))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="peer-connect") as pool:
+            results = pool.map(lambda peer_key: self.add_peer(peer_key[0], peer_key[1], message_handler),
+                               candidates)
+            return sum(results)
+    
     def remove_peer(self, peer_ip: str, peer_port: int):
         """Remove a peer connection."""
-        peer_key = (peer_ip, peer_port)
-        if peer_key in self.peers:
-            self.peers[peer_key].disconnect()
-            del self.peers[peer_key]
+        with self.lock:
+            peer = self.peers.pop((peer_ip, peer_port), None)
+        
+        if peer:
+            peer.disconnect()
+            self._invalidate_active_peers()
             self.logger.info(f"Removed peer {peer_ip}:{peer_port}")
     
-    def get_active_peers(self) -> List[PeerConnection]:
-        """Get list of active peer connections."""
-        return [peer for peer in self.peers.values() if peer.connected]
+    def _invalidate_active_peers(self):
+        """Mark the active peer snapshot stale."""
+        # next() on a count is atomic, so concurrent bumps never collide with a cached version
+        self.version = next(self.versions)
+    
+    def _on_peer_disconnected(self, peer: PeerConnection):
+        """Drop a closed connection from the active peer snapshot."""
+        self._invalidate_active_peers()
+    
+    def get_active_peers(self) -> Tuple[PeerConnection, ...]:
+        """
+        Get active peer connections.
+        
+        Returns a shared tuple that is only rebuilt after peers are added,
+        removed or disconnected, so callers must not modify it.
+        """
+        version = self.version
+        if version != self.active_version:
+            self.active_cache = tuple(peer for peer in list(self.peers.values()) if peer.connected)
+            self.active_version = version
+        return self.active_cache
+    
+    def broadcast_have(self, piece_index: int) -> int:
+        """
+        Announce a piece to all active peers.
+        
+        The HAVE message is framed once and the same bytes are sent to every peer.
+        
+        Returns:
+            Number of peers the message was sent to
+        """
+        message = HAVE_MESSAGE.pack(5, PeerMessage.HAVE.value, piece_index)
+        
+        sent = 0
+        for peer in self.get_active_peers():
+            if peer.send_raw(message):
+                sent += 1
+        
+        return sent
     
     def get_peers_with_piece(self, piece_index: int) -> List[PeerConnection]:
         """Get peers that have a specific piece."""
@@ -499,7 +1036,7 @@ class PeerManager:
     def cleanup_dead_peers(self):
         """Remove dead peer connections."""
         dead_peers = []
-        for (ip, port), peer in self.peers.items():
+        for (ip, port), peer in list(self.peers.items()):
             if not peer.is_alive():
                 dead_peers.append((ip, port))
         
@@ -510,6 +1047,11 @@ class PeerManager:
         """Get peer manager statistics."""
         active_peers = self.get_active_peers()
         
+        # Resample rates so peers that went quiet decay instead of reporting stale speeds
+        now = time.monotonic()
+        for peer in active_peers:
+            peer.update_rates(now)
+        
         total_downloaded = sum(peer.bytes_downloaded for peer in active_peers)
         total_uploaded = sum(peer.bytes_uploaded for peer in active_peers)
         
@@ -525,18 +1067,27 @@ class PeerManager:
             'upload_speed': upload_speed
         }
     
+    def stop_receiving(self):
+        """Stop dispatching received messages so peers can be torn down safely."""
+        self.reactor.close()
+    
     def disconnect_all(self):
         """Disconnect all peers."""
-        for peer in self.peers.values():
+        with self.lock:
+            peers = list(self.peers.values())
+            self.peers.clear()
+        
+        for peer in peers:
             peer.disconnect()
-        self.peers.clear()
+        self._invalidate_active_peers()
+        self.reactor.stop()
         self.logger.info("Disconnected all peers")
 
 
 if __name__ == "__main__":
     # Test peer connection functionality
     import sys
-    import random
+    import os
     
     if len(sys.argv) != 4:
         print("Usage: python peer_client.py <peer_ip> <peer_port> <torrent_file>")
@@ -551,13 +1102,14 @@ if __name__ == "__main__":
         peer_port = int(sys.argv[2])
         torrent = parse_torrent(sys.argv[3])
         
-        peer_id = b'-PC0001-' + bytes([random.randint(0, 255) for _ in range(12)])
+        peer_id = b'-PC0001-' + os.urandom(12)
         
         def message_handler(peer, message_id, payload):
             print(f"Received message {message_id} from {peer.peer_ip}:{peer.peer_port}")
         
+        reactor = PeerReactor()
         peer = PeerConnection(peer_ip, peer_port, torrent.info_hash, peer_id, 
-                            torrent.num_pieces, message_handler)
+                            torrent.num_pieces, reactor, message_handler)
         
         if peer.connect():
             print(f"Connected to {peer_ip}:{peer_port}")
@@ -569,6 +1121,7 @@ if __name__ == "__main__":
             time.sleep(10)
             
             peer.disconnect()
+            reactor.stop()
         else:
             print(f"Failed to connect to {peer_ip}:{peer_port}")
             
@@ -8,14 +8,34 @@ It manages peer connections, handshakes, and message exchange.
 Author: BitTorrent CLI Client
 """
 
+import itertools
+import os
+import selectors
 import socket
 import struct
 import threading
 import time
 import logging
-from typing import Optional, Callable, Set
+from collections import deque
+from concurrent import futures
+from typing import Optional, Callable, Iterable, List, Set, Tuple
 from bitstring import BitArray
 
+# Precompiled wire formats, so messages never re-parse a format string
+MESSAGE_LENGTH = struct.Struct('!I')
+MESSAGE_HEADER = struct.Struct('!IB')  # <length><message ID>
+PIECE_INDEX = struct.Struct('!I')  # HAVE payload
+PIECE_HEADER = struct.Struct('!II')  # <index><begin> of a PIECE payload
+REQUEST_PAYLOAD = struct.Struct('!III')  # <index><begin><length>, REQUEST and CANCEL
+PORT_PAYLOAD = struct.Struct('!H')
+HANDSHAKE = struct.Struct('!B19s8s20s20s')  # <pstrlen><pstr><reserved><info_hash><peer_id>
+KEEP_ALIVE = MESSAGE_LENGTH.pack(0)
+
+# Each bitfield byte expanded to eight 0/1 flag bytes
+BYTE_FLAGS = tuple(bytes((byte >> (7 - bit)) & 1 for bit in range(8)) for byte in range(256))
+# Translation table reversing the bits of a byte, so a bitfield read little-endian has piece i at bit i
+REVERSED_BITS = bytes(int(f'{byte:08b}'[::-1], 2) for byte in range(256))
+
 
 class PeerMessage:
     """BitTorrent peer wire protocol message types."""
@@ -36,6 +56,176 @@ class PeerError(Exception):
     pass
 
 
+class PeerReactor:
+    """
+    Single event loop driving reads and writes for all connected peers.
+    
+    Peer sockets are registered with one selector (epoll/kqueue where
+    available) and a single thread hands readable sockets to their peer,
+    instead of every peer blocking in its own receive and keep-alive threads.
+    The sockets are non-blocking and only this thread writes to them, other
+    threads queue data on the peer and wake the loop through a socket pair,
+    so a peer that stops reading never stalls the others.
+    """
+    
+    SELECT_TIMEOUT = 0.5
+    
+    def __init__(self, keep_alive_interval: float = 120):
+        """
+        Initialize the reactor.
+        
+        Args:
+            keep_alive_interval: Seconds between keep-alives sent to every peer
+        """
+        self.selector = selectors.DefaultSelector()
+        self.keep_alive_interval = keep_alive_interval
+        self.running = False
+        self.closed = False  # Set by stop(), no peer is registered afterwards
+        self.thread = None
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger("PeerReactor")
+        
+        # Peers with queued outgoing data, flushed by the event loop thread
+        self.write_ready = deque()
+        
+        # Wakes a blocked select() when another thread queues data
+        self.wake_reader, self.wake_writer = socket.socketpair()
+        self.wake_reader.setblocking(False)
+        self.wake_writer.setblocking(False)
+        self.wake_pending = False
+        self.selector.register(self.wake_reader, selectors.EVENT_READ, None)
+    
+    def register(self, peer: 'Peer') -> bool:
+        """
+        Start delivering read events for a connected peer.
+        
+        Returns:
+            False if the peer could not be registered or the reactor was stopped
+        """
+        with self.lock:
+            if self.closed:
+                return False
+            
+            try:
+                peer.fileno = peer.socket.fileno()
+                self.selector.register(peer.fileno, selectors.EVENT_READ, peer)
+            except (KeyError, ValueError, OSError) as e:
+                peer.fileno = None
+                self.logger.error(f"Failed to register peer {peer.ip}:{peer.port}: {e}")
+                return False
+        
+        self.start()
+        # Write out anything queued before the peer was registered
+        self.schedule_write(peer)
+        return True
+    
+    def unregister(self, peer: 'Peer'):
+        """Stop delivering read events for a peer."""
+        if peer.fileno is None:
+            return
+        
+        try:
+            self.selector.unregister(peer.fileno)
+        except (KeyError, ValueError, OSError):
+            pass
+        peer.fileno = None
+    
+    def schedule_write(self, peer: 'Peer'):
+        """Have the loop thread flush a peer's queued data."""
+        self.write_ready.append(peer)
+        # The loop flushes after every turn, so it never needs waking itself
+        if threading.current_thread() is not self.thread:
+            self.wakeup()
+    
+    def set_write_interest(self, peer: 'Peer', enabled: bool):
+        """Watch a peer socket for writability while it has unsent data."""
+        events = selectors.EVENT_READ | selectors.EVENT_WRITE if enabled else selectors.EVENT_READ
+        try:
+            self.selector.modify(peer.fileno, events, peer)
+        except (KeyError, ValueError, OSError):
+            pass
+    
+    def wakeup(self):
+        """Interrupt a blocked select() from another thread."""
+        if self.wake_pending:
+            return
+        
+        self.wake_pending = True
+        try:
+            self.wake_writer.send(b'\0')
+        except OSError:
+            pass  # A wakeup is already buffered
+    
+    def _drain_wakeups(self):
+        """Consume wakeup bytes so the next select() blocks again."""
+        try:
+            while self.wake_reader.recv(4096):
+                pass
+        except OSError:
+            pass
+        # Cleared only after draining, a wakeup sent meanwhile leaves its byte buffered
+        self.wake_pending = False
+    
+    def _flush_writes(self):
+        """Write out data queued for peers since the last turn."""
+        write_ready = self.write_ready
+        while write_ready:
+            peer = write_ready.popleft()
+            if peer.connected:
+                peer._flush_send_queue()
+    
+    def start(self):
+        """Start the event loop thread if it is not already running."""
+        with self.lock:
+            if self.running or self.closed:
+                return
+            
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+    
+    def stop(self):
+        """Stop the event loop thread for good, later registrations are rejected."""
+        with self.lock:
+            self.running = False
+            self.closed = True
+        
+        self.wakeup()
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+        self.thread = None
+    
+    def _run(self):
+        """Dispatch readable peer sockets and send keep-alives until stopped."""
+        next_keep_alive = time.monotonic() + self.keep_alive_interval
+        
+        while self.running:
+            try:
+                events = self.selector.select(timeout=self.SELECT_TIMEOUT)
+            except OSError as e:
+                self.logger.error(f"Error in select: {e}")
+                continue
+            
+            for key, mask in events:
+                peer = key.data
+                if peer is None:
+                    self._drain_wakeups()
+                    continue
+                
+                if mask & selectors.EVENT_WRITE:
+                    peer._flush_send_queue()
+                if mask & selectors.EVENT_READ and peer.connected:
+                    peer._on_readable()
+            
+            if time.monotonic() >= next_keep_alive:
+                next_keep_alive += self.keep_alive_interval
+                for key in list(self.selector.get_map().values()):
+                    if key.data is not None:
+                        key.data._send_keep_alive()
+            
+            self._flush_writes()
+
+
 class Peer:
     """
     BitTorrent peer connection and communication.
@@ -48,9 +238,11 @@ class Peer:
     HANDSHAKE_TIMEOUT = 30
     MESSAGE_TIMEOUT = 60
     KEEP_ALIVE_INTERVAL = 120
+    RECV_BUFFER_SIZE = 65536  # Enough for several block messages per recv
+    SEND_BUFFER_SIZE = 64  # Payloads up to this size are framed in place, larger ones sent gathered
     
     def __init__(self, ip: str, port: int, info_hash: bytes, peer_id: bytes,
-                 piece_manager, file_manager):
+                 piece_manager, file_manager, reactor: Optional[PeerReactor] = None):
         """
         Initialize peer connection.
         
@@ -61,6 +253,7 @@ class Peer:
             peer_id: Our 20-byte peer ID
             piece_manager: PieceManager instance for piece coordination
             file_manager: FileManager instance for file I/O
+            reactor: Shared event loop to receive on, dedicated threads if None
         """
         self.ip = ip
         self.port = port
@@ -68,12 +261,31 @@ class Peer:
         self.peer_id = peer_id
         self.piece_manager = piece_manager
         self.file_manager = file_manager
+        self.reactor = reactor
         
         # Connection state
         self.socket = None
+        self.fileno = None
         self.connected = False
         self.handshake_complete = False
         
+        # Receive buffering, one recv can carry several messages; unread data
+        # lies between recv_offset and recv_end and is parsed in place
+        self.recv_buffer = bytearray(self.RECV_BUFFER_SIZE)
+        self.recv_view = memoryview(self.recv_buffer)
+        self.recv_offset = 0
+        self.recv_end = 0
+        
+        # Send framing buffer, guarded so concurrent senders never interleave messages
+        self.send_buffer = bytearray(MESSAGE_HEADER.size + self.SEND_BUFFER_SIZE)
+        self.send_view = memoryview(self.send_buffer)
+        self.send_lock = threading.Lock()
+        
+        # Outgoing data of a reactor-driven peer, written only by the reactor thread
+        self.send_queue = deque()
+        self.send_pending = None  # Unsent tail of the coalesced queue
+        self.send_blocked = False
+        
         # Peer state
         self.peer_id_remote = None
         self.am_choking = True
@@ -84,6 +296,21 @@ class Peer:
         # Piece availability
         self.bitfield = None
         self.have_pieces: Set[int] = set()
+        self.have_mask = 0  # Bit i set if the peer has piece i
+        
+        # Message ID -> handler, every handler takes the payload
+        self.dispatch = {
+            PeerMessage.CHOKE: self._handle_choke,
+            PeerMessage.UNCHOKE: self._handle_unchoke,
+            PeerMessage.INTERESTED: self._handle_interested,
+            PeerMessage.NOT_INTERESTED: self._handle_not_interested,
+            PeerMessage.HAVE: self._handle_have,
+            PeerMessage.BITFIELD: self._handle_bitfield,
+            PeerMessage.REQUEST: self._handle_request,
+            PeerMessage.PIECE: self._handle_piece,
+            PeerMessage.CANCEL: self._handle_cancel,
+            PeerMessage.PORT: self._handle_port,
+        }
         
         # Request management
         self.pending_requests = {}  # (piece_index, block_offset) -> timestamp
@@ -124,7 +351,7 @@ class Peer:
             # Connect
             self.socket.connect((self.ip, self.port))
             self.connected = True
-            self.connect_time = time.time()
+            self.connect_time = time.monotonic()
             
             self.logger.debug("Socket connected, performing handshake")
             
@@ -135,8 +362,20 @@ class Peer:
             
             # Start message handling
             self.running = True
-            self.socket.settimeout(self.MESSAGE_TIMEOUT)
             
+            if self.reactor:
+                # Only the reactor thread writes, and never waits on a slow reader
+                self.socket.setblocking(False)
+                # Messages that arrived with the handshake never trigger a read event
+                self._process_recv_buffer()
+                if not self.connected or not self.reactor.register(self):
+                    self.disconnect()
+                    return False
+                
+                self.logger.info("Connection established successfully")
+                return True
+            
+            self.socket.settimeout(self.MESSAGE_TIMEOUT)
             self.message_thread = threading.Thread(target=self._message_loop, daemon=True)
             self.message_thread.start()
             
@@ -161,6 +400,11 @@ class Peer:
         self.running = False
         self.connected = False
         
+        if self.reactor:
+            self.reactor.unregister(self)
+        self.send_queue.clear()
+        self.send_pending = None
+        
         # Close socket
         if self.socket:
             try:
@@ -204,9 +448,9 @@ class Peer:
             pstrlen = len(pstr)
             reserved = b'\x00' * 8
             
-            handshake = struct.pack('!B', pstrlen) + pstr + reserved + self.info_hash + self.peer_id
+            handshake = HANDSHAKE.pack(pstrlen, pstr, reserved, self.info_hash, self.peer_id)
             
-            self.socket.send(handshake)
+            self.socket.sendall(handshake)
             self.logger.debug("Handshake sent")
             
             # Receive handshake response
@@ -216,18 +460,13 @@ class Peer:
                 raise PeerError(f"Invalid handshake length: {len(response)}")
             
             # Parse response
-            resp_pstrlen = response[0]
+            resp_pstrlen, resp_pstr, resp_reserved, resp_info_hash, resp_peer_id = HANDSHAKE.unpack(response)
             if resp_pstrlen != 19:
                 raise PeerError(f"Invalid protocol string length: {resp_pstrlen}")
             
-            resp_pstr = response[1:20]
             if resp_pstr != pstr:
                 raise PeerError(f"Invalid protocol string: {resp_pstr}")
             
-            resp_reserved = response[20:28]
-            resp_info_hash = response[28:48]
-            resp_peer_id = response[48:68]
-            
             # Verify info hash
             if resp_info_hash != self.info_hash:
                 raise PeerError("Info hash mismatch")
@@ -242,32 +481,73 @@ class Peer:
             self.logger.warning(f"Handshake failed: {e}")
             return False
     
-    def _receive_exact(self, length: int) -> bytes:
+    def _receive_exact(self, length: int) -> memoryview:
         """
         Receive exactly the specified number of bytes.
         
+        Served from the receive buffer, which is refilled only when it
+        runs short.
+        
         Args:
             length: Number of bytes to receive
             
         Returns:
-            Received bytes
+            View of the received bytes, valid until the next receive
             
         Raises:
             PeerError: If connection is closed or timeout occurs
         """
-        data = b''
-        while len(data) < length:
-            try:
-                chunk = self.socket.recv(length - len(data))
-                if not chunk:
-                    raise PeerError("Connection closed by peer")
-                data += chunk
-            except socket.timeout:
-                raise PeerError("Receive timeout")
-            except Exception as e:
-                raise PeerError(f"Receive error: {e}")
+        while self.recv_end - self.recv_offset < length:
+            self._fill_recv_buffer(length)
+        
+        start = self.recv_offset
+        self.recv_offset = start + length
+        return self.recv_view[start:self.recv_offset]
+    
+    def _fill_recv_buffer(self, needed: int = 0):
+        """
+        Read whatever the socket has available straight into the receive buffer.
+        
+        Args:
+            needed: Unread bytes the buffer must be able to hold
+            
+        Raises:
+            PeerError: If connection is closed or timeout occurs
+        """
+        # Compact once half the buffer is consumed so every read has room for a burst
+        size = len(self.recv_buffer)
+        if self.recv_end == size or self.recv_offset > size // 2 or needed > size - self.recv_offset:
+            self._make_recv_room(needed)
+        
+        try:
+            received = self.socket.recv_into(self.recv_view[self.recv_end:])
+        except socket.timeout:
+            raise PeerError("Receive timeout")
+        except (BlockingIOError, InterruptedError):
+            raise
+        except Exception as e:
+            raise PeerError(f"Receive error: {e}")
+        
+        if not received:
+            raise PeerError("Connection closed by peer")
         
-        return data
+        self.recv_end += received
+    
+    def _make_recv_room(self, needed: int):
+        """Move unread data to the front of the buffer, growing it if it cannot fit a message."""
+        pending = self.recv_end - self.recv_offset
+        size = len(self.recv_buffer)
+        if pending == size or needed > size:
+            # Replace rather than resize, views handed out earlier keep the old buffer alive
+            buffer = bytearray(max(size * 2, needed))
+            buffer[:pending] = self.recv_view[self.recv_offset:self.recv_end]
+            self.recv_buffer = buffer
+            self.recv_view = memoryview(buffer)
+        elif self.recv_offset:
+            self.recv_buffer[:pending] = self.recv_buffer[self.recv_offset:self.recv_end]
+        
+        self.recv_offset = 0
+        self.recv_end = pending
     
     def _message_loop(self):
         """Main message handling loop."""
@@ -275,21 +555,11 @@ class Peer:
         
         while self.running and self.connected:
             try:
-                # Receive message length (4 bytes)
-                length_data = self._receive_exact(4)
-                message_length = struct.unpack('!I', length_data)[0]
-                
-                # Handle keep-alive message (length = 0)
-                if message_length == 0:
-                    self.last_message_time = time.time()
-                    continue
-                
-                # Receive message payload
-                message_data = self._receive_exact(message_length)
-                self.last_message_time = time.time()
-                
-                # Process message
-                self._handle_message(message_data)
+                # Handle every complete message already buffered, including any
+                # that arrived with the handshake, then block for the next read
+                self._process_recv_buffer()
+                if self.running and self.connected:
+                    self._fill_recv_buffer()
                 
             except PeerError as e:
                 self.logger.debug(f"Message loop error: {e}")
@@ -301,7 +571,56 @@ class Peer:
         self.logger.debug("Message loop ended")
         self.disconnect()
     
-    def _handle_message(self, message_data: bytes):
+    def _on_readable(self):
+        """Receive and handle available messages when the reactor reports data."""
+        try:
+            self._fill_recv_buffer()
+            self._process_recv_buffer()
+            
+        except (BlockingIOError, InterruptedError):
+            # Spurious wakeup, wait for the next read event
+            pass
+        except PeerError as e:
+            self.logger.debug(f"Receive error: {e}")
+            self.disconnect()
+        except Exception as e:
+            self.logger.warning(f"Unexpected receive error: {e}")
+            self.disconnect()
+    
+    def _process_recv_buffer(self):
+        """Handle every complete message in the receive buffer."""
+        buffer = self.recv_buffer
+        view = self.recv_view
+        received = False
+        
+        while self.connected:
+            available = self.recv_end - self.recv_offset
+            if available < 4:
+                break
+            
+            message_length = MESSAGE_LENGTH.unpack_from(buffer, self.recv_offset)[0]
+            if available < 4 + message_length:
+                # Make sure the rest of a message larger than the buffer can be read
+                if 4 + message_length > len(buffer):
+                    self._make_recv_room(4 + message_length)
+                break
+            
+            start = self.recv_offset + 4
+            self.recv_offset = start + message_length
+            received = True
+            
+            # Zero length is a keep-alive
+            if message_length:
+                self._handle_message(view[start:self.recv_offset])
+        
+        # One clock read per drained batch rather than per message
+        if received:
+            self.last_message_time = time.monotonic()
+        
+        if self.recv_offset == self.recv_end:
+            self.recv_offset = self.recv_end = 0
+    
+    def _handle_message(self, message_data: memoryview):
         """
         Handle incoming peer message.
         
@@ -314,30 +633,14 @@ class Peer:
         message_id = message_data[0]
         payload = message_data[1:]
         
-        if message_id == PeerMessage.CHOKE:
-            self._handle_choke()
-        elif message_id == PeerMessage.UNCHOKE:
-            self._handle_unchoke()
-        elif message_id == PeerMessage.INTERESTED:
-            self._handle_interested()
-        elif message_id == PeerMessage.NOT_INTERESTED:
-            self._handle_not_interested()
-        elif message_id == PeerMessage.HAVE:
-            self._handle_have(payload)
-        elif message_id == PeerMessage.BITFIELD:
-            self._handle_bitfield(payload)
-        elif message_id == PeerMessage.REQUEST:
-            self._handle_request(payload)
-        elif message_id == PeerMessage.PIECE:
-            self._handle_piece(payload)
-        elif message_id == PeerMessage.CANCEL:
-            self._handle_cancel(payload)
-        elif message_id == PeerMessage.PORT:
-            self._handle_port(payload)
+        # One dict lookup instead of walking an if/elif chain per message
+        handler = self.dispatch.get(message_id)
+        if handler:
+            handler(payload)
         else:
             self.logger.warning(f"Unknown message ID: {message_id}")
     
-    def _handle_choke(self):
+    def _handle_choke(self, payload: memoryview):
         """Handle choke message."""
         self.peer_choking = True
         self.logger.debug("Peer choked us")
@@ -347,7 +650,7 @@ class Peer:
             self.piece_manager.cancel_request(piece_index, block_offset)
         self.pending_requests.clear()
     
-    def _handle_unchoke(self):
+    def _handle_unchoke(self, payload: memoryview):
         """Handle unchoke message."""
         self.peer_choking = False
         self.logger.debug("Peer unchoked us")
@@ -356,7 +659,7 @@ class Peer:
         if self.am_interested:
             self._request_pieces()
     
-    def _handle_interested(self):
+    def _handle_interested(self, payload: memoryview):
         """Handle interested message."""
         self.peer_interested = True
         self.logger.debug("Peer is interested")
@@ -365,19 +668,23 @@ class Peer:
         if self.am_choking and self._should_unchoke_peer():
             self.send_unchoke()
     
-    def _handle_not_interested(self):
+    def _handle_not_interested(self, payload: memoryview):
         """Handle not interested message."""
         self.peer_interested = False
         self.logger.debug("Peer is not interested")
     
-    def _handle_have(self, payload: bytes):
+    def _handle_have(self, payload: memoryview):
         """Handle have message."""
         if len(payload) != 4:
             self.logger.warning(f"Invalid have message length: {len(payload)}")
             return
         
-        piece_index = struct.unpack('!I', payload)[0]
+        piece_index = PIECE_INDEX.unpack(payload)[0]
         self.have_pieces.add(piece_index)
+        # Bits past the highest needed piece never match, and bounding the
+        # shift keeps a bogus index from building a huge int
+        if piece_index < self.piece_manager.needed_mask.bit_length():
+            self.have_mask |= 1 << piece_index
         
         # Update bitfield if we have one
         if self.bitfield and piece_index < len(self.bitfield):
@@ -389,16 +696,17 @@ class Peer:
         if not self.am_interested and self.piece_manager.need_piece(piece_index):
             self.send_interested()
     
-    def _handle_bitfield(self, payload: bytes):
+    def _handle_bitfield(self, payload: memoryview):
         """Handle bitfield message."""
         try:
-            self.bitfield = BitArray(bytes=payload)
+            self.bitfield = BitArray(bytes=bytes(payload))
             
-            # Update have_pieces set
+            # Update have_pieces set, expanding whole bytes and selecting set
+            # flags without a Python-level loop per bit
+            flags = b''.join(map(BYTE_FLAGS.__getitem__, payload))
             self.have_pieces.clear()
-            for i in range(len(self.bitfield)):
-                if self.bitfield[i]:
-                    self.have_pieces.add(i)
+            self.have_pieces.update(itertools.compress(range(len(flags)), flags))
+            self.have_mask = int.from_bytes(bytes(payload).translate(REVERSED_BITS), 'little')
             
             self.logger.debug(f"Received bitfield: {len(self.have_pieces)} pieces")
             
@@ -409,13 +717,13 @@ class Peer:
         except Exception as e:
             self.logger.warning(f"Failed to parse bitfield: {e}")
     
-    def _handle_request(self, payload: bytes):
+    def _handle_request(self, payload: memoryview):
         """Handle request message."""
         if len(payload) != 12:
             self.logger.warning(f"Invalid request message length: {len(payload)}")
             return
         
-        piece_index, block_offset, block_length = struct.unpack('!III', payload)
+        piece_index, block_offset, block_length = REQUEST_PAYLOAD.unpack(payload)
         
         self.logger.debug(f"Peer requested piece {piece_index}, offset {block_offset}, length {block_length}")
         
@@ -423,13 +731,14 @@ class Peer:
         if not self.am_choking and self.piece_manager.have_piece(piece_index):
             self._send_piece_block(piece_index, block_offset, block_length)
     
-    def _handle_piece(self, payload: bytes):
+    def _handle_piece(self, payload: memoryview):
         """Handle piece message."""
         if len(payload) < 8:
             self.logger.warning(f"Invalid piece message length: {len(payload)}")
             return
         
-        piece_index, block_offset = struct.unpack('!II', payload[:8])
+        piece_index, block_offset = PIECE_HEADER.unpack_from(payload)
+        # Handed over as a view, the piece manager copies it into the piece buffer
         block_data = payload[8:]
         
         self.logger.debug(f"Received block: piece {piece_index}, offset {block_offset}, length {len(block_data)}")
@@ -454,22 +763,22 @@ class Peer:
         # Request more pieces
         self._request_pieces()
     
-    def _handle_cancel(self, payload: bytes):
+    def _handle_cancel(self, payload: memoryview):
         """Handle cancel message."""
         if len(payload) != 12:
             self.logger.warning(f"Invalid cancel message length: {len(payload)}")
             return
         
-        piece_index, block_offset, block_length = struct.unpack('!III', payload)
+        piece_index, block_offset, block_length = REQUEST_PAYLOAD.unpack(payload)
         self.logger.debug(f"Peer cancelled request: piece {piece_index}, offset {block_offset}")
     
-    def _handle_port(self, payload: bytes):
+    def _handle_port(self, payload: memoryview):
         """Handle DHT port message."""
         if len(payload) != 2:
             self.logger.warning(f"Invalid port message length: {len(payload)}")
             return
         
-        dht_port = struct.unpack('!H', payload)[0]
+        dht_port = PORT_PAYLOAD.unpack(payload)[0]
         self.logger.debug(f"Peer DHT port: {dht_port}")
     
     def _keep_alive_loop(self):
@@ -485,32 +794,103 @@ class Peer:
                 self.logger.debug(f"Keep-alive error: {e}")
                 break
     
-    def _send_message(self, message_id: Optional[int], payload: bytes = b''):
+    def _send_message(self, message_id: Optional[int], payload: bytes = b'', block: bytes = b''):
         """
         Send a message to the peer.
         
         Args:
             message_id: Message type ID (None for keep-alive)
             payload: Message payload
+            block: Data following the payload, written without being copied
         """
         if not self.connected:
             return
         
-        try:
+        if self.reactor:
             if message_id is None:
-                # Keep-alive message (length = 0)
-                message = struct.pack('!I', 0)
-            else:
-                # Regular message
-                message_data = struct.pack('!B', message_id) + payload
-                message = struct.pack('!I', len(message_data)) + message_data
+                self._queue_send(KEEP_ALIVE)
+                return
             
-            self.socket.send(message)
+            length = len(payload) + len(block)
+            self._queue_send(MESSAGE_HEADER.pack(length + 1, message_id) + payload)
+            if block:
+                self._queue_send(block)
+            return
+        
+        try:
+            with self.send_lock:
+                if message_id is None:
+                    # Keep-alive message (length = 0)
+                    self.socket.sendall(KEEP_ALIVE)
+                    return
+                
+                length = len(payload) + len(block)
+                if length <= self.SEND_BUFFER_SIZE:
+                    # Frame small messages in the reusable buffer
+                    MESSAGE_HEADER.pack_into(self.send_buffer, 0, length + 1, message_id)
+                    start = MESSAGE_HEADER.size
+                    end = start + len(payload)
+                    self.send_view[start:end] = payload
+                    self.send_view[end:end + len(block)] = block
+                    self.socket.sendall(self.send_view[:start + length])
+                else:
+                    header = MESSAGE_HEADER.pack(length + 1, message_id)
+                    self._send_gathered([header, payload, block])
             
         except Exception as e:
             self.logger.debug(f"Send error: {e}")
             self.disconnect()
     
+    def _queue_send(self, data: bytes):
+        """Queue framed data for the reactor thread, which owns all socket writes."""
+        self.send_queue.append(data)
+        # Data queued before registration is flushed by register()
+        if self.fileno is not None:
+            self.reactor.schedule_write(self)
+    
+    def _flush_send_queue(self):
+        """Write queued data until drained or the socket would block (reactor thread only)."""
+        send_queue = self.send_queue
+        while self.send_pending is not None or send_queue:
+            if self.send_pending is None:
+                # Coalesce everything queued so far into a single send
+                chunks = []
+                while send_queue:
+                    chunks.append(send_queue.popleft())
+                self.send_pending = memoryview(b''.join(chunks))
+            
+            try:
+                sent = self.socket.send(self.send_pending)
+            except (BlockingIOError, InterruptedError):
+                break
+            except Exception as e:
+                self.logger.debug(f"Send error: {e}")
+                self.disconnect()
+                return
+            
+            pending = self.send_pending[sent:]
+            self.send_pending = pending if len(pending) else None
+        
+        blocked = self.send_pending is not None
+        if blocked != self.send_blocked:
+            self.send_blocked = blocked
+            self.reactor.set_write_interest(self, blocked)
+    
+    def _send_gathered(self, buffers: List[bytes]):
+        """Write buffers back to back in as few syscalls as possible, resuming after short writes."""
+        if not hasattr(self.socket, 'sendmsg'):
+            self.socket.sendall(b''.join(buffers))
+            return
+        
+        views = [memoryview(buffer) for buffer in buffers if buffer]
+        while views:
+            sent = self.socket.sendmsg(views)
+            while views and sent >= len(views[0]):
+                sent -= len(views[0])
+                views.pop(0)
+            if sent:
+                views[0] = views[0][sent:]
+    
     def _send_keep_alive(self):
         """Send keep-alive message."""
         self._send_message(None)
@@ -545,7 +925,7 @@ class Peer:
     
     def send_have(self, piece_index: int):
         """Send have message."""
-        payload = struct.pack('!I', piece_index)
+        payload = PIECE_INDEX.pack(piece_index)
         self._send_message(PeerMessage.HAVE, payload)
         self.logger.debug(f"Sent have for piece {piece_index}")
     
@@ -560,6 +940,9 @@ class Peer:
         if not self.am_interested or self.peer_choking:
             return
         
+        # Every request sent in this call shares one timestamp
+        now = time.monotonic()
+        
         # Limit number of pending requests
         while len(self.pending_requests) < self.max_pending_requests:
             # Find a block to request
@@ -570,11 +953,11 @@ class Peer:
             piece_index, block_offset, block_length = request
             
             # Send request
-            payload = struct.pack('!III', piece_index, block_offset, block_length)
+            payload = REQUEST_PAYLOAD.pack(piece_index, block_offset, block_length)
             self._send_message(PeerMessage.REQUEST, payload)
             
             # Track request
-            self.pending_requests[(piece_index, block_offset)] = time.time()
+            self.pending_requests[(piece_index, block_offset)] = now
             
             self.logger.debug(f"Requested piece {piece_index}, offset {block_offset}, length {block_length}")
     
@@ -585,8 +968,8 @@ class Peer:
             block_data = self.file_manager.read_block(piece_index, block_offset, block_length)
             
             if block_data:
-                payload = struct.pack('!II', piece_index, block_offset) + block_data
-                self._send_message(PeerMessage.PIECE, payload)
+                payload = PIECE_HEADER.pack(piece_index, block_offset)
+                self._send_message(PeerMessage.PIECE, payload, block_data)
                 
                 # Update statistics
                 self.bytes_uploaded += len(block_data)
@@ -598,10 +981,7 @@ class Peer:
     
     def _peer_has_needed_pieces(self) -> bool:
         """Check if peer has pieces we need."""
-        for piece_index in self.have_pieces:
-            if self.piece_manager.need_piece(piece_index):
-                return True
-        return False
+        return bool(self.have_mask & self.piece_manager.needed_mask)
     
     def _should_unchoke_peer(self) -> bool:
         """Determine if we should unchoke this peer."""
@@ -612,7 +992,7 @@ class Peer:
     def cancel_pending_requests(self):
         """Cancel all pending piece requests."""
         for (piece_index, block_offset) in list(self.pending_requests.keys()):
-            payload = struct.pack('!III', piece_index, block_offset, self.BLOCK_SIZE)
+            payload = REQUEST_PAYLOAD.pack(piece_index, block_offset, self.BLOCK_SIZE)
             self._send_message(PeerMessage.CANCEL, payload)
             
             self.piece_manager.cancel_request(piece_index, block_offset)
@@ -622,7 +1002,7 @@ class Peer:
     
     def cleanup_stale_requests(self, timeout: int = 60):
         """Remove requests that have been pending too long."""
-        current_time = time.time()
+        current_time = time.monotonic()
         stale_requests = []
         
         for (piece_index, block_offset), request_time in self.pending_requests.items():
@@ -642,7 +1022,7 @@ class Peer:
         if self.connect_time == 0:
             return 0.0
         
-        elapsed = time.time() - self.connect_time
+        elapsed = time.monotonic() - self.connect_time
         return self.bytes_downloaded / elapsed if elapsed > 0 else 0.0
     
     @property
@@ -651,7 +1031,7 @@ class Peer:
         if self.connect_time == 0:
             return 0.0
         
-        elapsed = time.time() - self.connect_time
+        elapsed = time.monotonic() - self.connect_time
         return self.bytes_uploaded / elapsed if elapsed > 0 else 0.0
     
     def __str__(self) -> str:
@@ -681,7 +1061,10 @@ class PeerManager:
     data transfer across multiple peers.
     """
     
-    def __init__(self, torrent, piece_manager, listen_port: int = 6881, max_peers: int = 50):
+    def __init__(self, torrent, piece_manager, listen_port: int = 6881, max_peers: int = 50,
+                 wakeup: Optional[threading.Event] = None,
+                 executor: Optional[futures.Executor] = None,
+                 peer_id: bytes = None, file_manager=None):
         """
         Initialize peer manager.
         
@@ -690,20 +1073,31 @@ class PeerManager:
             piece_manager: PieceManager instance
             listen_port: Port to listen for incoming connections
             max_peers: Maximum number of concurrent peer connections
+            wakeup: Event set when the last connected peer goes away
+            executor: Shared executor to run peer sessions on, a thread per peer if None
+            peer_id: Our 20-byte peer ID, random if None
+            file_manager: FileManager serving uploads, the piece manager's if None
         """
         self.torrent = torrent
         self.piece_manager = piece_manager
+        self.peer_id = peer_id or b'-PC0001-' + os.urandom(12)
+        self.file_manager = file_manager or piece_manager.file_manager
         self.listen_port = listen_port
         self.max_peers = max_peers
+        self.wakeup = wakeup
+        self.executor = executor
+        self.reactor = PeerReactor(Peer.KEEP_ALIVE_INTERVAL)
         
         # Peer tracking
         self.connected_peers = {}  # peer_id -> Peer object
         self.peer_addresses = set()  # Track unique (ip, port) combinations
         self.total_peers_seen = 0
+        self.state_version = 0  # Bumped whenever a peer is added, connects or goes away
         
         # Threading
         self.running = False
         self.peer_threads = []
+        self.peer_tasks: List[futures.Future] = []  # Peer sessions on the shared executor
         self.lock = threading.RLock()
         
         # Statistics
@@ -729,11 +1123,16 @@ class PeerManager:
             
             self.connected_peers.clear()
         
+        self.reactor.stop()
+        
         # Wait for peer threads to finish
         for thread in self.peer_threads:
             if thread.is_alive():
                 thread.join(timeout=5.0)
         
+        if self.peer_tasks:
+            futures.wait(self.peer_tasks, timeout=5.0)
+        
         self.logger.info("PeerManager stopped")
     
     def add_peer(self, ip: str, port: int, peer_id: bytes = None) -> bool:
@@ -758,63 +1157,120 @@ class PeerManager:
             if len(self.connected_peers) >= self.max_peers:
                 return False
         
-        # Create and start peer connection
+        return self._start_peer(ip, port)
+    
+    def add_peers(self, peers: Iterable[Tuple[str, int]]) -> int:
+        """
+        Add a batch of peers for connection.
+        
+        Deduplicates against known peers and applies the peer limit under
+        a single lock acquisition, then starts the new connections.
+        
+        Args:
+            peers: (ip, port) pairs, e.g. a tracker response
+            
+        Returns:
+            Number of peers added
+        """
+        with self.lock:
+            slots = self.max_peers - len(self.connected_peers)
+            if slots <= 0:
+                return 0
+            
+            new_peers = [addr for addr in dict.fromkeys(peers) if addr not in self.peer_addresses][:slots]
+            
+            # Reserve the addresses so concurrent batches skip them
+            self.peer_addresses.update(new_peers)
+        
+        return sum(self._start_peer(ip, port) for ip, port in new_peers)
+    
+    def _start_peer(self, ip: str, port: int) -> bool:
+        """Create a peer and start its connection session."""
         try:
-            peer = Peer(ip, port, self.torrent, self.piece_manager)
-            
-            # Start connection in separate thread
-            thread = threading.Thread(
-                target=self._handle_peer_connection,
-                args=(peer,),
-                daemon=True
-            )
-            thread.start()
-            self.peer_threads.append(thread)
-            
-            self.peer_addresses.add(peer_addr)
+            peer = Peer(ip, port, self.torrent.info_hash, self.peer_id,
+                        self.piece_manager, self.file_manager, reactor=self.reactor)
+            peer.on_disconnect = self._release_peer
+            
+            # Track the address before the session can finish and release it
+            self.peer_addresses.add((ip, port))
             self.total_peers_seen += 1
+            self.state_version += 1
+            
+            if self.executor:
+                # Run the session on the shared pool, dropping finished sessions
+                self.peer_tasks = [task for task in self.peer_tasks if not task.done()]
+                self.peer_tasks.append(self.executor.submit(self._handle_peer_connection, peer))
+            else:
+                # Start connection in separate thread
+                thread = threading.Thread(
+                    target=self._handle_peer_connection,
+                    args=(peer,),
+                    daemon=True
+                )
+                thread.start()
+                self.peer_threads.append(thread)
             
             self.logger.debug(f"Added peer {ip}:{port}")
             return True
             
         except Exception as e:
+            self.peer_addresses.discard((ip, port))
             self.logger.error(f"Failed to add peer {ip}:{port}: {e}")
             return False
     
     def _handle_peer_connection(self, peer):
-        """Handle a peer connection in a separate thread."""
+        """
+        Connect to a peer and hand it to the reactor.
+        
+        Runs only for the connect and handshake; afterwards the reactor
+        drives the peer until it disconnects and is released.
+        """
         try:
             # Connect to peer
             if peer.connect():
                 with self.lock:
-                    peer_id = f"{peer.ip}:{peer.port}"
-                    self.connected_peers[peer_id] = peer
+                    # A session finishing after stop() must not repopulate connected_peers
+                    tracked = self.running
+                    if tracked:
+                        peer_id = f"{peer.ip}:{peer.port}"
+                        self.connected_peers[peer_id] = peer
+                        self.state_version += 1
+                
+                if not tracked:
+                    peer.disconnect()
+                    return
                 
                 self.logger.info(f"Connected to peer {peer.ip}:{peer.port}")
                 
-                # Let peer handle communication
-                peer.run()
+                # The peer may have dropped before it was tracked
+                if not peer.connected:
+                    self._release_peer(peer)
                 
             else:
                 self.logger.debug(f"Failed to connect to peer {peer.ip}:{peer.port}")
+                self._release_peer(peer)
                 
         except Exception as e:
             self.logger.error(f"Peer connection error {peer.ip}:{peer.port}: {e}")
-        
-        finally:
-            # Clean up
-            with self.lock:
-                peer_id = f"{peer.ip}:{peer.port}"
-                if peer_id in self.connected_peers:
-                    del self.connected_peers[peer_id]
-            
-            peer_addr = (peer.ip, peer.port)
-            if peer_addr in self.peer_addresses:
-                self.peer_addresses.remove(peer_addr)
+            peer.disconnect()
+            self._release_peer(peer)
+    
+    def _release_peer(self, peer):
+        """Forget a disconnected peer and fold in its statistics."""
+        with self.lock:
+            peer_id = f"{peer.ip}:{peer.port}"
+            if self.connected_peers.get(peer_id) is peer:
+                del self.connected_peers[peer_id]
+                self.state_version += 1
+                
+                # Update statistics
+                self.total_downloaded += peer.bytes_downloaded
+                self.total_uploaded += peer.bytes_uploaded
+                
+                if not self.connected_peers and self.wakeup:
+                    self.wakeup.set()
             
-            # Update statistics
-            self.total_downloaded += peer.bytes_downloaded
-            self.total_uploaded += peer.bytes_uploaded
+            self.peer_addresses.discard((peer.ip, peer.port))
     
     def get_peer_stats(self) -> dict:
         """
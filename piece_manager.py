@@ -15,6 +15,9 @@ class PieceManager:
         self.file_manager = file_manager
         self.pieces = {}  # index -> list of blocks
         self.have_pieces = set()  # For seeding bitfield
+        # Same pieces as an int laid out like the wire bitfield (piece 0 = MSB)
+        self.bitfield_bits = (torrent.num_pieces + 7) // 8 * 8
+        self.have_mask = 0
         self.failed_pieces = set()  # Track failed pieces for retry
         self.piece_progress = {}  # Track progress per piece
         self.last_piece_request = {}  # Track when pieces were last requested
@@ -26,7 +29,8 @@ class PieceManager:
             saved_progress = load_progress(self.progress_file)
             if saved_progress:
                 print("\nFound saved progress, resuming download...")
-                self.have_pieces = set(saved_progress.get('have_pieces', []))
+                for index in saved_progress.get('have_pieces', []):
+                    self._mark_have(index)
                 self.piece_progress = saved_progress.get('piece_progress', {})
                 # Convert string keys back to integers
                 self.piece_progress = {int(k): v for k, v in self.piece_progress.items()}
@@ -41,8 +45,17 @@ class PieceManager:
         """Check if piece is complete."""
         return index in self.have_pieces
 
+    def _mark_have(self, index):
+        """Record a complete piece in both the set and the bitfield mask."""
+        self.have_pieces.add(index)
+        self.have_mask |= 1 << (self.bitfield_bits - 1 - index)
+
     def receive_block(self, index, begin, block):
-        """Receive a block and check if piece is complete."""
+        """Receive a block and check if piece is complete.
+
+        block may be any bytes-like object, including a memoryview into a
+        peer's receive buffer; it is copied when stored.
+        """
         try:
             # Validate piece index
             if index >= self.torrent.num_pieces:
@@ -69,7 +82,7 @@ class PieceManager:
                 return
                 
             # Store the block
-            self.pieces[index][block_index] = block
+            self.pieces[index][block_index] = bytes(block)
             
             # Calculate completion percentage
             completed_blocks = sum(1 for b in self.pieces[index] if b is not None)
@@ -113,7 +126,7 @@ class PieceManager:
         if sha1_hash(piece) == expected_hash:
             print(f"\nPiece {index} hash verified, writing to disk...")
             self.file_manager.write_piece(index, piece)
-            self.have_pieces.add(index)
+            self._mark_have(index)
             self.piece_progress[index] = 100  # Mark as complete
             if index in self.pieces:
                 del self.pieces[index]
@@ -139,6 +152,10 @@ class PieceManager:
         """Read block from disk for seeding."""
         return self.file_manager.read_block(index, begin, length)
 
+    def get_block_segments(self, index, begin, length):
+        """Get the on-disk (path, offset, length) segments of a block for sendfile."""
+        return self.file_manager.get_block_segments(index, begin, length)
+
     def piece_length(self, index):
         """Get piece length."""
         if index == self.torrent.num_pieces - 1:
@@ -170,7 +187,7 @@ class PieceManager:
                     print(f"Got:      {actual_hash.hex()}")
                     raise ValueError(f"Piece {index} hash verification failed")
                 
-                self.have_pieces.add(index)
+                self._mark_have(index)
                 verified_pieces += 1
                 
                 if verified_pieces % 10 == 0 or verified_pieces == total_pieces:
@@ -30,7 +30,6 @@ class Block:
         self.piece_index = piece_index
         self.offset = offset
         self.length = length
-        self.data = None
         self.requested = False
         self.received = False
         self.request_time = None
@@ -59,6 +58,8 @@ class Piece:
         self.blocks = self._create_blocks()
         self.data = bytearray(size)
         self.downloaded_blocks = 0
+        self.hasher = hashlib.sha1()
+        self.hashed_blocks = 0  # Blocks in the contiguous prefix fed to the hasher
         self.last_activity = time.time()
         self.download_start_time = None
         self.completion_time = None
@@ -108,23 +109,27 @@ class Piece:
             self.download_start_time = time.time()
     
     def add_block_data(self, offset: int, data: bytes) -> bool:
-        """Add data for a block."""
-        # Find the block
-        block = None
-        for b in self.blocks:
-            if b.offset == offset and len(data) == b.length:
-                block = b
-                break
+        """
+        Add data for a block.
+        
+        The data is copied into the piece buffer, so it may be a memoryview
+        over a receive buffer that is reused once this returns.
+        """
+        # Find the block, blocks are laid out at fixed BLOCK_SIZE offsets
+        block_index = offset // self.BLOCK_SIZE
+        if block_index >= len(self.blocks):
+            return False
         
-        if not block:
+        block = self.blocks[block_index]
+        if block.offset != offset or len(data) != block.length:
             return False
         
         # Add data to piece
         self.data[offset:offset + len(data)] = data
-        block.data = data
         block.received = True
         self.downloaded_blocks += 1
         self.last_activity = time.time()
+        self._update_hash()
         
         # Check if piece is complete
         if self.downloaded_blocks == len(self.blocks):
@@ -132,9 +137,29 @@ class Piece:
         
         return True
     
+    def _update_hash(self):
+        """Feed newly contiguous received blocks to the running SHA1."""
+        blocks = self.blocks
+        index = self.hashed_blocks
+        if index >= len(blocks) or not blocks[index].received:
+            return
+        
+        start = blocks[index].offset
+        while index < len(blocks) and blocks[index].received:
+            index += 1
+        end = blocks[index - 1].offset + blocks[index - 1].length
+        
+        # Hash straight out of the piece buffer without copying
+        with memoryview(self.data) as view:
+            self.hasher.update(view[start:end])
+        self.hashed_blocks = index
+    
     def _verify_piece(self) -> bool:
         """Verify piece integrity using SHA1 hash."""
-        calculated_hash = hashlib.sha1(self.data).digest()
+        if self.hashed_blocks == len(self.blocks):
+            calculated_hash = self.hasher.digest()
+        else:
+            calculated_hash = hashlib.sha1(self.data).digest()
         
         if calculated_hash == self.hash_value:
             self.state = PieceState.COMPLETED
@@ -151,13 +176,14 @@ class Piece:
         for block in self.blocks:
             block.requested = False
             block.received = False
-            block.data = None
             block.request_time = None
             block.peer_ip = None
             block.peer_port = None
         
         self.downloaded_blocks = 0
         self.data = bytearray(self.size)
+        self.hasher = hashlib.sha1()
+        self.hashed_blocks = 0
     
     def reset_expired_blocks(self, timeout: int = 30):
         """Reset blocks that have timed out."""
@@ -198,7 +224,10 @@ class PieceManager:
         self.piece_completion_callback = piece_completion_callback
         self.pieces = self._create_pieces()
         self.completed_pieces = set()
+        # Wire-format bitfield of completed_pieces, updated as pieces complete
+        self.own_bitfield = bytearray((torrent_info.num_pieces + 7) // 8)
         self.failed_pieces = set()
+        self.active_pieces = set()  # Pieces with blocks in flight
         
         self.lock = threading.RLock()
         self.logger = logging.getLogger(__name__)
@@ -206,7 +235,7 @@ class PieceManager:
         # Statistics
         self.total_downloaded = 0
         self.download_start_time = time.time()
-        self.pieces_completed = 0
+        self.pieces_completed = 0  # Always len(completed_pieces), kept as a plain int for cheap reads
         
         # Strategy settings
         self.max_requests_per_peer = 5
@@ -228,9 +257,13 @@ class PieceManager:
         """Mark a piece as already completed (for resume functionality)."""
         with self.lock:
             if piece_index in self.pieces:
+                if piece_index in self.completed_pieces:
+                    return True
+                
                 piece = self.pieces[piece_index]
                 piece.state = PieceState.COMPLETED
                 self.completed_pieces.add(piece_index)
+                self.own_bitfield[piece_index >> 3] |= 0x80 >> (piece_index & 7)
                 self.pieces_completed += 1
                 self.total_downloaded += piece.size
                 return True
@@ -272,6 +305,7 @@ class PieceManager:
             
             block = pending_blocks[0]
             piece.mark_block_requested(block, peer_ip or "unknown", peer_port or 0)
+            self.active_pieces.add(piece_index)
             
             return (piece_index, block.offset, block.length)
     
@@ -309,7 +343,7 @@ class PieceManager:
         Args:
             piece_index: Index of the piece
             block_offset: Offset within the piece
-            block_data: Block data
+            block_data: Block data, any bytes-like object (copied into the piece)
             
         Returns:
             True if block was added successfully
@@ -331,6 +365,8 @@ class PieceManager:
                 # Check if piece is now complete
                 if piece.is_complete():
                     self.completed_pieces.add(piece_index)
+                    self.own_bitfield[piece_index >> 3] |= 0x80 >> (piece_index & 7)
+                    self.active_pieces.discard(piece_index)
                     self.pieces_completed += 1
                     self.logger.info(f"Piece {piece_index} completed ({self.get_completion_percentage():.1f}%)")
                     
@@ -350,21 +386,12 @@ class PieceManager:
     def get_bitfield(self) -> bytes:
         """Get bitfield of completed pieces."""
         with self.lock:
-            # Create bitfield with 1 bit per piece
-            bitfield_size = (self.torrent_info.num_pieces + 7) // 8
-            bitfield = bytearray(bitfield_size)
-            
-            for piece_index in self.completed_pieces:
-                byte_index = piece_index // 8
-                bit_index = 7 - (piece_index % 8)
-                bitfield[byte_index] |= (1 << bit_index)
-            
-            return bytes(bitfield)
+            return bytes(self.own_bitfield)
     
     def get_completion_percentage(self) -> float:
         """Get overall completion percentage."""
         with self.lock:
-            return (len(self.completed_pieces) / self.torrent_info.num_pieces) * 100
+            return (self.pieces_completed / self.torrent_info.num_pieces) * 100
     
     def get_downloaded_bytes(self) -> int:
         """Get total bytes downloaded."""
@@ -387,7 +414,7 @@ class PieceManager:
     def get_piece_status(self) -> Dict:
         """Get detailed piece status information."""
         with self.lock:
-            completed = len(self.completed_pieces)
+            completed = self.pieces_completed
             downloading = len([p for p in self.pieces.values() if p.state == PieceState.DOWNLOADING])
             pending = len([p for p in self.pieces.values() if p.state == PieceState.PENDING])
             failed = len(self.failed_pieces)
@@ -423,18 +450,24 @@ class PieceManager:
     def cleanup_expired_requests(self):
         """Clean up expired block requests."""
         with self.lock:
-            for piece in self.pieces.values():
-                if piece.state == PieceState.DOWNLOADING:
-                    piece.reset_expired_blocks(self.block_timeout)
-                    
-                    # If no blocks are being downloaded, reset piece to pending
-                    if not piece.get_requested_blocks() and piece.downloaded_blocks == 0:
-                        piece.state = PieceState.PENDING
+            for piece_index in list(self.active_pieces):
+                piece = self.pieces[piece_index]
+                
+                if piece.state != PieceState.DOWNLOADING:
+                    self.active_pieces.discard(piece_index)
+                    continue
+                
+                piece.reset_expired_blocks(self.block_timeout)
+                
+                # If no blocks are being downloaded, reset piece to pending
+                if not piece.get_requested_blocks() and piece.downloaded_blocks == 0:
+                    piece.state = PieceState.PENDING
+                    self.active_pieces.discard(piece_index)
     
     def is_complete(self) -> bool:
         """Check if all pieces are downloaded."""
-        with self.lock:
-            return len(self.completed_pieces) == self.torrent_info.num_pieces
+        # A single int read, safe without taking the lock
+        return self.pieces_completed == self.torrent_info.num_pieces
     
     def get_next_pieces_for_peer(self, available_pieces: Set[int], max_pieces: int = 5) -> List[Tuple[int, int, int]]:
         """
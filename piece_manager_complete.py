@@ -40,6 +40,7 @@ class Piece:
         self.length = length
         self.hash_value = hash_value
         self.blocks: List[PieceBlock] = []
+        self.buffer: Optional[bytearray] = None  # Blocks are copied in at their offset
         self.completed = False
         self.verified = False
         self.last_activity = time.time()
@@ -73,7 +74,10 @@ class Piece:
                 if len(data) != block.length:
                     return False
                 
-                block.data = data
+                # Copy into the piece buffer, so data may be a view the caller reuses
+                if self.buffer is None:
+                    self.buffer = bytearray(self.length)
+                self.buffer[offset:offset + block.length] = data
                 block.received = True
                 self.last_activity = time.time()
                 break
@@ -85,8 +89,7 @@ class Piece:
         
         if self.completed:
             # Verify piece integrity
-            piece_data = self.get_data()
-            piece_hash = hashlib.sha1(piece_data).digest()
+            piece_hash = hashlib.sha1(self.buffer).digest()
             self.verified = piece_hash == self.hash_value
             
             if not self.verified:
@@ -98,15 +101,10 @@ class Piece:
     
     def get_data(self) -> bytes:
         """Get complete piece data."""
-        if not self.completed:
+        if not self.completed or self.buffer is None:
             return b''
         
-        data = b''
-        for block in self.blocks:
-            if block.data:
-                data += block.data
-        
-        return data
+        return bytes(self.buffer)
     
     def reset(self):
         """Reset piece to initial state."""
@@ -166,21 +164,25 @@ class PieceManager:
     verification across multiple peer connections.
     """
     
-    def __init__(self, torrent, file_manager):
+    def __init__(self, torrent, file_manager, wakeup: Optional[threading.Event] = None):
         """
         Initialize piece manager.
         
         Args:
             torrent: Torrent object containing piece information
             file_manager: FileManager for writing completed pieces
+            wakeup: Event set whenever a piece completes
         """
         self.torrent = torrent
         self.file_manager = file_manager
+        self.wakeup = wakeup
         
         # Piece tracking
         self.pieces: Dict[int, Piece] = {}
         self.completed_pieces: Set[int] = set()
         self.have_pieces: BitArray = BitArray(length=torrent.num_pieces)
+        # Bit i set while piece i is still needed, for one-operation overlap tests against peers
+        self.needed_mask = (1 << torrent.num_pieces) - 1
         
         # Request tracking
         self.pending_requests: Dict[Tuple[int, int], float] = {}  # (piece, offset) -> timestamp
@@ -189,10 +191,15 @@ class PieceManager:
         self.max_pending_pieces = 5
         self.request_timeout = 60
         
+        # Buffers of written pieces, handed to the next pieces to start downloading
+        self.spare_buffers: List[bytearray] = []
+        self.max_spare_buffers = self.max_pending_pieces
+        
         # Statistics
         self.bytes_downloaded = 0
         self.pieces_completed = 0
         self.start_time = time.time()
+        self.state_version = 0  # Bumped whenever download progress changes
         
         # Threading
         self.lock = threading.RLock()
@@ -252,9 +259,14 @@ class PieceManager:
         with self.lock:
             self.completed_pieces.add(piece_index)
             self.have_pieces[piece_index] = True
+            self.needed_mask &= ~(1 << piece_index)
             self.pieces[piece_index].completed = True
             self.pieces[piece_index].verified = True
             self.pieces_completed += 1
+            self.state_version += 1
+        
+        if self.wakeup:
+            self.wakeup.set()
     
     def need_piece(self, piece_index: int) -> bool:
         """
@@ -381,12 +393,15 @@ class PieceManager:
                 return False
             
             piece = self.pieces[piece_index]
+            if piece.buffer is None and self.spare_buffers and piece.length == self.torrent.piece_length:
+                piece.buffer = self.spare_buffers.pop()
             
             # Add block to piece
             piece_completed = piece.add_block(block_offset, block_data)
             
             # Update statistics
             self.bytes_downloaded += len(block_data)
+            self.state_version += 1
             
             if piece_completed:
                 # Piece is complete and verified
@@ -394,8 +409,8 @@ class PieceManager:
                 
                 # Write piece to disk
                 try:
-                    piece_data = piece.get_data()
-                    self.file_manager.write_piece(piece_index, piece_data)
+                    self.file_manager.write_piece(piece_index, piece.buffer)
+                    self._release_buffer(piece)
                     
                     # Mark as completed
                     self._mark_piece_completed(piece_index)
@@ -409,6 +424,13 @@ class PieceManager:
             
             return False
     
+    def _release_buffer(self, piece: Piece):
+        """Take the buffer of a written piece for reuse by a later piece."""
+        buffer = piece.buffer
+        piece.buffer = None
+        if len(buffer) == self.torrent.piece_length and len(self.spare_buffers) < self.max_spare_buffers:
+            self.spare_buffers.append(buffer)
+    
     def cancel_request(self, piece_index: int, block_offset: int):
         """
         Cancel a block request.
@@ -494,7 +516,7 @@ class PieceManager:
                 if not piece.completed:
                     for block in piece.blocks:
                         if block.received:
-                            partial_bytes += len(block.data) if block.data else 0
+                            partial_bytes += block.length
             
             completed_bytes = sum(
                 self.torrent.get_piece_length(i) for i in self.completed_pieces
@@ -540,6 +562,8 @@ class PieceManager:
                 # Remove from completed set
                 self.completed_pieces.discard(piece_index)
                 self.have_pieces[piece_index] = False
+                self.needed_mask |= 1 << piece_index
+                self.state_version += 1
                 
                 # Cancel pending requests for this piece
                 stale_requests = [
@@ -15,6 +15,9 @@ from collections import deque
 import logging
 
 
+SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+
+
 class ProgressTracker:
     """Tracks download progress and statistics."""
     
@@ -161,7 +164,12 @@ class ProgressTracker:
 
 
 class ProgressDisplay:
-    """Terminal-based progress display."""
+    """
+    Terminal-based progress display.
+    
+    The display owns no thread, the caller's loop calls render_once() every
+    update_interval seconds.
+    """
     
     def __init__(self, torrent_name: str, tracker: ProgressTracker, 
                  update_interval: float = 1.0, verbose: bool = False):
@@ -171,7 +179,6 @@ class ProgressDisplay:
         self.verbose = verbose
         
         self.running = False
-        self.display_thread = None
         self.logger = logging.getLogger(__name__)
         
         # Terminal info
@@ -186,14 +193,11 @@ class ProgressDisplay:
     
     def _format_bytes(self, bytes_value: float) -> str:
         """Format bytes with appropriate unit."""
-        for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-            if bytes_value < 1024.0:
-                if unit == 'B':
-                    return f"{int(bytes_value)} {unit}"
-                else:
-                    return f"{bytes_value:.1f} {unit}"
-            bytes_value /= 1024.0
-        return f"{bytes_value:.1f} PB"
+        # Each unit is 10 bits wide, so the bit length picks the unit directly
+        scale = min(max(0, (int(bytes_value).bit_length() - 1) // 10), len(SIZE_UNITS) - 1)
+        if not scale:
+            return f"{int(bytes_value)} B"
+        return f"{bytes_value / (1 << (10 * scale)):.1f} {SIZE_UNITS[scale]}"
     
     def _format_speed(self, speed: float) -> str:
         """Format speed with appropriate unit."""
@@ -224,16 +228,17 @@ class ProgressDisplay:
         bar = '█' * filled + '░' * (width - filled)
         return f"|{bar}|"
     
-    def _display_progress(self):
-        """Main display loop."""
-        while self.running:
-            try:
-                stats = self.tracker.get_statistics()
-                self._print_progress(stats)
-                time.sleep(self.update_interval)
-            except Exception as e:
-                if self.verbose:
-                    self.logger.error(f"Display error: {e}")
+    def render_once(self):
+        """Redraw the progress display once."""
+        if not self.running:
+            return
+        
+        try:
+            stats = self.tracker.get_statistics()
+            self._print_progress(stats)
+        except Exception as e:
+            if self.verbose:
+                self.logger.error(f"Display error: {e}")
     
     def _print_progress(self, stats: Dict):
         """Print progress information."""
@@ -291,15 +296,11 @@ class ProgressDisplay:
             return
         
         self.running = True
-        self.display_thread = threading.Thread(target=self._display_progress, daemon=True)
-        self.display_thread.start()
         self.logger.info("Progress display started")
     
     def stop(self):
         """Stop progress display."""
         self.running = False
-        if self.display_thread and self.display_thread.is_alive():
-            self.display_thread.join(timeout=2)
         self.logger.info("Progress display stopped")
     
     def print_final_summary(self):
@@ -406,12 +407,14 @@ if __name__ == "__main__":
             active_peers = random.randint(5, 20)
             
             tracker.update_progress(downloaded, uploaded, completed_pieces, active_peers)
+            if i % 5 == 0:
+                display.render_once()
             
             time.sleep(0.1)  # Simulate time passing
         
         # Complete the download
         tracker.update_progress(total_size, total_size // 10, total_pieces, 15)
-        time.sleep(2)
+        display.render_once()
         
         display.stop()
         display.print_final_summary()
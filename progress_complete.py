@@ -10,6 +10,7 @@ Author: BitTorrent CLI Client
 
 import time
 import threading
+import queue
 import sys
 from typing import Dict, List, Optional
 import logging
@@ -55,9 +56,10 @@ class ProgressTracker:
         self.rate_samples = []
         self.max_samples = 10
         
-        # Display state
+        # Display state, update() hands the latest snapshot to the display thread
         self.running = False
         self.display_thread = None
+        self.snapshots: "queue.Queue[tuple]" = queue.Queue(maxsize=1)
         self.last_line_length = 0
         
         # Setup logging
@@ -133,27 +135,55 @@ class ProgressTracker:
         
         self._last_bytes = self.bytes_downloaded
         self.last_update = current_time
+        
+        self._publish_snapshot((self.pieces_completed, self.bytes_downloaded, self.download_rate,
+                                self.eta, self.connected_peers, self.total_peers_seen))
+    
+    def _publish_snapshot(self, snapshot: tuple):
+        """Replace any snapshot the display thread has not drawn yet, never blocking."""
+        try:
+            self.snapshots.get_nowait()
+        except queue.Empty:
+            pass
+        
+        try:
+            self.snapshots.put_nowait(snapshot)
+        except queue.Full:
+            pass  # Another update got in first, it is just as recent
     
     def _display_loop(self):
-        """Main display loop."""
+        """Main display loop, draws each new snapshot off the caller's thread."""
         while self.running:
             try:
-                self._display_progress()
-                time.sleep(self.update_interval)
+                snapshot = self.snapshots.get(timeout=self.update_interval)
+            except queue.Empty:
+                continue
+            
+            try:
+                self._display_progress(snapshot)
             except Exception as e:
                 self.logger.error(f"Display error: {e}")
                 break
     
-    def _display_progress(self):
-        """Display current progress."""
+    def _display_progress(self, snapshot: tuple):
+        """
+        Display progress from a snapshot.
+        
+        Args:
+            snapshot: (pieces_completed, bytes_downloaded, download_rate, eta,
+                       connected_peers, total_peers_seen) as taken by update()
+        """
+        (pieces_completed, bytes_downloaded, download_rate, eta,
+         connected_peers, total_peers_seen) = snapshot
+        
         # Calculate progress percentage
         if self.total_pieces > 0:
-            piece_percentage = (self.pieces_completed / self.total_pieces) * 100
+            piece_percentage = (pieces_completed / self.total_pieces) * 100
         else:
             piece_percentage = 0
         
         if self.torrent.total_length > 0:
-            byte_percentage = (self.bytes_downloaded / self.torrent.total_length) * 100
+            byte_percentage = (bytes_downloaded / self.torrent.total_length) * 100
         else:
             byte_percentage = 0
         
@@ -163,30 +193,30 @@ class ProgressTracker:
         bar = '█' * filled_width + '░' * (bar_width - filled_width)
         
         # Format sizes
-        downloaded_mb = self.bytes_downloaded / (1024 * 1024)
+        downloaded_mb = bytes_downloaded / (1024 * 1024)
         total_mb = self.torrent.total_length / (1024 * 1024)
         
         # Format rate
-        if self.download_rate > 1024 * 1024:
-            rate_str = f"{self.download_rate / (1024 * 1024):.1f} MB/s"
-        elif self.download_rate > 1024:
-            rate_str = f"{self.download_rate / 1024:.1f} KB/s"
+        if download_rate > 1024 * 1024:
+            rate_str = f"{download_rate / (1024 * 1024):.1f} MB/s"
+        elif download_rate > 1024:
+            rate_str = f"{download_rate / 1024:.1f} KB/s"
         else:
-            rate_str = f"{self.download_rate:.1f} B/s"
+            rate_str = f"{download_rate:.1f} B/s"
         
         # Format ETA
-        if self.eta > 0:
-            eta_str = self._format_time(self.eta)
+        if eta > 0:
+            eta_str = self._format_time(eta)
         else:
             eta_str = "∞"
         
         # Build progress line
         progress_line = (
             f"Progress: |{bar}| {byte_percentage:5.1f}% "
-            f"({self.pieces_completed}/{self.total_pieces} pieces)\n"
+            f"({pieces_completed}/{self.total_pieces} pieces)\n"
             f"Size:     {downloaded_mb:8.1f} / {total_mb:.1f} MB\n"
             f"Speed:    ↓ {rate_str:>10} | ETA: {eta_str:>8}\n"
-            f"Peers:    {self.connected_peers} connected | {self.total_peers_seen} total seen"
+            f"Peers:    {connected_peers} connected | {total_peers_seen} total seen"
         )
         
         # Clear previous output
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for the client's queued logging setup and teardown.
+"""
+
+import logging
+import logging.handlers
+
+import main_client
+from main_client import BitTorrentClient
+
+
+def queue_handlers():
+    return [handler for handler in logging.getLogger().handlers
+            if isinstance(handler, logging.handlers.QueueHandler)]
+
+
+def test_clients_share_one_log_listener_and_restore_handlers(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    try:
+        first = BitTorrentClient('first.torrent')
+        listener = main_client._log_listener
+        second = BitTorrentClient('second.torrent')
+
+        # The second client reuses the queue instead of adding another listener
+        assert main_client._log_listener is listener
+        assert len(queue_handlers()) == 1
+
+        first._stop_logging()
+        first._stop_logging()
+        assert main_client._log_listener is listener
+
+        logging.getLogger('test').info('queued record')
+        second._stop_logging()
+        assert main_client._log_listener is None
+        assert not queue_handlers()
+
+        # Records now go straight to the file handler
+        assert all(handler in root.handlers for handler in main_client._log_handlers)
+        logging.getLogger('test').info('direct record')
+        log_text = (tmp_path / 'bittorrent_client.log').read_text()
+        assert 'queued record' in log_text and 'direct record' in log_text
+
+        # Starting again takes the direct handlers back under a new listener
+        third = BitTorrentClient('third.torrent')
+        assert len(queue_handlers()) == 1
+        assert not any(handler in root.handlers for handler in main_client._log_handlers)
+        third._stop_logging()
+    finally:
+        for handler in main_client._log_handlers:
+            handler.close()
+        main_client._log_handlers = []
+        root.handlers[:] = saved_handlers
+        root.setLevel(saved_level)
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Tests for peer.py connections, driven by the shared reactor against local listeners.
+"""
+
+import os
+import selectors
+import socket
+import struct
+
+from conftest import INFO_HASH, REMOTE_ID, message, serve_peer, wait_for
+from peer import MESSAGE_BUDGET, Peer, PeerReactor
+from utils import pack_handshake
+
+PEER_ID = b'-PC0001-xxxxxxxxxxxx'
+
+
+class FakeTorrent:
+    info_hash = INFO_HASH
+    num_pieces = 4
+    piece_length = 32768
+    total_length = 4 * 32768 - 100
+
+
+class FakePieceManager:
+    """Piece manager with nothing downloaded that records received blocks."""
+
+    def __init__(self, num_pieces=4):
+        self.bitfield_bits = (num_pieces + 7) // 8 * 8
+        self.have_mask = 0
+        self.blocks = []
+
+    def has_piece(self, index):
+        return False
+
+    def receive_block(self, index, begin, block):
+        self.blocks.append((index, begin, bytes(block)))
+
+
+def test_stalled_peer_does_not_block_other_peers():
+    """Requests a peer will not read stay queued instead of blocking the reactor thread."""
+
+    class HugeTorrent(FakeTorrent):
+        # 8 pieces of 1 GiB are half a million requests, far beyond the socket buffers
+        num_pieces = 8
+        piece_length = 1 << 30
+        total_length = 8 << 30
+
+    port, stalled_thread, _, stalled_done = serve_peer(
+        [message(5, b'\xff'), message(1)], read=False)
+    stalled = Peer('127.0.0.1', port, HugeTorrent, PEER_ID, FakePieceManager(8))
+
+    block = b'x' * 100
+    port, thread, _, _ = serve_peer([
+        message(5, b'\xf0'), message(1),
+        # Sent after the stalled peer's requests are queued
+        message(7, struct.pack('!II', 2, 0) + block),
+    ])
+    pieces = FakePieceManager()
+    healthy = Peer('127.0.0.1', port, FakeTorrent, PEER_ID, pieces)
+
+    try:
+        assert stalled.connect()
+        assert wait_for(lambda: stalled.send_blocked)
+        assert healthy.connect()
+        assert wait_for(lambda: pieces.blocks == [(2, 0, block)])
+        # The stalled peer still holds its unsent requests
+        assert stalled.send_pending is not None and not stalled.closing
+    finally:
+        stalled_done.set()
+        stalled.close()
+        healthy.close()
+        stalled_thread.join(3)
+        thread.join(3)
+
+
+def test_on_close_reports_a_dropped_connection_once():
+    """Clients learn about closed peers from the callback instead of a thread per peer."""
+    port, thread, _, done = serve_peer([message(5, b'\x00')], read=False)
+    closed = []
+    peer = Peer('127.0.0.1', port, FakeTorrent, PEER_ID, FakePieceManager(), on_close=closed.append)
+    try:
+        assert peer.connect()
+        assert closed == []
+        # The remote end goes away and the reactor closes the peer
+        done.set()
+        assert wait_for(lambda: closed == [peer])
+        peer.close()
+        assert closed == [peer]
+    finally:
+        done.set()
+        peer.close()
+        thread.join(3)
+
+
+def test_seeding_uploads_from_disk_without_blocking(tmp_path):
+    """Blocks split across files reach a slow reader intact through queued sendfile segments."""
+    # Leaves the block data far beyond what the socket buffers can hold at once
+    piece_length = 1 << 20
+    num_pieces = 8
+    data = os.urandom(piece_length * num_pieces)
+    split = len(data) // 2 + 1000
+
+    class SeedTorrent:
+        info_hash = INFO_HASH
+
+    class SeedPieceManager:
+        def __init__(self, directory):
+            self.paths = [os.path.join(directory, 'a'), os.path.join(directory, 'b')]
+            with open(self.paths[0], 'wb') as fh:
+                fh.write(data[:split])
+            with open(self.paths[1], 'wb') as fh:
+                fh.write(data[split:])
+
+        def has_piece(self, index):
+            return True
+
+        def get_bitfield(self):
+            class Bitfield:
+                def tobytes(self):
+                    return b'\xff'
+            return Bitfield()
+
+        def get_block_segments(self, index, begin, length):
+            start = index * piece_length + begin
+            segments = []
+            if start < split:
+                count = min(length, split - start)
+                segments.append((self.paths[0], start, count))
+                start += count
+                length -= count
+            if length:
+                segments.append((self.paths[1], start - split, length))
+            return segments
+
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    client = socket.create_connection(listener.getsockname())
+    conn, _ = listener.accept()
+    listener.close()
+
+    seeder = Peer('127.0.0.1', 1, SeedTorrent, PEER_ID, SeedPieceManager(str(tmp_path)), is_seeding=True)
+    try:
+        client.sendall(pack_handshake(INFO_HASH, REMOTE_ID))
+        seeder.handle_incoming(conn)
+        requests = [(index, begin, 16384)
+                    for index in range(num_pieces) for begin in range(0, piece_length, 16384)]
+        client.sendall(message(2) + b''.join(message(6, struct.pack('!III', *request))
+                                               for request in requests))
+
+        # Not reading yet, so the uploads have to wait in the queue
+        assert wait_for(lambda: seeder.send_blocked)
+
+        expected = 68 + 6 + 5 + len(requests) * (13 + 16384)
+        received = bytearray()
+        client.settimeout(5)
+        while len(received) < expected:
+            chunk = client.recv(1 << 16)
+            assert chunk
+            received += chunk
+    finally:
+        seeder.close()
+        client.close()
+
+    # Handshake, bitfield and unchoke come first
+    offset = 68 + 6 + 5
+    assert received[68:offset] == message(5, b'\xff') + message(1)
+    for index, begin, length in requests:
+        header = struct.pack('!IBII', 9 + length, 7, index, begin)
+        assert received[offset:offset + 13] == header
+        start = index * piece_length + begin
+        assert received[offset + 13:offset + 13 + length] == data[start:start + length]
+        offset += 13 + length
+
+
+
+class TenPieceTorrent:
+    info_hash = INFO_HASH
+    num_pieces = 10
+    piece_length = 16384
+    total_length = 10 * 16384 - 100
+
+
+def requested_pieces(bitfield, have=()):
+    """Run request_pieces for a peer with bitfield and return the requested (index, begin, length)."""
+    pieces = FakePieceManager(TenPieceTorrent.num_pieces)
+    for index in have:
+        pieces.have_mask |= 1 << (pieces.bitfield_bits - 1 - index)
+    peer = Peer('127.0.0.1', 1, TenPieceTorrent, PEER_ID, pieces)
+    sent = bytearray()
+    peer.send_raw = sent.extend
+    peer.bitfield = bitfield
+    peer.request_pieces()
+    requests = []
+    for offset in range(0, len(sent), 17):
+        length, message_id, index, begin, block_length = struct.unpack_from('!IBIII', sent, offset)
+        assert (length, message_id) == (13, 6)
+        requests.append((index, begin, block_length))
+    return peer, requests
+
+
+def test_request_pieces_maps_needed_bits_to_piece_indexes():
+    # Peer has pieces 0, 3 and 9, we already have 3
+    _, requests = requested_pieces(bytes([0b10010000, 0b01000000]), have=[3])
+    assert requests == [(0, 0, 16384), (9, 0, 16384 - 100)]
+
+
+def test_request_pieces_pads_a_short_bitfield():
+    _, requests = requested_pieces(b'\xff')
+    assert [index for index, _, _ in requests] == list(range(8))
+
+
+def test_request_pieces_ignores_bytes_past_a_long_bitfield():
+    _, requests = requested_pieces(b'\xff\xff\xff')
+    assert [index for index, _, _ in requests] == list(range(10))
+
+
+def test_request_pieces_ignores_spare_bits_past_the_last_piece():
+    # Only the six bits after piece 9 are set
+    bitfield = b'\x00\x3f'
+    peer, requests = requested_pieces(bitfield)
+    assert requests == []
+    assert peer.exhausted_bitfield is bitfield
+
+
+def reading_peer():
+    """A Peer reading from one end of a socket pair, recording the messages it parses."""
+    sock, remote = socket.socketpair()
+    sock.setblocking(False)
+    peer = Peer('127.0.0.1', 1, FakeTorrent, PEER_ID, FakePieceManager())
+    peer.sock = sock
+    seen = []
+    peer.process_message = lambda message_id, payload: seen.append((message_id, bytes(payload)))
+    return peer, remote, seen
+
+
+def test_message_split_across_reads_is_reassembled():
+    peer, remote, seen = reading_peer()
+    piece = message(7, struct.pack('!II', 1, 0) + b'x' * 1000)
+    try:
+        # Not even the length prefix yet
+        remote.sendall(piece[:3])
+        assert peer._on_readable() is False
+        assert seen == [] and peer.pending_length is None
+
+        # Length known, body still arriving
+        remote.sendall(piece[3:500])
+        assert peer._on_readable() is False
+        assert seen == [] and peer.pending_length == len(piece) - 4
+
+        remote.sendall(piece[500:] + message(4, struct.pack('!I', 2))[:6])
+        assert peer._on_readable() is False
+        assert seen == [(7, piece[5:])]
+        assert peer.pending_length == 5
+
+        remote.sendall(message(4, struct.pack('!I', 2))[6:])
+        assert peer._on_readable() is False
+        assert seen[1:] == [(4, struct.pack('!I', 2))]
+        # Everything consumed, the buffer rewinds
+        assert (peer.head, peer.tail, peer.pending_length) == (0, 0, None)
+    finally:
+        peer.sock.close()
+        remote.close()
+
+
+def test_message_budget_cut_off_resumes_where_it_stopped():
+    peer, remote, seen = reading_peer()
+    haves = [message(4, struct.pack('!I', index)) for index in range(MESSAGE_BUDGET + 3)]
+    keep_alive = struct.pack('!I', 0)
+    partial = message(4, struct.pack('!I', 99))
+    try:
+        remote.sendall(keep_alive + b''.join(haves) + partial[:7])
+        assert peer._on_readable() is True
+        # The keep-alive counts against the budget but is not dispatched
+        assert seen == [(4, struct.pack('!I', index)) for index in range(MESSAGE_BUDGET - 1)]
+
+        assert peer._on_pending() is False
+        assert seen == [(4, struct.pack('!I', index)) for index in range(MESSAGE_BUDGET + 3)]
+        assert peer.pending_length == 5
+
+        remote.sendall(partial[7:])
+        assert peer._on_readable() is False
+        assert seen[-1] == (4, struct.pack('!I', 99))
+        assert (peer.head, peer.tail, peer.pending_length) == (0, 0, None)
+    finally:
+        peer.sock.close()
+        remote.close()
+
+
+def test_wakeup_during_drain_is_not_lost():
+    reactor = PeerReactor()
+    reader = reactor.wake_reader
+
+    class RacingReader:
+        """Lets another thread's wakeup() land in the middle of the drain."""
+        raced = False
+
+        def recv(self, size):
+            data = reader.recv(size)
+            if not self.raced:
+                self.raced = True
+                reactor.wakeup()
+            return data
+
+    try:
+        reactor.wakeup()
+        reactor.wake_reader = RacingReader()
+        reactor._drain_wakeups()
+        reactor.wake_reader = reader
+
+        # A later wakeup must still reach a select() waiting on the reader
+        reactor.wakeup()
+        with selectors.DefaultSelector() as selector:
+            selector.register(reader, selectors.EVENT_READ)
+            assert selector.select(timeout=0.5)
+    finally:
+        reader.close()
+        reactor.wake_writer.close()
+        reactor.selector.close()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Tests for the peer_client reactor.
+"""
+
+import selectors
+
+from peer_client import PeerReactor
+
+
+class RacingReader:
+    """Wake reader that lets another thread's wakeup() land in the middle of a drain."""
+
+    def __init__(self, reactor):
+        self.reactor = reactor
+        self.sock = reactor.wake_reader
+        self.raced = False
+
+    def recv(self, size):
+        data = self.sock.recv(size)
+        if not self.raced:
+            self.raced = True
+            self.reactor.wakeup()
+        return data
+
+
+def test_wakeup_during_drain_is_not_lost():
+    reactor = PeerReactor()
+    reader = reactor.wake_reader
+    try:
+        reactor.wakeup()
+        reactor.wake_reader = RacingReader(reactor)
+        reactor._drain_wakeups()
+        reactor.wake_reader = reader
+
+        # A later wakeup must still reach a select() waiting on the reader
+        reactor.wakeup()
+        with selectors.DefaultSelector() as selector:
+            selector.register(reader, selectors.EVENT_READ)
+            assert selector.select(timeout=0.5)
+    finally:
+        reader.close()
+        reactor.wake_writer.close()
+        reactor.selector.close()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Tests for the peer wire protocol in peer_complete, run against a local listener.
+"""
+
+import socket
+import struct
+
+from conftest import INFO_HASH, REMOTE_ID, message, serve_peer, wait_for
+from peer_complete import Peer, PeerManager, PeerMessage, PeerReactor
+
+
+class FakeTorrent:
+    info_hash = INFO_HASH
+    num_pieces = 16
+
+
+class FakePieceManager:
+    """Hands out one request per piece the peer has and records received blocks."""
+
+    def __init__(self):
+        self.file_manager = None
+        self.needed_mask = (1 << FakeTorrent.num_pieces) - 1
+        self.blocks = []
+        self.requested = set()
+
+    def need_piece(self, piece_index):
+        return True
+
+    def have_piece(self, piece_index):
+        return False
+
+    def get_next_request(self, peer_pieces):
+        for piece_index in sorted(peer_pieces - self.requested):
+            self.requested.add(piece_index)
+            return (piece_index, 0, 4)
+        return None
+
+    def add_block(self, piece_index, block_offset, block_data):
+        self.blocks.append((piece_index, block_offset, bytes(block_data)))
+        return False
+
+    def cancel_request(self, piece_index, block_offset):
+        pass
+
+
+def parse_messages(data):
+    """Split raw peer wire bytes into (message_id, payload) pairs, None for keep-alives."""
+    messages = []
+    offset = 0
+    while offset + 4 <= len(data):
+        length = struct.unpack_from('!I', data, offset)[0]
+        body = bytes(data[offset + 4:offset + 4 + length])
+        messages.append((body[0], body[1:]) if body else (None, b''))
+        offset += 4 + length
+    return messages
+
+
+def test_peer_manager_connects_through_reactor():
+    """_start_peer builds a working Peer and the reactor drives it after the handshake."""
+    block = b'data'
+    piece = message(PeerMessage.PIECE, struct.pack('!II', 2, 0) + block)
+    port, thread, received, _ = serve_peer([
+        message(PeerMessage.BITFIELD, b'\x20\x00'),
+        message(PeerMessage.UNCHOKE),
+        # Split across writes so the reactor has to reassemble it
+        piece[:7], piece[7:],
+    ])
+
+    piece_manager = FakePieceManager()
+    manager = PeerManager(FakeTorrent(), piece_manager, peer_id=b'-PC0001-xxxxxxxxxxxx')
+    manager.start()
+    try:
+        assert manager.add_peer('127.0.0.1', port)
+        assert wait_for(lambda: manager.connected_peers)
+        assert wait_for(lambda: piece_manager.blocks)
+
+        peer = next(iter(manager.connected_peers.values()))
+        assert peer.reactor is manager.reactor
+        assert peer.have_pieces == {2}
+        assert piece_manager.blocks == [(2, 0, block)]
+    finally:
+        manager.stop()
+        thread.join(3)
+
+    handshake = received['handshake']
+    assert handshake[28:48] == INFO_HASH
+    assert handshake[48:68] == b'-PC0001-xxxxxxxxxxxx'
+
+    sent = parse_messages(received['data'])
+    assert (PeerMessage.INTERESTED, b'') in sent
+    assert (PeerMessage.REQUEST, struct.pack('!III', 2, 0, 4)) in sent
+
+
+def test_peer_without_reactor_uses_message_thread():
+    """A standalone Peer reads messages that arrived together with the handshake."""
+    port, thread, received, _ = serve_peer([message(PeerMessage.HAVE, struct.pack('!I', 5))])
+
+    peer = Peer('127.0.0.1', port, INFO_HASH, b'-PC0001-yyyyyyyyyyyy', FakePieceManager(), None)
+    try:
+        assert peer.connect()
+        assert peer.peer_id_remote == REMOTE_ID
+        assert wait_for(lambda: peer.have_pieces == {5})
+        assert peer.have_mask == 1 << 5
+    finally:
+        peer.disconnect()
+        thread.join(3)
+
+
+def test_reactor_stops_cleanly_without_peers():
+    reactor = PeerReactor()
+    reactor.start()
+    reactor.stop()
+    assert reactor.thread is None
+
+
+class SeedingPieceManager(FakePieceManager):
+    """Has every piece, so requests from the peer are answered."""
+
+    def have_piece(self, piece_index):
+        return True
+
+
+class ZeroFileManager:
+    def read_block(self, piece_index, block_offset, block_length):
+        return bytes(block_length)
+
+
+def test_stalled_peer_does_not_block_other_peers():
+    """Uploads a peer will not read stay queued instead of blocking the reactor thread."""
+    # 512 blocks of 16 KiB, far beyond what the socket buffers hold
+    requests = b''.join(message(PeerMessage.REQUEST, struct.pack('!III', index, begin, 16384))
+                        for index in range(16) for begin in range(0, 1 << 19, 16384))
+    stalled_port, stalled_thread, _, stalled_done = serve_peer(
+        [message(PeerMessage.INTERESTED) + requests], read=False)
+
+    block = b'data'
+    port, thread, _, _ = serve_peer([
+        message(PeerMessage.BITFIELD, b'\x20\x00'),
+        message(PeerMessage.UNCHOKE),
+        message(PeerMessage.PIECE, struct.pack('!II', 2, 0) + block),
+    ])
+
+    piece_manager = SeedingPieceManager()
+    manager = PeerManager(FakeTorrent(), piece_manager, peer_id=b'-PC0001-xxxxxxxxxxxx',
+                          file_manager=ZeroFileManager())
+    manager.start()
+    try:
+        assert manager.add_peer('127.0.0.1', stalled_port)
+        assert wait_for(lambda: any(peer.send_blocked for peer in manager.connected_peers.values()))
+
+        assert manager.add_peer('127.0.0.1', port)
+        assert wait_for(lambda: piece_manager.blocks == [(2, 0, block)])
+    finally:
+        stalled_done.set()
+        manager.stop()
+        stalled_thread.join(3)
+        thread.join(3)
+
+
+def test_reactor_rejects_peers_after_stop():
+    """A connect finishing after stop() must not restart the reactor thread."""
+    reactor = PeerReactor()
+    reactor.start()
+    reactor.stop()
+
+    sock, remote = socket.socketpair()
+    peer = Peer('127.0.0.1', 1, INFO_HASH, b'-PC0001-yyyyyyyyyyyy', FakePieceManager(), None, reactor)
+    peer.socket = sock
+    try:
+        assert not reactor.register(peer)
+        assert reactor.thread is None
+        assert peer.fileno is None
+    finally:
+        sock.close()
+        remote.close()
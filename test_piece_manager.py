@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Tests for the piece manager's have mask.
+"""
+
+from piece_manager import PieceManager
+
+
+class FakeTorrent:
+    num_pieces = 10
+    piece_length = 16384
+    total_length = 10 * 16384 - 100
+
+
+class FakeFileManager:
+    def __init__(self, output_path):
+        self.output_path = output_path
+
+
+def test_have_mask_uses_wire_bitfield_layout(tmp_path):
+    pieces = PieceManager(FakeTorrent, FakeFileManager(str(tmp_path)))
+    # Ten pieces round up to two bitfield bytes
+    assert pieces.bitfield_bits == 16
+    assert pieces.have_mask == 0
+
+    pieces._mark_have(0)
+    assert pieces.have_mask == 1 << 15
+    pieces._mark_have(9)
+    pieces._mark_have(9)
+    assert pieces.have_mask == (1 << 15) | (1 << 6)
+    assert pieces.have_pieces == {0, 9}
+
+    # Same bits as the bitfield we send, spare bits past piece 9 stay clear
+    assert pieces.have_mask.to_bytes(2, 'big') == pieces.get_bitfield().tobytes()
+    assert pieces.have_mask & 0x3f == 0
@@ -21,6 +21,7 @@ class Torrent:
             
             # Calculate info hash (used for peer identification)
             self.info_hash = sha1_hash(bencodepy.encode(self.info))
+            self.info_hash_hex = self.info_hash.hex()
             
             # Get announce URL (tracker)
             if b'announce' not in meta_info:
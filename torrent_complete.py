@@ -9,6 +9,7 @@ Author: BitTorrent CLI Client
 """
 
 import bcoding
+import functools
 import hashlib
 import os
 from typing import List, Dict, Union, Optional
@@ -190,16 +191,18 @@ class Torrent:
             self._info_hash = hashlib.sha1(info_encoded).digest()
         return self._info_hash
     
-    @property
+    @functools.cached_property
     def info_hash_hex(self) -> str:
-        """Get the info hash as a hexadecimal string."""
+        """Get the info hash as a hexadecimal string, encoded once."""
         return self.info_hash.hex()
     
-    @property
+    @functools.cached_property
     def total_length(self) -> int:
         """
         Get the total size of all files in the torrent.
         
+        The file list is fixed once parsed, so the sum is computed once.
+        
         Returns:
             Total size in bytes
         """
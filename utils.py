@@ -1,6 +1,7 @@
 # utils.py: Helper functions and constants for the BitTorrent client.
 
 from bcoding import bencode, bdecode
+from functools import lru_cache
 import hashlib
 import random
 import struct
@@ -24,10 +25,12 @@ def sha1_hash(data):
     """Compute SHA1 hash of data."""
     return hashlib.sha1(data).digest()
 
+HANDSHAKE_PREFIX = struct.pack('!B', len(PROTOCOL_STR)) + PROTOCOL_STR + RESERVED
+
+@lru_cache(maxsize=32)
 def pack_handshake(info_hash, peer_id):
-    """Pack the handshake message."""
-    pstrlen = len(PROTOCOL_STR)
-    return struct.pack('!B', pstrlen) + PROTOCOL_STR + RESERVED + info_hash + peer_id
+    """Pack the handshake message (cached, identical for every peer of a torrent)."""
+    return HANDSHAKE_PREFIX + info_hash + peer_id
 
 def unpack_handshake(data):
     """Unpack and validate handshake."""